@@ -2,6 +2,7 @@
 __version__ = "0.0.0"
 
 __all__ = [
+    "AsyncDevice",
     "AuthenticationError",
     "ConnectionFailedError",
     "ConnectionLost",
@@ -21,6 +22,7 @@ __all__ = [
     "minify",
 ]
 from ._minify import minify
+from .async_device import AsyncDevice
 from .device import Device, Implementation
 from .device_meta import DeviceMeta
 from .exceptions import (
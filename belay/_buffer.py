@@ -0,0 +1,96 @@
+from typing import Optional
+
+
+class ReceiveBuffer:
+    """FIFO byte buffer for data received from a device.
+
+    Consuming from the front only advances an offset; the backing ``bytearray``
+    is compacted once the consumed prefix makes up most of it. Both appending
+    and consuming are therefore amortized ``O(1)`` per byte, regardless of how
+    the data is chunked.
+
+    ``find`` remembers how far it has already scanned for a terminator, so
+    repeatedly searching a growing buffer for the same terminator is also
+    linear overall.
+    """
+
+    _compact_threshold = 1 << 16
+
+    def __init__(self):
+        self._buf = bytearray()
+        self._start = 0  # Absolute index of the first unconsumed byte.
+
+        # ``find`` bookkeeping; ``_scan_pos`` is an absolute index.
+        self._scan_pattern = b""
+        self._scan_pos = 0
+
+    def __len__(self) -> int:
+        return len(self._buf) - self._start
+
+    def __bool__(self) -> bool:
+        return len(self._buf) > self._start
+
+    def extend(self, data) -> None:
+        """Append ``data`` to the end of the buffer."""
+        self._buf.extend(data)
+
+    def clear(self) -> None:
+        """Discard all buffered data."""
+        self._buf.clear()
+        self._start = 0
+        self._scan_pos = 0
+
+    def find(self, pattern: bytes) -> int:
+        """Find the first occurrence of ``pattern``.
+
+        Returns
+        -------
+        int
+            Number of bytes up to, and including, the first occurrence of ``pattern``.
+            ``-1`` if ``pattern`` isn't in the buffer.
+        """
+        if pattern != self._scan_pattern:
+            self._scan_pattern = pattern
+            self._scan_pos = self._start
+        # The pattern may straddle the previously-scanned boundary.
+        search_start = max(self._start, self._scan_pos - len(pattern) + 1)
+        index = self._buf.find(pattern, search_start)
+        if index < 0:
+            self._scan_pos = len(self._buf)
+            return -1
+        self._scan_pos = index
+        return index + len(pattern) - self._start
+
+    def peek(self, start: int = 0, stop: Optional[int] = None) -> bytes:
+        """Copy out buffered data without consuming it.
+
+        ``start`` and ``stop`` are relative to the first unconsumed byte.
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        with memoryview(self._buf) as view:
+            return bytes(view[self._start + start : self._start + stop])
+
+    def read(self, size: Optional[int] = None) -> bytes:
+        """Consume and return up to ``size`` bytes; all buffered data if ``None``."""
+        data = self.peek(0, size)
+        self._start += len(data)
+        self._compact()
+        return data
+
+    def readuntil(self, pattern: bytes) -> Optional[bytes]:
+        """Consume and return data up to, and including, ``pattern``.
+
+        Returns ``None`` (consuming nothing) if ``pattern`` isn't in the buffer.
+        """
+        index = self.find(pattern)
+        if index < 0:
+            return None
+        return self.read(index)
+
+    def _compact(self):
+        if self._start == len(self._buf):
+            self.clear()
+        elif self._start >= self._compact_threshold and 2 * self._start >= len(self._buf):
+            del self._buf[: self._start]
+            self._scan_pos = max(0, self._scan_pos - self._start)
+            self._start = 0
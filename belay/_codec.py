@@ -0,0 +1,213 @@
+"""Compact binary encoding of python values exchanged with the device.
+
+This is the host-side counterpart of ``snippets/codec.py``, which runs on-device.
+Every value is a single tag byte followed by its payload:
+
+======  ==========================  ==============================================
+Tag     Type                        Payload
+======  ==========================  ==============================================
+``N``   ``None``
+``T``   ``True``
+``F``   ``False``
+``i``   ``int``                     ``<B`` length, ASCII decimal digits
+``f``   ``float``                   ``<d``
+``s``   ``str``                     ``<I`` length, UTF-8 data
+``b``   ``bytes``                   ``<I`` length, data
+``y``   ``bytearray``               ``<I`` length, data
+``a``   ``array.array``             typecode, ``<B`` itemsize, ``<I`` length, data
+``t``   ``tuple``                   ``<I`` count, items
+``l``   ``list``                    ``<I`` count, items
+``S``   ``set``                     ``<I`` count, items
+``d``   ``dict``                    ``<I`` count, alternating keys and values
+``r``   anything else (decode-only) ``<I`` length, ``repr`` of the object
+======  ==========================  ==============================================
+
+Integers are sent as decimal text so that devices without arbitrary-precision
+integer support can still encode them. Array data is sent in the device's
+native (little-endian) byte order.
+"""
+import array
+import ast
+import struct
+import sys
+
+_U32 = struct.Struct("<I")
+_F64 = struct.Struct("<d")
+
+# Array typecodes grouped by kind; the same typecode may have a different itemsize on host and device.
+_ARRAY_KINDS = ("bhilq", "BHILQ", "fd")
+
+
+class UnsupportedTypeError(TypeError):
+    """Object cannot be represented by the binary codec."""
+
+
+def pack(obj) -> bytes:
+    """Encode ``obj`` into bytes."""
+    out = []
+    _pack(obj, out.append)
+    return b"".join(out)
+
+
+def _pack(obj, write):
+    if obj is None:
+        write(b"N")
+    elif obj is True:
+        write(b"T")
+    elif obj is False:
+        write(b"F")
+    elif isinstance(obj, int):
+        digits = int.__repr__(obj).encode()
+        if len(digits) > 255:
+            raise UnsupportedTypeError("Integer too large to encode.")
+        write(b"i" + bytes((len(digits),)) + digits)
+    elif isinstance(obj, float):
+        write(b"f" + _F64.pack(obj))
+    elif isinstance(obj, str):
+        data = obj.encode()
+        write(b"s" + _U32.pack(len(data)))
+        write(data)
+    elif isinstance(obj, (bytes, memoryview)):
+        data = bytes(obj)
+        write(b"b" + _U32.pack(len(data)))
+        write(data)
+    elif isinstance(obj, bytearray):
+        write(b"y" + _U32.pack(len(obj)))
+        write(bytes(obj))
+    elif isinstance(obj, array.array):
+        if sys.byteorder == "big":
+            obj = array.array(obj.typecode, obj)
+            obj.byteswap()
+        data = obj.tobytes()
+        write(b"a" + obj.typecode.encode() + bytes((obj.itemsize,)) + _U32.pack(len(data)))
+        write(data)
+    elif isinstance(obj, (tuple, list, set, dict)):
+        if isinstance(obj, tuple):
+            tag = b"t"
+        elif isinstance(obj, list):
+            tag = b"l"
+        elif isinstance(obj, set):
+            tag = b"S"
+        else:
+            tag = b"d"
+        write(tag + _U32.pack(len(obj)))
+        if tag == b"d":
+            for key, val in obj.items():
+                _pack(key, write)
+                _pack(val, write)
+        else:
+            for item in obj:
+                _pack(item, write)
+    else:
+        raise UnsupportedTypeError(f"Cannot encode object of type {type(obj).__name__}.")
+
+
+def has_binary(obj) -> bool:
+    """Checks if ``obj`` is, or contains, binary data (bytes-like objects or arrays)."""
+    if isinstance(obj, (bytes, bytearray, memoryview, array.array)):
+        return True
+    elif isinstance(obj, (tuple, list, set)):
+        return any(has_binary(x) for x in obj)
+    elif isinstance(obj, dict):
+        return any(has_binary(x) for x in obj.values())
+    return False
+
+
+def unpack(data):
+    """Decode bytes produced by ``pack`` (or the on-device ``__belay_pack``)."""
+    obj, index = _unpack(memoryview(data), 0)
+    if index != len(data):
+        raise ValueError(f"Trailing data after index {index}.")
+    return obj
+
+
+def to_numpy(obj):
+    """Convert all ``array.array`` in ``obj`` into ``numpy.ndarray``.
+
+    The arrays are wrapped via ``numpy.frombuffer``, so their data isn't copied.
+    Arrays nested in tuples, lists and dict values are also converted.
+    """
+    import numpy as np
+
+    def convert(obj):
+        if isinstance(obj, array.array):
+            return np.frombuffer(obj, dtype=obj.typecode)
+        elif isinstance(obj, (tuple, list)):
+            return type(obj)(convert(x) for x in obj)
+        elif isinstance(obj, dict):
+            return {key: convert(val) for key, val in obj.items()}
+        return obj
+
+    return convert(obj)
+
+
+def _array_typecode(typecode: str, itemsize: int) -> str:
+    """Find the host typecode of the same kind as device ``typecode`` with the same ``itemsize``."""
+    for kind in _ARRAY_KINDS:
+        if typecode in kind:
+            for candidate in kind:
+                if array.array(candidate).itemsize == itemsize:
+                    return candidate
+    raise ValueError(f"Unsupported array typecode {typecode!r} with itemsize {itemsize}.")
+
+
+def _unpack(view, index):
+    tag = view[index]
+    index += 1
+
+    if tag == 0x4E:  # N
+        return None, index
+    elif tag == 0x54:  # T
+        return True, index
+    elif tag == 0x46:  # F
+        return False, index
+    elif tag == 0x69:  # i
+        n = view[index]
+        index += 1
+        return int(bytes(view[index : index + n])), index + n
+    elif tag == 0x66:  # f
+        return _F64.unpack_from(view, index)[0], index + _F64.size
+    elif tag in b"sbyr":
+        (n,) = _U32.unpack_from(view, index)
+        index += _U32.size
+        data = view[index : index + n]
+        index += n
+        if tag == 0x73:  # s
+            return str(data, "utf8"), index
+        elif tag == 0x62:  # b
+            return bytes(data), index
+        elif tag == 0x79:  # y
+            return bytearray(data), index
+        else:  # r
+            return ast.literal_eval(str(data, "utf8")), index
+    elif tag == 0x61:  # a
+        typecode, itemsize = chr(view[index]), view[index + 1]
+        (n,) = _U32.unpack_from(view, index + 2)
+        index += 2 + _U32.size
+        data = view[index : index + n]
+        index += n
+        out = array.array(_array_typecode(typecode, itemsize))
+        out.frombytes(data)
+        if sys.byteorder == "big":
+            out.byteswap()
+        return out, index
+    elif tag in b"tlSd":
+        (n,) = _U32.unpack_from(view, index)
+        index += _U32.size
+        if tag == 0x64:  # d
+            out = {}
+            for _ in range(n):
+                key, index = _unpack(view, index)
+                out[key], index = _unpack(view, index)
+            return out, index
+        items = []
+        for _ in range(n):
+            item, index = _unpack(view, index)
+            items.append(item)
+        if tag == 0x74:  # t
+            return tuple(items), index
+        elif tag == 0x6C:  # l
+            return items, index
+        else:  # S
+            return set(items), index
+    raise ValueError(f"Unknown tag {chr(tag)!r} at index {index - 1}.")
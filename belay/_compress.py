@@ -0,0 +1,51 @@
+"""zlib compression of payloads that are decompressed on-device.
+
+Devices report their decompressor (if any) while probing the implementation:
+
+* ``"deflate"`` - ``deflate.DeflateIO`` (MicroPython >=1.21).
+* ``"zlib"`` - ``zlib.decompress`` (older MicroPython, CircuitPython).
+"""
+import binascii
+import zlib
+
+# Payloads smaller than this (in bytes) are sent uncompressed.
+THRESHOLD = 1024
+
+# A 1KB window keeps the memory required for decompressing on-device low.
+WBITS = 10
+
+# On-device expressions decompressing the ``bytes`` expression ``{data}``.
+_DECOMPRESS_EXPRESSIONS = {
+    "deflate": "__import__('deflate').DeflateIO(__import__('io').BytesIO({data})).read()",
+    "zlib": f"__import__('zlib').decompress({{data}},{WBITS})",
+}
+
+
+def compress(data: bytes) -> bytes:
+    """Compress ``data`` into a zlib stream that can be decompressed by any supported decompressor."""
+    compressor = zlib.compressobj(9, zlib.DEFLATED, WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_command(cmd: str, decompressor: str) -> str:
+    """Wrap ``cmd`` so that it's transferred compressed, and decompressed and executed on-device.
+
+    Parameters
+    ----------
+    cmd: str
+        Python code to execute on-device.
+    decompressor: str
+        On-device decompressor; ``""`` if the device cannot decompress.
+
+    Returns
+    -------
+    str
+        Command to send instead of ``cmd``.
+        ``cmd`` itself if it's shorter than ``THRESHOLD``, or if compression doesn't reduce its size.
+    """
+    if not decompressor or len(cmd) < THRESHOLD:
+        return cmd
+    encoded = binascii.b2a_base64(compress(cmd.encode()), newline=False).decode()
+    data = f"__import__('binascii').a2b_base64('{encoded}')"
+    compressed_cmd = f"exec({_DECOMPRESS_EXPRESSIONS[decompressor].format(data=data)})"
+    return compressed_cmd if len(compressed_cmd) < len(cmd) else cmd
@@ -0,0 +1,186 @@
+import asyncio
+import inspect
+from functools import partial, wraps
+from typing import Any, AsyncIterator, Callable, Optional, Type
+
+from .device import Device
+
+_EXHAUSTED = object()
+
+
+def _send(gen, value):
+    """``gen.send(value)``, returning ``_EXHAUSTED`` instead of raising ``StopIteration``.
+
+    ``StopIteration`` cannot be set on an ``asyncio.Future``.
+    """
+    try:
+        return gen.send(value)
+    except StopIteration:
+        return _EXHAUSTED
+
+
+class AsyncDevice:
+    """Asyncio interface into a micropython device.
+
+    Wraps a ``Device``. All communication with the device is performed by the device's
+    I/O worker thread, so awaiting a task never blocks the event loop.
+    The transports remain blocking; each ``AsyncDevice`` occupies one worker thread.
+    Task calls that are awaited concurrently are sent to the device as a single batch.
+
+    .. code-block:: python
+
+        device = await AsyncDevice.create("/dev/ttyUSB0")
+
+
+        @device.task
+        def foo(a):
+            return a * 2
+
+
+        await foo(5)  # 10
+        await device.close()
+
+    Can be used as an asynchronous context manager; awaits ``self.close`` on exit.
+    """
+
+    def __init__(self, device: Device):
+        """Wrap an existing ``Device``.
+
+        Parameters
+        ----------
+        device: Device
+            Connected device. Should not be used directly while this ``AsyncDevice`` is in use.
+        """
+        self.device = device
+
+    @classmethod
+    async def create(cls, *args, device_cls: Type[Device] = Device, **kwargs) -> "AsyncDevice":
+        """Connect to a device without blocking the event loop.
+
+        Parameters
+        ----------
+        device_cls: Type[Device]
+            ``Device`` subclass to instantiate.
+        *args, **kwargs
+            Passed along to ``device_cls``.
+        """
+        loop = asyncio.get_running_loop()
+        device = await loop.run_in_executor(None, partial(device_cls, *args, **kwargs))
+        return cls(device)
+
+    def __getattr__(self, name: str) -> Any:
+        """Access attributes of the wrapped device; tasks and methods become awaitable."""
+        attr = getattr(self.device, name)
+        if callable(attr):
+            return self._wrap(attr)
+        return attr
+
+    async def __aenter__(self) -> "AsyncDevice":
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self.close()
+
+    async def _run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Execute ``fn(*args, **kwargs)`` in the device's I/O worker thread."""
+        return await asyncio.wrap_future(self.device._get_worker().submit(fn, *args, **kwargs))
+
+    async def _iterate(self, fn: Callable, *args, **kwargs) -> AsyncIterator:
+        """Asynchronously iterate over the generator returned by ``fn(*args, **kwargs)``.
+
+        The generator is created and advanced in the device's I/O worker thread.
+        """
+        gen = await self._run(fn, *args, **kwargs)
+        value = None
+        while True:
+            item = await self._run(_send, gen, value)
+            if item is _EXHAUSTED:
+                return
+            value = yield item
+
+    def _wrap(self, executer: Callable) -> Callable:
+        """Create an async equivalent of a blocking device method or executer."""
+        if inspect.isgeneratorfunction(getattr(executer, "__wrapped__", None)):
+
+            @wraps(executer)
+            def agen_executer(*args, **kwargs):
+                return self._iterate(executer, *args, **kwargs)
+
+            return agen_executer
+
+        if hasattr(executer, "submit"):
+
+            @wraps(executer)
+            async def async_executer(*args, **kwargs):
+                return await asyncio.wrap_future(executer.submit(*args, **kwargs))
+
+            async def map_executer(*iterables, chunksize: Optional[int] = None):
+                return await self._run(executer.map, *iterables, chunksize=chunksize)
+
+            def imap_executer(*iterables, chunksize: Optional[int] = None):
+                return self._iterate(executer.imap, *iterables, chunksize=chunksize)
+
+            async_executer.map = map_executer
+            async_executer.imap = imap_executer
+            return async_executer
+
+        @wraps(executer)
+        async def async_method(*args, **kwargs):
+            return await self._run(executer, *args, **kwargs)
+
+        return async_method
+
+    async def __call__(self, *args, **kwargs):
+        """See ``Device.__call__``."""
+        return await self._run(self.device, *args, **kwargs)
+
+    async def sync(self, *args, **kwargs) -> None:
+        """See ``Device.sync``."""
+        return await self._run(self.device.sync, *args, **kwargs)
+
+    async def sync_dependencies(self, *args, **kwargs) -> None:
+        """See ``Device.sync_dependencies``."""
+        return await self._run(self.device.sync_dependencies, *args, **kwargs)
+
+    async def reconnect(self, *args, **kwargs) -> None:
+        """See ``Device.reconnect``."""
+        return await self._run(self.device.reconnect, *args, **kwargs)
+
+    async def close(self) -> None:
+        """See ``Device.close``."""
+        if self.device._board is None:
+            return
+        return await self._run(self.device.close)
+
+    def task(self, f: Optional[Callable] = None, **kwargs) -> Callable:
+        """Async equivalent of ``Device.task``.
+
+        The decorated function returns an awaitable; generator tasks return an asynchronous iterator.
+        ``map`` is awaitable, and ``imap`` returns an asynchronous iterator.
+        Tasks are ``lazy`` by default, so that decorating doesn't block the event loop.
+        """
+        if f is None:
+            return partial(self.task, **kwargs)
+        kwargs.setdefault("lazy", True)
+        return self._wrap(self.device._belay_task(f, **kwargs))
+
+    def setup(self, f: Optional[Callable] = None, **kwargs) -> Callable:
+        """Async equivalent of ``Device.setup``; the decorated function returns an awaitable."""
+        if f is None:
+            return partial(self.setup, **kwargs)
+        return self._wrap(self.device._belay_setup(f, **kwargs))
+
+    def teardown(self, f: Optional[Callable] = None, **kwargs) -> Callable:
+        """Async equivalent of ``Device.teardown``; the decorated function returns an awaitable."""
+        if f is None:
+            return partial(self.teardown, **kwargs)
+        return self._wrap(self.device._belay_teardown(f, **kwargs))
+
+    def thread(self, f: Optional[Callable] = None, **kwargs) -> Callable:
+        """Async equivalent of ``Device.thread``; the decorated function returns an awaitable.
+
+        The function's source code is uploaded when decorated.
+        """
+        if f is None:
+            return partial(self.thread, **kwargs)
+        return self._wrap(self.device._belay_thread(f, **kwargs))
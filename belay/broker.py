@@ -0,0 +1,349 @@
+"""Share a single board connection between multiple host processes.
+
+``belay serve`` holds a ``Pyboard`` connection open in raw REPL mode, and serves
+requests from ``Device("unix://...")`` clients over a Unix domain socket.
+Requests are executed one at a time, so requests from different processes never interleave.
+
+Every message is the ``repr`` of a python literal, prefixed with its length as a 4-byte big-endian integer.
+
+* On connection, the daemon sends ``("hello", port, banner)``,
+  or ``("error", "ConnectionResetError", message)`` if it cannot (re-)open the board.
+
+* Clients send requests ``(method, args, kwargs)``, where ``method`` is one of ``METHODS``.
+  A ``data_consumer`` or ``progress_callback`` keyword argument is sent as ``True``.
+
+* The daemon replies with any number of ``("data", data)`` and ``("progress", written, total)`` messages,
+  followed by either ``("result", value)`` or ``("error", exception_name, message)``.
+
+If the connection to the board is lost (e.g. it was unplugged or reset), the daemon replies with a
+``ConnectionResetError`` error, and re-opens the board upon the next request or client connection.
+"""
+import ast
+import contextlib
+import itertools
+import os
+import re
+import socket
+import socketserver
+import struct
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Union
+
+from serial import SerialException
+
+from .exceptions import ConnectionFailedError, FeatureUnavailableError
+from .pyboard import Pyboard, PyboardError, PyboardException
+
+# ``Pyboard`` methods that clients may invoke.
+METHODS = frozenset({"exec", "fs_get", "fs_put"})
+
+_header = struct.Struct(">I")
+
+# Errors indicating that the connection to the board was lost.
+_CONNECTION_ERRORS = (SerialException, ConnectionResetError)
+# Errors while (re-)opening the board.
+_OPEN_ERRORS = (SerialException, ConnectionResetError, PyboardError)
+
+
+def _send(sock: socket.socket, message) -> None:
+    data = repr(message).encode()
+    sock.sendall(_header.pack(len(data)) + data)
+
+
+def _recv(stream):
+    header = stream.read(_header.size)
+    if len(header) < _header.size:
+        raise EOFError
+    (size,) = _header.unpack(header)
+    data = stream.read(size)
+    if len(data) < size:
+        raise EOFError
+    return ast.literal_eval(data.decode())
+
+
+def _recv_request(stream) -> tuple:
+    method, args, kwargs = _recv(stream)
+    if not isinstance(args, tuple) or not isinstance(kwargs, dict):
+        raise TypeError("expected (method, args, kwargs)")
+    return method, args, kwargs
+
+
+def default_socket_path(port: str) -> Path:
+    """Default socket of the ``belay serve`` daemon for ``port``."""
+    name = re.sub(r"[^\w.-]+", "_", port).strip("_")
+    return Path(tempfile.gettempdir()) / f"belay-{name}.sock"
+
+
+class RemotePyboard:
+    """``Pyboard`` stand-in that forwards requests to a ``belay serve`` daemon.
+
+    The daemon keeps the board in raw REPL mode; the board is never reset by clients.
+    """
+
+    serial = None
+
+    def __init__(self, path: Union[str, Path], attempts: int = 1):
+        """Connect to a ``belay serve`` daemon.
+
+        Parameters
+        ----------
+        path: Union[str, Path]
+            Unix domain socket the daemon is listening on.
+        attempts: int
+            Number of attempts to try and connect to the daemon.
+            If a ``<0`` value is provided, will infinitely try to connect.
+        """
+        if attempts == 0:
+            raise ValueError('"attempts" cannot be 0.')
+
+        for attempt_count in itertools.count(start=1):
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._stream = self._sock.makefile("rb")
+            try:
+                self._sock.connect(str(path))
+                kind, *payload = _recv(self._stream)
+            except (EOFError, OSError):
+                message = f'No "belay serve" daemon is listening on {path}.'
+            else:
+                if kind == "hello":
+                    break
+                # The daemon cannot (re-)open the board.
+                message = payload[-1]
+            self._stream.close()
+            self._sock.close()
+
+            if attempt_count == attempts:
+                raise ConnectionFailedError(message)
+
+            time.sleep(1.0)
+
+        self.port, self.banner = payload
+
+    def close(self):
+        if self._sock is None:
+            return
+        self._stream.close()
+        self._sock.close()
+        self._sock = None
+
+    def enter_raw_repl(self, soft_reset=True):
+        """The daemon keeps the board in raw REPL mode; other processes' state is never reset."""
+
+    def exit_raw_repl(self):
+        raise FeatureUnavailableError('Leaving raw REPL mode is not supported via "belay serve".')
+
+    def cancel_running_program(self):
+        """Requests are executed to completion by the daemon."""
+
+    def exec(self, command, data_consumer=None):
+        return self._request("exec", command, data_consumer=data_consumer)
+
+    def fs_get(self, src, dest, chunk_size=256, progress_callback=None):
+        return self._request("fs_get", src, dest, chunk_size=chunk_size, progress_callback=progress_callback)
+
+    def fs_put(self, src, dest, chunk_size=256, progress_callback=None):
+        return self._request("fs_put", src, dest, chunk_size=chunk_size, progress_callback=progress_callback)
+
+    def _request(self, method, *args, data_consumer=None, progress_callback=None, **kwargs):
+        # The daemon runs on the same host; resolve host paths relative to this process.
+        args = tuple(str(Path(arg).resolve()) if isinstance(arg, os.PathLike) else arg for arg in args)
+        if data_consumer is not None:
+            kwargs["data_consumer"] = True
+        if progress_callback is not None:
+            kwargs["progress_callback"] = True
+
+        if self._sock is None:
+            raise ConnectionResetError
+        try:
+            _send(self._sock, (method, args, kwargs))
+        except OSError as e:
+            raise ConnectionResetError from e
+
+        # Exceptions raised by callbacks are deferred until the whole response has been received.
+        callback_exception = None
+        while True:
+            try:
+                kind, *payload = _recv(self._stream)
+            except (EOFError, OSError) as e:
+                raise ConnectionResetError from e
+
+            if kind == "result":
+                if callback_exception is not None:
+                    raise callback_exception
+                return payload[0]
+            elif kind == "error":
+                name, message = payload
+                if name == "PyboardException":
+                    raise PyboardException(message)
+                if name == "ConnectionResetError":
+                    # Lets ``Device`` reconnect and replay its history.
+                    raise ConnectionResetError(message)
+                raise PyboardError(f"{name}: {message}")
+
+            if callback_exception is not None:
+                continue
+            try:
+                if kind == "data":
+                    data_consumer(*payload)
+                elif kind == "progress":
+                    progress_callback(*payload)
+            except Exception as e:
+                callback_exception = e
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: "BrokerServer"
+
+    def handle(self):
+        with self.server.lock:
+            try:
+                banner = self.server.open_board().banner
+            except _OPEN_ERRORS as e:
+                _send(self.request, ("error", "ConnectionResetError", str(e)))
+                return
+        _send(self.request, ("hello", self.server.port, banner))
+        while True:
+            try:
+                try:
+                    method, args, kwargs = _recv_request(self.rfile)
+                except (SyntaxError, TypeError, ValueError) as e:
+                    # The malformed message was read entirely, so the connection remains usable.
+                    _send(self.request, ("error", "ValueError", f"Malformed request: {e}"))
+                    continue
+                self._handle(method, args, kwargs)
+            except (EOFError, OSError):
+                # Client disconnected.
+                return
+
+    def _handle(self, method, args, kwargs):
+        if method not in METHODS:
+            _send(self.request, ("error", "ValueError", f"Unsupported method {method!r}."))
+            return
+
+        # Keep the board in a consistent state, even if the client disconnects mid-request.
+        client_alive = True
+
+        def send(message):
+            nonlocal client_alive
+            if not client_alive:
+                return
+            try:
+                _send(self.request, message)
+            except OSError:
+                client_alive = False
+
+        if kwargs.get("data_consumer"):
+            kwargs["data_consumer"] = lambda data: send(("data", bytes(data)))
+        if kwargs.get("progress_callback"):
+            kwargs["progress_callback"] = lambda written, total: send(("progress", written, total))
+
+        with self.server.lock:
+            try:
+                board = self.server.open_board()
+            except _OPEN_ERRORS as e:
+                send(("error", "ConnectionResetError", str(e)))
+                return
+            try:
+                result = getattr(board, method)(*args, **kwargs)
+            except PyboardException as e:
+                send(("error", "PyboardException", e.args[0]))
+                return
+            except _CONNECTION_ERRORS as e:
+                # The board was probably unplugged or reset; re-open it upon the next request.
+                self.server.close_board()
+                send(("error", "ConnectionResetError", str(e)))
+                return
+            except Exception as e:
+                send(("error", type(e).__name__, str(e)))
+                return
+        send(("result", result))
+
+
+class BrokerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Serves requests for a single board over a Unix domain socket."""
+
+    daemon_threads = True
+
+    def __init__(self, path: Union[str, Path], board: Pyboard, port: str, **board_kwargs):
+        """Create the server; call ``serve_forever`` to start serving.
+
+        Parameters
+        ----------
+        path: Union[str, Path]
+            Unix domain socket to listen on.
+        board: Pyboard
+            Board connection in raw REPL mode.
+        port: str
+            Port of ``board``, reported to clients.
+        board_kwargs
+            Passed along to ``Pyboard`` when re-opening the board after losing the connection.
+        """
+        self.board = board
+        self.port = port
+        self.board_kwargs = board_kwargs
+        self.lock = threading.Lock()
+        super().__init__(str(path), _Handler)
+
+    def open_board(self) -> Pyboard:
+        """Get the board connection, re-opening it if it was lost.
+
+        Must be called while holding ``self.lock``.
+        """
+        if self.board is None:
+            board = Pyboard(self.port, **self.board_kwargs)
+            try:
+                board.enter_raw_repl()
+            except BaseException:
+                board.close()
+                raise
+            self.board = board
+        return self.board
+
+    def close_board(self) -> None:
+        """Close the lost board connection; must be called while holding ``self.lock``."""
+        board, self.board = self.board, None
+        with contextlib.suppress(Exception):
+            board.close()
+
+
+def serve(port: str, path: Union[None, str, Path] = None, **kwargs) -> None:
+    """Hold a connection to the board at ``port`` and serve requests until interrupted.
+
+    Parameters
+    ----------
+    port: str
+        Port (like ``/dev/ttyUSB0``) of the board.
+    path: Union[None, str, Path]
+        Unix domain socket to listen on.
+        Defaults to ``default_socket_path(port)``.
+    kwargs
+        Passed along to ``Pyboard``.
+    """
+    path = Path(path) if path else default_socket_path(port)
+    if path.exists():
+        try:
+            RemotePyboard(path).close()
+        except ConnectionFailedError:
+            path.unlink()  # Stale socket from a previous daemon.
+        else:
+            raise ConnectionFailedError(f'A "belay serve" daemon is already listening on {path}.')
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    board = Pyboard(port, **kwargs)
+    server = None
+    try:
+        board.enter_raw_repl()
+        with BrokerServer(path, board, port, **kwargs) as server:
+            path.chmod(0o600)
+            try:
+                server.serve_forever()
+            finally:
+                path.unlink()
+    finally:
+        # The server may have re-opened the board.
+        board = server.board if server is not None else board
+        if board is not None:
+            board.close()
@@ -1,6 +1,9 @@
 from belay.pyboard import PyboardException
 
-help_port = "Port (like /dev/ttyUSB0) or WebSocket (like ws://192.168.1.100) of device."
+help_port = (
+    "Port (like /dev/ttyUSB0), WebSocket (like ws://192.168.1.100) "
+    "or belay serve socket (like unix:///tmp/belay-dev_ttyUSB0.sock) of device."
+)
 help_password = "Password for communication methods (like WebREPL) that require authentication."  # nosec  # noqa: S105
 
 
@@ -17,6 +17,7 @@ from belay.cli.install import install
 from belay.cli.new import new
 from belay.cli.run import run
 from belay.cli.select import select
+from belay.cli.serve import serve
 from belay.cli.sync import sync
 from belay.cli.terminal import terminal
 from belay.cli.update import update
@@ -32,6 +33,7 @@ app.command()(install)
 app.command()(new)
 app.command()(run)
 app.command()(select)
+app.command()(serve)
 app.command()(sync)
 app.command()(terminal)
 app.command()(update)
@@ -5,16 +5,17 @@ import questionary
 import typer
 from questionary import Choice
 
-from belay import Device, DeviceMeta
+from belay import AsyncDevice, Device, DeviceMeta
 from belay.cli.questionary_ext import press_any_key_to_continue, select_table
 from belay.usb_specifier import list_devices
 
 
 async def blink_loop(device):
+    device = AsyncDevice(device)
     while True:
-        device.led(True)
+        await device.led(True)
         await asyncio.sleep(0.5)
-        device.led(False)
+        await device.led(False)
         await asyncio.sleep(0.5)
 
 
@@ -0,0 +1,28 @@
+import contextlib
+from pathlib import Path
+from typing import Optional
+
+from typer import Argument, Option
+
+from belay.broker import default_socket_path
+from belay.broker import serve as serve_forever
+from belay.cli.common import help_password
+
+
+def serve(
+    port: str = Argument(..., help="Port (like /dev/ttyUSB0) or WebSocket (like ws://192.168.1.100) of device."),
+    socket: Optional[Path] = Option(
+        None, help="Unix domain socket to listen on. Defaults to a socket in the temporary directory named after PORT."
+    ),
+    password: str = Option("", help=help_password),
+):
+    """Share a device connection between multiple processes.
+
+    Holds the connection open, so that commands and scripts connecting to
+    ``unix://SOCKET`` skip opening and resetting the device.
+    Press ctrl+c to exit.
+    """
+    socket = socket or default_socket_path(port)
+    print(f"Serving {port} at unix://{socket}")
+    with contextlib.suppress(KeyboardInterrupt):
+        serve_forever(port, socket, password=password)
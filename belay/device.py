@@ -1,12 +1,16 @@
 import ast
 import atexit
+import binascii
 import concurrent.futures
 import contextlib
 import importlib.resources
 import linecache
+import queue
 import re
 import shutil
 import sys
+import threading
+from functools import partial, wraps
 from inspect import signature
 from pathlib import Path
 from tempfile import TemporaryDirectory
@@ -17,18 +21,29 @@ from serial import SerialException
 from serial.tools.miniterm import Miniterm
 from typing_extensions import ParamSpec
 
+from . import _codec
+from ._buffer import ReceiveBuffer
+from ._compress import compress_command
 from ._minify import minify as minify_code
+from .broker import RemotePyboard
 from .device_meta import DeviceMeta
-from .device_support import Implementation, MethodMetadata, sort_executers
+from .device_support import (
+    Implementation,
+    MethodMetadata,
+    load_implementation,
+    save_implementation,
+    sort_executers,
+)
 from .device_sync_support import (
     discover_files_dirs,
     generate_dst_dirs,
+    load_sync_cache,
     preprocess_ignore,
     preprocess_keep,
-    preprocess_src_file_hash,
 )
 from .exceptions import (
     ConnectionLost,
+    FeatureUnavailableError,
     InternalError,
     MaxHistoryLengthError,
     NotBelayResponseError,
@@ -40,10 +55,13 @@ from .executers import (
     TeardownExecuter,
     ThreadExecuter,
 )
+from .hash import fnv1a, fnv1a_bytes
 from .helpers import read_snippet, wraps_partial
-from .inspect import isexpression
-from .pyboard import Pyboard, PyboardError, PyboardException
+from .inspect import getsource, isexpression
+from .pyboard import Pyboard, PyboardError, PyboardException, SocketToSerial
+from .rpc import RpcDispatcher
 from .typing import BelayReturn, PathType
+from .usb_specifier import serial_number
 from .webrepl import WebreplToSerial
 
 P = ParamSpec("P")
@@ -59,6 +77,9 @@ def parse_belay_response(line):
     if code == "R":
         # Result
         return ast.literal_eval(line)
+    elif code == "B":
+        # Binary-encoded result
+        return _codec.unpack(binascii.a2b_base64(line))
     elif code == "S":
         # StopIteration
         raise StopIteration
@@ -66,6 +87,248 @@ def parse_belay_response(line):
         raise ValueError(f'Received unknown code: "{code}"')
 
 
+def rewrite_traceback(e: PyboardException, src_file: PathType, src_lineno: int, name: str) -> None:
+    """Reinterpret an on-device stacktrace in-place to point at the host source file.
+
+    Parameters
+    ----------
+    e: PyboardException
+        Exception raised from on-device code.
+    src_file: Union[str, Path]
+        Path to the file containing the code of function ``name``.
+    src_lineno: int
+        Line number into ``src_file`` that the function starts.
+    name: str
+        Name of the function.
+    """
+    src_file = str(src_file)
+    new_lines = []
+
+    msg = e.args[0]
+    lines = msg.split("\n")
+    for line in lines:
+        new_lines.append(line)
+
+        try:
+            file, lineno, fn = line.strip().split(",", 2)
+        except ValueError:
+            continue
+
+        # Code executed from a string (e.g. a cached task bundle) is reported as "<string>".
+        if file not in ('File "<stdin>"', 'File "<string>"') or fn != f" in {name}":
+            continue
+
+        lineno = int(lineno[6:]) - 1 + src_lineno
+
+        new_lines[-1] = f'  File "{src_file}", line {lineno},{fn}'
+
+        # Get what that line actually is.
+        new_lines.append("    " + linecache.getline(src_file, lineno).strip())
+    new_msg = "\n".join(new_lines)
+    e.args = (new_msg,)
+
+
+def _locked(method):
+    """Decorator that holds ``Device._lock`` while executing a ``Device`` method."""
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+def _put_progress(progress_update: Callable, index: int, written: int, total: int) -> None:
+    """``fs_put`` progress callback; advances the sync progress by the fraction of file ``index`` written."""
+    if total:
+        progress_update(completed=index + written / total)
+
+
+class Batch:
+    """Queues task calls so they can be executed in a single round trip.
+
+    Obtained via ``Device.batch``. While the batch is active, calling a task
+    returns a ``concurrent.futures.Future`` instead of the task's result.
+    On context manager exit, all queued calls are executed on-device
+    with a single command, and the futures are resolved.
+    If an exception is raised inside the ``with`` block, the queued calls
+    are discarded and their futures are cancelled.
+    """
+
+    def __init__(self, device: "Device"):
+        self._device = device
+        self._calls = []
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def __enter__(self):
+        if self._device._batch is not None:
+            raise ValueError("Batches cannot be nested.")
+        self._device._batch = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        self._device._batch = None
+        if exc_type is None:
+            self.execute()
+        else:
+            for *_, future in self._calls:
+                future.cancel()
+            self._calls.clear()
+
+    def submit(
+        self,
+        src_file: PathType,
+        src_lineno: int,
+        name: str,
+        cmd: str,
+        record: bool = False,
+        binary: bool = False,
+        numpy: bool = False,
+    ) -> concurrent.futures.Future:
+        """Queue the execution of ``cmd``.
+
+        See ``Device._traceback_execute`` for parameter descriptions.
+        If any queued call is ``binary``, the results of all calls are binary-encoded.
+
+        Returns
+        -------
+        concurrent.futures.Future
+            Resolved after the batch has been executed.
+        """
+        future = concurrent.futures.Future()
+        self._calls.append((src_file, src_lineno, name, cmd, record, binary, numpy, future))
+        return future
+
+    def execute(self) -> None:
+        """Execute all queued calls on-device in a single command.
+
+        Automatically called on context manager exit.
+        """
+        calls, self._calls = self._calls, []
+        if not calls:
+            return
+
+        cmd = "__belay_batch(" + ",".join(f"lambda:{call[3]}" for call in calls) + ")"
+        binary = any(call[5] for call in calls)
+        try:
+            results = self._device(cmd, record=False, binary=binary)
+        except BaseException as e:
+            for *_, future in calls:
+                future.set_exception(e)
+            raise
+
+        for (src_file, src_lineno, name, cmd, record, _, numpy, future), (status, value) in zip(calls, results):
+            if status:
+                e = PyboardException(value)
+                rewrite_traceback(e, src_file, src_lineno, name)
+                future.set_exception(e)
+            else:
+                if record:
+                    self._device._record(cmd)
+                future.set_result(_codec.to_numpy(value) if numpy else value)
+
+
+class IoWorker:
+    """Background thread that executes device requests submitted by other threads.
+
+    Task calls that are queued while the device is busy are executed together
+    as a single ``Batch``.
+    """
+
+    def __init__(self, device: "Device"):
+        self._device = device
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="belay-io", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn: Callable[..., R], *args, **kwargs) -> concurrent.futures.Future:
+        """Execute ``fn(*args, **kwargs)`` in the worker thread.
+
+        Returns
+        -------
+        concurrent.futures.Future
+            Resolved with the return value of ``fn``.
+        """
+        future = concurrent.futures.Future()
+        self._queue.put((fn, args, kwargs, None, future))
+        return future
+
+    def submit_call(self, execute: Callable[[], R], call: Callable[[], tuple]) -> concurrent.futures.Future:
+        """Execute a task call in the worker thread, possibly coalesced with other task calls.
+
+        Parameters
+        ----------
+        execute: Callable
+            Executes the task call on its own.
+        call: Callable
+            Returns the arguments for ``Batch.submit`` that execute the same task call.
+            Invoked in the worker thread, as preparing the arguments may communicate with the device.
+
+        Returns
+        -------
+        concurrent.futures.Future
+            Resolved with the result of the task call.
+        """
+        future = concurrent.futures.Future()
+        self._queue.put((execute, (), {}, call, future))
+        return future
+
+    def stop(self) -> None:
+        """Execute all previously submitted requests, then stop the worker thread."""
+        self._queue.put(None)
+        if threading.current_thread() is not self._thread:
+            self._thread.join()
+
+    def _run(self):
+        running = True
+        while running:
+            requests = [self._queue.get()]
+            with self._device._lock:
+                # Coalesce all requests that arrived while waiting for the device.
+                with contextlib.suppress(queue.Empty):
+                    while True:
+                        requests.append(self._queue.get_nowait())
+                if None in requests:
+                    running = False
+                    requests = [request for request in requests if request is not None]
+
+                calls = []
+                for request in requests:
+                    if request[3] is not None:
+                        calls.append(request)
+                        continue
+                    self._execute_calls(calls)
+                    calls = []
+                    self._execute(*request)
+                self._execute_calls(calls)
+
+    @staticmethod
+    def _execute(fn, args, kwargs, _, future):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+
+    def _execute_calls(self, calls):
+        if len(calls) == 1:
+            self._execute(*calls[0])
+        elif calls:
+            batch = Batch(self._device)
+            for *_, call, future in calls:
+                try:
+                    batch._calls.append((*call(), future))
+                except BaseException as e:
+                    if future.set_running_or_notify_cancel():
+                        future.set_exception(e)
+            with contextlib.suppress(BaseException):
+                batch.execute()  # Exceptions are set on the futures.
+
+
 class Device(metaclass=DeviceMeta):
     """Belay interface into a micropython device.
 
@@ -81,11 +344,19 @@ class Device(metaclass=DeviceMeta):
 
     MAX_CMD_HISTORY_LEN = 1000
 
+    # On-device directory where task bundles are stored when ``cache=True``.
+    CACHE_DIR = "/.belay"
+
     def __init__(
         self,
         *args,
         startup: Optional[str] = None,
         attempts: int = 0,
+        rpc: bool = False,
+        lazy: bool = False,
+        cache: bool = False,
+        warm: bool = False,
+        compress: bool = True,
         **kwargs,
     ):
         """Create a MicroPython device.
@@ -97,20 +368,72 @@ class Device(metaclass=DeviceMeta):
         attempts: int
             If device disconnects, attempt to re-connect this many times (with 1 second between attempts).
             WARNING: this may result in unexpectedly long blocking calls when reconnecting!
+        rpc: bool
+            Invoke non-generator tasks through a persistent on-device dispatcher loop
+            instead of compiling a command for every call.
+            Falls back to the raw REPL if the device doesn't support it, or if
+            the arguments cannot be binary-encoded.
+            Unavailable when connected via ``belay serve``.
+            Defaults to ``False``.
+        lazy: bool
+            Default value for the ``lazy`` argument of ``task``.
+            If ``True``, a task's source code is only sent to the device upon its first invocation.
+            Defaults to ``False``.
+        cache: bool
+            Store the minified source code of class-level tasks and threads in a file on the device's
+            filesystem (in ``CACHE_DIR``), named by the hash of its contents.
+            When creating the device again with unchanged code, the stored file is executed instead of
+            re-sending the source code. Any change to the code results in a different hash,
+            replacing the stored file.
+            Defaults to ``False``.
+        warm: bool
+            Attach to the device without a soft reset, keeping the device's state.
+            If the device still holds the same session (i.e. the same ``Device`` class was last
+            initialized with identical code), definitions and ``setup(autoinit=True)`` methods are not re-executed.
+            Defaults to ``False``.
+        compress: bool
+            If the device can decompress zlib streams, send large commands and files compressed.
+            Defaults to ``True``.
         """
         self._board_kwargs = signature(Pyboard).bind(*args, **kwargs).arguments
         self.attempts = attempts
-        self._cmd_history = []
+        self._cmd_history = {}
+        self._cmd_history_overflow = False
+        self._rpc = None
+        self._rpc_task_ids = {}
+        self._local = threading.local()
+        self._lock = threading.RLock()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self._batch = None
+        self._codec_loaded = False
+        self._upload_bundle = None
+        self._lazy = lazy
+        self._resident_tasks = {}
+        self._cache = cache
+        self._warm = warm
+        self._record_only = False
+        self._decompressor = ""
 
         self._connect_to_board(**self._board_kwargs)
 
-        self._exec_snippet("startup")
+        # Collect all definitions into a single upload.
+        self._upload_bundle = []
+        self._upload(read_snippet("startup"))
+
+        if rpc and not isinstance(self._board, RemotePyboard):
+            try:
+                self._exec_snippet("codec", "rpc")
+            except PyboardException:
+                pass  # Device is missing a required module; use the raw REPL.
+            else:
+                self._codec_loaded = True
+                self._rpc = RpcDispatcher(self._board)
 
         # Obtain implementation early on so implementation-specific executers can be bound.
-        self.implementation = Implementation(
-            *self("(sys.implementation.name, sys.implementation.version, sys.platform)"),
-            emitters=self._emitter_check(),
-        )
+        self.implementation = self._probe_implementation()
+        if compress:
+            self._decompressor = self._board.decompressor = self.implementation.decompressor
 
         # Setup executer generators and bind to private attributes.
         executer_generators = {}
@@ -154,16 +477,33 @@ class Device(metaclass=DeviceMeta):
 
         if startup is None:
             if self.implementation.name == "circuitpython":
-                self._exec_snippet("convenience_imports_circuitpython")
+                self._upload(read_snippet("convenience_imports_circuitpython"))
             else:
-                self._exec_snippet("convenience_imports_micropython")
+                self._upload(read_snippet("convenience_imports_micropython"))
         elif startup:
-            self(startup)
+            self._upload(startup)
+
+        # When attaching warm, skip executing what the device already holds from a previous session.
+        session = self._session_fingerprint(autoinit_executers) if warm else None
+        resumed = session is not None and self("globals().get('__belay_session')", record=False) == session
+        if resumed:
+            # Still record the definitions for playback upon reconnect.
+            bundle, self._upload_bundle = self._upload_bundle, None
+            self._record("\n".join(bundle))
+        else:
+            self._flush_uploads()
 
         self.__pre_autoinit__()
 
-        for executer in sort_executers(autoinit_executers):
-            executer()
+        self._record_only = resumed
+        try:
+            for executer in sort_executers(autoinit_executers):
+                executer()
+        finally:
+            self._record_only = False
+
+        if session is not None and not resumed:
+            self(f"__belay_session = {session}", record=False)
 
         atexit.register(self.close)
 
@@ -183,56 +523,100 @@ class Device(metaclass=DeviceMeta):
         """Runs at the very end of ``__init__``."""
         pass
 
-    def _emitter_check(self):
-        # Detect which emitters are available
-        emitters = []
-        try:
-            self._exec_snippet("emitter_check")
-        except PyboardException as e:
-            if "invalid micropython decorator" not in str(e):
-                raise
-            # Get line of exception
-            line_e = int(re.findall(r"line (\d+)", str(e))[-1])
-            if line_e == 1:
-                # No emitters available
-                pass
-            else:
-                emitters.append("native")
-                if line_e == 3:
-                    # viper is not available
-                    pass
-                else:
-                    raise InternalError(f"Unknown emitter line {line_e}.") from e
-        else:
-            emitters.append("native")
-            emitters.append("viper")
-            self("del __belay_emitter_test")
+    def _probe_implementation(self) -> Implementation:
+        """Query the implementation details and available emitters of the device.
 
-        return tuple(emitters)
+        For USB devices, results are cached host-side, keyed by the device's serial number
+        and its firmware version (from the REPL banner), so known boards aren't probed again.
+        """
+        key = self._implementation_cache_key()
+        implementation = load_implementation(key) if key else None
+        if implementation is not None:
+            return implementation
+
+        name, version, platform, decompressor, *emitters = self(
+            read_snippet("probe") + "\nprint('_BELAYR' + repr(__belay_probe()))\ndel __belay_probe",
+            record=False,
+        )
+        implementation = Implementation(name, version, platform, tuple(emitters), decompressor)
+        if key:
+            save_implementation(key, implementation)
+        return implementation
+
+    def _implementation_cache_key(self) -> Optional[str]:
+        """Identify the connected board and firmware; ``None`` if it cannot be uniquely identified."""
+        port = getattr(self._board.serial, "port", None)
+        if not isinstance(port, str):
+            return None
+        firmware = re.search(rb"\w*Python v?\d[^\r\n]*", self._board.banner)
+        if not firmware:
+            return None
+        usb_serial_number = serial_number(port)
+        if not usb_serial_number:
+            return None
+        return f"{usb_serial_number} {firmware.group().decode(errors='replace').strip()}"
+
+    def _session_fingerprint(self, autoinit_executers) -> int:
+        """Hash of all code executed during ``__init__``, identifying the device's session in warm mode."""
+        h = fnv1a_bytes("\n".join(self._upload_bundle).encode())
+        for executer in autoinit_executers:
+            h = fnv1a_bytes(getsource(executer.__wrapped__)[0].encode(), h)
+        return h
 
     def _connect_to_board(self, **kwargs):
+        device = kwargs.get("device")
+        if isinstance(device, str) and device.startswith("unix://"):
+            self._board = RemotePyboard(device[len("unix://") :], attempts=kwargs.get("attempts", 1))
+            return
         self._board = Pyboard(**kwargs)
-        soft_reset = not isinstance(self._board.serial, WebreplToSerial)
+        self._board.decompressor = self._decompressor
+        # Soft resets would close WebREPL and raw TCP connections.
+        # Telnet (a ``SocketToSerial`` subclass) survives soft resets, so keeps resetting.
+        network = isinstance(self._board.serial, WebreplToSerial) or type(self._board.serial) is SocketToSerial
+        soft_reset = not self._warm and not network
         self._board.enter_raw_repl(soft_reset=soft_reset)
 
-    def _exec_snippet(self, *names: str) -> BelayReturn:
+    def _hf_snippet(self) -> str:
+        """Name of the fastest snippet defining the on-device file hash function ``__belay_hf``."""
+        if "viper" in self.implementation.emitters:
+            return "hf_viper"
+        elif "native" in self.implementation.emitters:
+            return "hf_native"
+        else:
+            return "hf"
+
+    def _exec_snippet(self, *names: str, record: bool = True) -> BelayReturn:
         """Load and execute a snippet from the snippets sub-package.
 
         Parameters
         ----------
         names : str
             Snippet(s) to load and execute.
+        record: bool
+            Record the snippets for state-reconstruction if device is accidentally reset.
+            Defaults to ``True``.
         """
         snippets = [read_snippet(name) for name in names]
-        return self("\n".join(snippets))
+        return self("\n".join(snippets), record=record)
+
+    @property
+    def _batch(self) -> Optional[Batch]:
+        """Batch that is active in the current thread."""
+        return getattr(self._local, "batch", None)
 
+    @_batch.setter
+    def _batch(self, batch: Optional[Batch]):
+        self._local.batch = batch
+
+    @_locked
     def __call__(
         self,
         cmd: str,
         *,
         minify: bool = True,
         stream_out: TextIO = sys.stdout,
-        record=True,
+        record: Union[bool, str] = True,
+        binary: bool = False,
     ):
         """Execute code on-device.
 
@@ -244,26 +628,43 @@ class Device(metaclass=DeviceMeta):
             Minify ``cmd`` code prior to sending.
             Reduces the number of characters that need to be transmitted.
             Defaults to ``True``.
-        record: bool
+        record: Union[bool, str]
             Record the call for state-reconstruction if device is accidentally reset.
+            If a string, the call replaces an earlier call recorded with the same string.
             Defaults to ``True``.
+        binary: bool
+            Transfer the result of an expression in a compact binary encoding instead of its ``repr``.
+            ``bytes``, ``bytearray`` and ``array.array`` are transferred as raw data.
+            Defaults to ``False``.
 
         Returns
         -------
             Correctly interpreted return value from executing code on-device.
         """
+        if self._rpc is not None:
+            self._rpc.stop()
+
         if minify:
             cmd = minify_code(cmd)
 
         if isexpression(cmd):
             # Belay Tasks are inherently expressions as well.
-            cmd = f"print('_BELAYR' + repr({cmd}))"
+            if binary:
+                self._load_codec()
+                cmd = f"print('_BELAYB' + __belay_b64({cmd}), end='')"
+            else:
+                cmd = f"print('_BELAYR' + repr({cmd}))"
 
-        if record and self.attempts and len(self._cmd_history) < self.MAX_CMD_HISTORY_LEN:
-            self._cmd_history.append(cmd)
+        if record:
+            self._record(cmd, key=record if isinstance(record, str) else None)
+        if self._record_only:
+            return None
+
+        # Only the transferred command is compressed; the history holds the original.
+        cmd = compress_command(cmd, self._decompressor)
 
         out = None  # Used to store the parsed response object.
-        data_consumer_buffer = bytearray()
+        data_consumer_buffer = ReceiveBuffer()
 
         def data_consumer(data):
             """Handle input data stream immediately."""
@@ -272,10 +673,8 @@ class Device(metaclass=DeviceMeta):
             if not data:
                 return
             data_consumer_buffer.extend(data)
-            while (i := data_consumer_buffer.find(b"\n")) >= 0:
-                i += 1
-                line = data_consumer_buffer[:i].decode()
-                data_consumer_buffer[:] = data_consumer_buffer[i:]
+            while (line := data_consumer_buffer.readuntil(b"\n")) is not None:
+                line = line.decode()
                 try:
                     out = parse_belay_response(line)
                 except NotBelayResponseError:
@@ -294,6 +693,180 @@ class Device(metaclass=DeviceMeta):
 
         return out
 
+    def _load_codec(self) -> None:
+        """Load the on-device binary codec (``snippets/codec.py``), if not already loaded."""
+        if self._codec_loaded:
+            return
+        try:
+            self._upload(read_snippet("codec"))
+        except PyboardException as e:
+            raise FeatureUnavailableError("Binary encoding is not supported on this device.") from e
+        self._codec_loaded = True
+
+    def _upload(self, src_code: str, minify: bool = True, key: Optional[str] = None) -> int:
+        """Execute definitions (e.g. function source code) on-device.
+
+        While the ``Device`` is being initialized, the code is collected instead,
+        and all definitions are uploaded together in a single command by ``_flush_uploads``.
+
+        Parameters
+        ----------
+        src_code: str
+            Python code to execute.
+        minify: bool
+            Minify ``src_code`` prior to sending.
+            Defaults to ``True``.
+        key: Optional[str]
+            Command history key; see ``_record``.
+
+        Returns
+        -------
+        int
+            Number of lines preceding ``src_code`` in the executed command.
+            On-device line numbers must be offset by this for traceback rewriting.
+        """
+        if self._upload_bundle is None:
+            if minify:
+                src_code = minify_code(src_code)
+            self(src_code, minify=False, record=False)
+            self._record(src_code, key=key)
+            return 0
+        offset = sum(code.count("\n") + 1 for code in self._upload_bundle)
+        self._upload_bundle.append(minify_code(src_code) if minify else src_code)
+        return offset
+
+    def _upload_task(self, name: str, src_code: str, minify: bool = True) -> None:
+        """Upload the source code of a lazy task, if it isn't already resident on-device.
+
+        Resident tasks are re-uploaded by ``reconnect``.
+        """
+        if self._resident_tasks.get(name) == (src_code, minify):
+            return
+        self(src_code, minify=minify, record=False)
+        self._resident_tasks[name] = (src_code, minify)
+
+    def _flush_uploads(self) -> None:
+        """Upload all collected definitions in a single command, and stop collecting."""
+        bundle, self._upload_bundle = self._upload_bundle, None
+        if not bundle:
+            return
+        src_code = "\n".join(bundle)
+        if self._cache:
+            self._exec_cached(src_code)
+        else:
+            self(src_code, minify=False)
+
+    def _exec_cached(self, src_code: str) -> None:
+        """Execute ``src_code`` from a file stored on-device, storing it first if necessary.
+
+        The file is named after the device class (including a hash of its module and qualified name,
+        so that equally named classes don't share files) and the hash of ``src_code``.
+        The stored file is only executed if its on-device hash matches.
+        Stale files of the same device class are removed when storing a new one.
+        If the device's filesystem isn't writable, ``src_code`` is executed directly.
+        """
+        cls = type(self)
+        prefix = f"{cls.__name__.lower()}-{fnv1a_bytes(f'{cls.__module__}.{cls.__qualname__}'.encode()):08x}-"
+        with TemporaryDirectory() as tmp_dir:
+            src_file = Path(tmp_dir) / "bundle.py"
+            src_file.write_text(src_code)
+            src_hash = fnv1a(src_file)
+            dst_file = f"{self.CACHE_DIR}/{prefix}{src_hash:08x}.py"
+
+            # Only ``src_code`` itself is recorded, below; replaying it doesn't need the cache.
+            self._exec_snippet(self._hf_snippet(), "task_cache", record=False)
+            cmd = f"__belay_cache_exec({dst_file!r}, {src_hash})"
+            if not self(cmd, record=False):
+                try:
+                    self(f"__belay_cache_clean({self.CACHE_DIR!r}, {prefix!r})", record=False)
+                    self._board.fs_put(src_file, dst_file)
+                except PyboardException:
+                    self(src_code, minify=False)
+                    return
+                self(cmd, record=False)
+
+        # Record the code itself, so reconnecting doesn't depend on the stored file.
+        self._record(src_code)
+
+    def _record(self, cmd: str, key: Optional[str] = None) -> None:
+        """Record ``cmd`` for state-reconstruction if device is accidentally reset.
+
+        A command recorded with the same ``key`` as an earlier one replaces it in place,
+        so the replay order of commands that depend on it is preserved.
+        Commands without a ``key`` are always recorded, since they may not be idempotent.
+        Once the history is full, further commands are dropped and ``reconnect`` raises ``MaxHistoryLengthError``.
+
+        Parameters
+        ----------
+        cmd: str
+            Command to record.
+        key: Optional[str]
+            Identifies commands that supersede each other,
+            e.g. different versions of a function definition, or calls of the same ``setup`` function.
+        """
+        if not self.attempts:
+            return
+        if key is not None and key in self._cmd_history:
+            self._cmd_history[key] = cmd
+            return
+        if len(self._cmd_history) >= self.MAX_CMD_HISTORY_LEN:
+            self._cmd_history_overflow = True
+            return
+        if key is None:
+            key = object()  # Unique; unkeyed commands never supersede each other.
+        self._cmd_history[key] = cmd
+
+    def _execute_task(self, execute: Callable[[], R], call: Callable[[], tuple]) -> R:
+        """Execute a task call; safe to be invoked from multiple threads.
+
+        If the device is busy serving another thread, the call is queued for the ``IoWorker``,
+        which executes all calls queued in the meantime as a single batch.
+
+        Parameters
+        ----------
+        execute: Callable
+            Executes the task call on its own.
+        call: Callable
+            Returns the arguments for ``Batch.submit`` that execute the same task call.
+        """
+        if self._lock.acquire(blocking=False):
+            try:
+                return execute()
+            finally:
+                self._lock.release()
+
+        return self._get_worker().submit_call(execute, call).result()
+
+    def _get_worker(self) -> IoWorker:
+        """Get the ``IoWorker``, starting it if necessary."""
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = IoWorker(self)
+            return self._worker
+
+    def batch(self) -> Batch:
+        """Execute task calls in a single round trip.
+
+        Calling a task inside the ``with`` block returns a ``concurrent.futures.Future``.
+        All queued calls are sent to the device as one command on block exit.
+
+        .. code-block:: python
+
+            with device.batch():
+                led = device.set_led(True)
+                temperature = device.read_temperature()
+            print(temperature.result())
+
+        Only non-generator tasks are batched; any other command is executed immediately.
+
+        Returns
+        -------
+        Batch
+            Context manager that queues task calls.
+        """
+        return Batch(self)
+
+    @_locked
     def sync(
         self,
         folder: PathType,
@@ -352,12 +925,7 @@ class Device(metaclass=DeviceMeta):
 
         if progress_update:
             progress_update(description="Bootstrapping sync...")
-        if "viper" in self.implementation.emitters:
-            snippets_to_execute.append("hf_viper")
-        elif "native" in self.implementation.emitters:
-            snippets_to_execute.append("hf_native")
-        else:
-            snippets_to_execute.append("hf")
+        snippets_to_execute.append(self._hf_snippet())
 
         if self.implementation.name == "circuitpython":
             snippets_to_execute.append("ilistdir_circuitpython")
@@ -384,7 +952,8 @@ class Device(metaclass=DeviceMeta):
         if keep_all:
             self("del __belay_del_fs")
         else:
-            self(f"__belay_del_fs({repr(dst)}, {repr(set(keep + dst_files))}); del __belay_del_fs")
+            # Never delete task bundles stored by ``Device(..., cache=True)``.
+            self(f"__belay_del_fs({repr(dst)}, {repr(set(keep + dst_files + [self.CACHE_DIR]))}); del __belay_del_fs")
 
         # Try and make all remote dirs
         if dst_dirs:
@@ -392,13 +961,19 @@ class Device(metaclass=DeviceMeta):
                 progress_update(description="Creating remote directories...")
             self(f"__belay_mkdirs({repr(dst_dirs)})")
 
+        # Preprocessed files and their hashes are cached on-host between syncs.
+        sync_cache = load_sync_cache()
+        src_root = folder.parent if folder.is_file() else folder
+
         with TemporaryDirectory() as tmp_dir, concurrent.futures.ThreadPoolExecutor() as executor:
             tmp_dir = Path(tmp_dir)
 
-            def _preprocess_src_file_hash_helper(src_file):
-                return preprocess_src_file_hash(tmp_dir, src_file, minify, mpy_cross_binary)
+            def _preprocess_src_file_hash_helper(src_file, dst_file):
+                return sync_cache.preprocess_src_file_hash(
+                    tmp_dir, src_file, src_root, dst_file, minify, mpy_cross_binary
+                )
 
-            src_files_and_hashes = executor.map(_preprocess_src_file_hash_helper, src_files)
+            src_files_and_hashes = executor.map(_preprocess_src_file_hash_helper, src_files, dst_files)
 
             # Get all remote hashes
             if progress_update:
@@ -412,16 +987,21 @@ class Device(metaclass=DeviceMeta):
             for (src_file, src_hash), dst_file, dst_hash in zip(src_files_and_hashes, dst_files, dst_hashes):
                 if src_hash != dst_hash:
                     puts.append((src_file, dst_file))
+            # Like on-device files, drop cache entries within ``dst`` that weren't synced.
+            sync_cache.save(prune=None if keep_all else dst, keep=keep)
 
             if progress_update:
                 progress_update(total=len(puts))
 
-            for src_file, dst_file in puts:
+            for i, (src_file, dst_file) in enumerate(puts):
                 if progress_update:
                     progress_update(description=f"Pushing: {dst_file[1:]}")
-                self._board.fs_put(src_file, dst_file)
-                if progress_update:
-                    progress_update(advance=1)
+                    # Advance fractionally while large files are being transferred.
+                    progress_callback = partial(_put_progress, progress_update, i)
+                    self._board.fs_put(src_file, dst_file, progress_callback=progress_callback)
+                    progress_update(completed=i + 1)
+                else:
+                    self._board.fs_put(src_file, dst_file)
 
     def sync_dependencies(
         self,
@@ -479,6 +1059,53 @@ class Device(metaclass=DeviceMeta):
                     shutil.copytree(f, tmp_dir, dirs_exist_ok=True)
             self.sync(tmp_dir, dst=dst, **kwargs)
 
+    @_locked
+    def install_tcp_server(
+        self,
+        port: int = SocketToSerial.default_port,
+        password: Optional[str] = None,
+        host: str = "0.0.0.0",  # nosec
+    ) -> None:
+        """Install an on-device server that provides the REPL over a raw TCP socket.
+
+        The server is written to ``/belay_tcp.py`` and started at the end of ``boot.py``,
+        so ``boot.py`` must connect to the network beforehand.
+        After a reboot, connect to the device via ``Device("tcp://192.168.1.100:8267", password=...)``.
+        Compared to WebREPL, there is no websocket framing overhead.
+
+        Like WebREPL, clients must send the password, and only one client may be connected at a time.
+        The connection is not encrypted; anyone on the network can eavesdrop on it.
+
+        Parameters
+        ----------
+        port: int
+            TCP port to listen on.
+            Defaults to ``8267``.
+        password: Optional[str]
+            Password clients must send prior to accessing the REPL.
+            Stored in plain text in ``boot.py``.
+            Defaults to WebREPL's password in the device's ``webrepl_cfg.py``.
+        host: str
+            Address to listen on.
+            Defaults to all interfaces, ``"0.0.0.0"``.
+        """
+        if self._rpc is not None:
+            self._rpc.stop()
+        if password is None:
+            try:
+                self("import webrepl_cfg", record=False)
+            except PyboardException as e:
+                raise ValueError("No password given, and the device has no webrepl_cfg.py.") from e
+
+        with TemporaryDirectory() as tmp_dir:
+            src_file = Path(tmp_dir) / "belay_tcp.py"
+            src_file.write_text(read_snippet("tcp_server"))
+            self._board.fs_put(src_file, "/belay_tcp.py")
+
+        self._exec_snippet("boot_append")
+        start = f"import belay_tcp\nbelay_tcp.start({port!r}, {password!r}, {host!r})\n"
+        self(f"__belay_boot_append({start!r})", record=False)
+
     def __enter__(self):
         return self
 
@@ -497,14 +1124,23 @@ class Device(metaclass=DeviceMeta):
 
         atexit.unregister(self.close)
 
-        self._board.cancel_running_program()
+        # Let the worker finish requests from other threads first.
+        if self._worker is not None:
+            self._worker.stop()
+            self._worker = None
+
+        with self._lock:
+            if self._rpc is not None:
+                self._rpc.stop()
+            self._board.cancel_running_program()
 
-        for executer in sort_executers(self._belay_teardown._belay_executers):
-            executer()
+            for executer in sort_executers(self._belay_teardown._belay_executers):
+                executer()
 
-        self._board.close()
-        self._board = None
+            self._board.close()
+            self._board = None
 
+    @_locked
     def reconnect(self, attempts: Optional[int] = None) -> None:
         """Reconnect to the device and replay the command history.
 
@@ -515,7 +1151,7 @@ class Device(metaclass=DeviceMeta):
             If ``None``, defaults to whatever value was supplied to init.
             If init value is 0, then defaults to 1.
         """
-        if len(self._cmd_history) == self.MAX_CMD_HISTORY_LEN:
+        if self._cmd_history_overflow:
             raise MaxHistoryLengthError
 
         kwargs = self._board_kwargs.copy()
@@ -528,9 +1164,16 @@ class Device(metaclass=DeviceMeta):
         except PyboardError as e:
             raise ConnectionLost from e
 
-        # Playback the history
-        for cmd in self._cmd_history:
-            self(cmd, record=False)
+        if self._rpc is not None:
+            self._rpc = RpcDispatcher(self._board)
+
+        # Playback the history in a single command.
+        if self._cmd_history:
+            self("\n".join(self._cmd_history.values()), minify=False, record=False)
+
+        # Re-upload lazy tasks that were resident prior to disconnecting.
+        for src_code, minify in self._resident_tasks.values():
+            self(src_code, minify=minify, record=False)
 
     @overload
     @staticmethod
@@ -663,7 +1306,7 @@ class Device(metaclass=DeviceMeta):
     ) -> Union[Callable[[Callable[P, R]], Callable[P, R]], Callable[P, R]]:
         """Execute decorated function on-device.
 
-        Sends source code to device at decoration time.
+        Sends source code to device at decoration time (or at first invocation, if ``lazy``).
         Execution sends involves much smaller overhead.
 
         Can either be used as a staticmethod ``@Device.task`` for marking methods in a subclass of ``Device``, or as a standard method ``@device.task`` for marking functions to a specific ``Device`` instance.
@@ -682,6 +1325,26 @@ class Device(metaclass=DeviceMeta):
             Each invocation of the executer is recorded for playback upon reconnect.
             Only recommended to be set to ``True`` for a setup-like function.
             Defaults to ``False``.
+        lazy: Optional[bool]
+            Defer sending the source code to the device until the task is first invoked.
+            Lazily uploaded tasks are tracked, and transparently re-uploaded upon ``reconnect``.
+            Recorded tasks (``record=True``) are always uploaded immediately,
+            so that their definition precedes their calls in the command history.
+            Defaults to ``None``, which uses the value supplied to ``Device``'s init.
+        prefetch: Optional[int]
+            Generator tasks only. Maximum number of items the device yields per round trip;
+            items are buffered host-side. Set to ``1`` to advance the generator exactly in step with the host.
+            Defaults to ``None``, which adapts the number of items to how fast the host consumes them.
+            Generators that use sent values (e.g. ``x = yield y``) are not prefetched by default.
+        binary: bool
+            Transfer results in a compact binary encoding instead of their ``repr``.
+            ``bytes``, ``bytearray`` and ``array.array`` results are transferred as raw data.
+            Return annotations never change the wire format; binary encoding must be opted into.
+            Defaults to ``False``.
+        numpy: bool
+            Convert returned ``array.array`` into ``numpy.ndarray`` without copying. Implies ``binary=True``.
+            Automatically enabled for binary tasks whose return annotation is ``numpy.ndarray``.
+            Defaults to ``False``.
         implementation: str
             If supplied, the provided method will **only** be used if the board's implementation **name** matches.
             Several methods of the same name can be overloaded that support different implementations.
@@ -736,8 +1399,11 @@ class Device(metaclass=DeviceMeta):
         f.__belay__ = MethodMetadata(executer=ThreadExecuter, implementation=implementation, kwargs=kwargs)
         return f
 
+    @_locked
     def terminal(self, *, exit_char=chr(0x1D)):
         """Start a blocking interactive terminal over the serial port."""
+        if self._rpc is not None:
+            self._rpc.stop()
         self._board.exit_raw_repl()  # In case we were previously in raw repl mode.
         miniterm = Miniterm(self._board.serial)
         miniterm.set_rx_encoding("UTF-8")
@@ -748,10 +1414,13 @@ class Device(metaclass=DeviceMeta):
             miniterm.join(True)
         miniterm.join()
 
+    @_locked
     def soft_reset(self):
         """Reset device, executing ``main.py`` if available."""
         # When in Raw REPL, ctrl-d will perform a reset, but won't execute ``main.py``
         # https://github.com/micropython/micropython/issues/2249
+        if self._rpc is not None:
+            self._rpc.stop()
         self._board.exit_raw_repl()
         self._board.read_until(b">>>")
         self._board.ctrl_d()
@@ -762,7 +1431,8 @@ class Device(metaclass=DeviceMeta):
         src_lineno: int,
         name: str,
         cmd: str,
-        record: bool = True,
+        record: Union[bool, str] = True,
+        binary: bool = False,
     ):
         """Invoke ``cmd``, and reinterprets raised stacktrace in ``PyboardException``.
 
@@ -776,41 +1446,66 @@ class Device(metaclass=DeviceMeta):
             Name of the function.
         cmd: str
             Python command that executes a function on-device.
-        record: bool
+        record: Union[bool, str]
             Record the call for state-reconstruction if device is accidentally reset.
+            See ``__call__``.
             Defaults to ``True``.
+        binary: bool
+            Binary-encode the result of ``cmd``.
+            Defaults to ``False``.
 
         Returns
         -------
             Correctly interpreted return value from executing code on-device.
         """
-        src_file = str(src_file)
-
         try:
-            res = self(cmd, record=record)
+            res = self(cmd, record=record, binary=binary)
         except PyboardException as e:
-            new_lines = []
-
-            msg = e.args[0]
-            lines = msg.split("\n")
-            for line in lines:
-                new_lines.append(line)
+            rewrite_traceback(e, src_file, src_lineno, name)
+            raise
+        return res
 
-                try:
-                    file, lineno, fn = line.strip().split(",", 2)
-                except ValueError:
-                    continue
+    @_locked
+    def _rpc_execute(
+        self,
+        src_file: PathType,
+        src_lineno: int,
+        name: str,
+        task_id: int,
+        args: tuple,
+        kwargs: dict,
+    ):
+        """Invoke a task registered with the on-device RPC dispatcher.
 
-                if file != 'File "<stdin>"' or fn != f" in {name}":
-                    continue
+        Like ``_traceback_execute``, reinterprets raised stacktrace in ``PyboardException``.
 
-                lineno = int(lineno[6:]) - 1 + src_lineno
+        Raises
+        ------
+        UnsupportedTypeError
+            Arguments cannot be binary-encoded; nothing was sent to the device.
+        """
+        try:
+            try:
+                return self._rpc.call(task_id, args, kwargs)
+            except (SerialException, ConnectionResetError) as e:
+                # Board probably disconnected.
+                if self.attempts:
+                    self.reconnect()
+                    return self._rpc.call(task_id, args, kwargs)
+                else:
+                    raise ConnectionLost from e
+        except PyboardException as e:
+            rewrite_traceback(e, src_file, src_lineno, name)
+            raise
 
-                new_lines[-1] = f'  File "{src_file}", line {lineno},{fn}'
+    def _rpc_register(self, name: str) -> Optional[int]:
+        """Get the RPC task identifier for function ``name``.
 
-                # Get what that line actually is.
-                new_lines.append("    " + linecache.getline(src_file, lineno).strip())
-            new_msg = "\n".join(new_lines)
-            e.args = (new_msg,)
-            raise
-        return res
+        Returns
+        -------
+        Optional[int]
+            ``None`` if RPC mode is disabled.
+        """
+        if self._rpc is None:
+            return None
+        return self._rpc_task_ids.setdefault(name, len(self._rpc_task_ids))
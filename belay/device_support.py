@@ -1,5 +1,7 @@
+import json
 import math
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
+from pathlib import Path
 from threading import Lock
 from typing import Callable, Optional, Tuple
 
@@ -20,12 +22,70 @@ class Implementation:
         e.g. The Pi Pico is "rp2" in MicroPython, but "RP2040"  in CircuitPython.
     emitters: tuple[str]
         Tuple of available emitters on-device ``{"native", "viper"}``.
+    decompressor: str
+        On-device module for decompressing zlib streams; one of ``{"deflate", "zlib"}``.
+        Empty if the device cannot decompress.
     """
 
     name: str
     version: Tuple[int, int, int] = (0, 0, 0)
     platform: str = ""
     emitters: Tuple[str] = ()
+    decompressor: str = ""
+
+
+def _implementations_cache_path() -> Path:
+    from belay.project import find_cache_folder
+
+    return find_cache_folder() / "implementations.json"
+
+
+def _load_implementations_cache() -> dict:
+    try:
+        return json.loads(_implementations_cache_path().read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def load_implementation(key: str) -> Optional[Implementation]:
+    """Load a previously probed ``Implementation`` from the host-side cache.
+
+    Parameters
+    ----------
+    key: str
+        Uniquely identifies a board and its firmware.
+
+    Returns
+    -------
+    Optional[Implementation]
+        Cached implementation, or ``None`` if ``key`` isn't cached.
+    """
+    try:
+        data = _load_implementations_cache()[key]
+        return Implementation(
+            name=data["name"],
+            version=tuple(data["version"]),
+            platform=data["platform"],
+            emitters=tuple(data["emitters"]),
+            decompressor=data["decompressor"],
+        )
+    except (KeyError, TypeError):
+        return None
+
+
+def save_implementation(key: str, implementation: Implementation) -> None:
+    """Store a probed ``Implementation`` in the host-side cache.
+
+    Failing to write the cache is silently ignored.
+    """
+    cache = _load_implementations_cache()
+    cache[key] = asdict(implementation)
+    path = _implementations_cache_path()
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(cache, indent=2))
+    except OSError:
+        pass
 
 
 _method_metadata_counter_lock = Lock()
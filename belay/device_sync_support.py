@@ -1,6 +1,13 @@
+import contextlib
+import hashlib
+import json
+import os
+import shutil
 import subprocess
+import threading
+import time
 from pathlib import Path
-from typing import Optional, Union
+from typing import Optional, Sequence, Tuple, Union
 
 from pathspec import PathSpec
 from pathspec.util import append_dir_sep
@@ -103,6 +110,180 @@ def preprocess_src_file_hash(*args, **kwargs):
     return src_file, src_hash
 
 
+def _binary_stat(binary: Union[str, Path, None]) -> Optional[list]:
+    """Size and modification time of ``binary``, standing in for its version."""
+    if not binary:
+        return None
+    binary = Path(shutil.which(str(binary)) or binary)
+    try:
+        stat = binary.stat()
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class SyncCache:
+    """Persistent host-side cache of preprocessed source files and their hashes.
+
+    Entries are keyed by the source file's path relative to the synced folder,
+    its on-device destination and the preprocessing options,
+    so syncing the same tree from another location (e.g. a fresh temporary folder) still hits.
+    They are valid as long as the source file's size and modification time,
+    as well as the ``mpy-cross`` binary, are unchanged.
+    For unchanged files, ``Device.sync`` neither preprocesses nor hashes them again.
+    """
+
+    # Files modified more recently than this (in seconds) aren't cached;
+    # a coarse modification time may not reflect a subsequent write.
+    min_age = 2
+
+    def __init__(self, folder: PathType):
+        """Load the cache stored in ``folder``.
+
+        Parameters
+        ----------
+        folder: Union[str, Path]
+            Folder holding the cache index and preprocessed files.
+            Created on ``save``.
+        """
+        self.folder = Path(folder)
+        self._index_path = self.folder / "index.json"
+        self._lock = threading.Lock()
+        self._modified = False
+        self._used = set()
+        try:
+            self._index = json.loads(self._index_path.read_text())
+        except (OSError, ValueError):
+            self._index = {}
+
+    def preprocess_src_file_hash(
+        self,
+        tmp_dir: PathType,
+        src_file: PathType,
+        src_root: PathType,
+        dst_file: str,
+        minify: bool,
+        mpy_cross_binary: Union[str, Path, None],
+    ) -> Tuple[Path, int]:
+        """Cached equivalent of ``preprocess_src_file_hash``.
+
+        Parameters
+        ----------
+        src_root: Union[str, Path]
+            Folder being synced; ``src_file`` is keyed relative to it.
+        dst_file: str
+            On-device destination of ``src_file``.
+
+        Returns
+        -------
+        Path
+            File to transfer; either ``src_file`` or its preprocessed artifact.
+        int
+            Hash of the file to transfer.
+        """
+        src_file = Path(src_file)
+        try:
+            stat = src_file.stat()
+        except OSError:
+            return preprocess_src_file_hash(tmp_dir, src_file, minify, mpy_cross_binary)
+
+        rel_path = src_file.relative_to(src_root).as_posix()
+        key = json.dumps([dst_file, rel_path, bool(minify), str(mpy_cross_binary or "")])
+        validity = [stat.st_size, stat.st_mtime_ns, _binary_stat(mpy_cross_binary)]
+
+        with self._lock:
+            self._used.add(key)
+            entry = self._index.get(key)
+        if entry is not None and entry["validity"] == validity:
+            if not entry["artifact"]:
+                return src_file, entry["hash"]
+            artifact = self.folder / entry["artifact"]
+            if artifact.exists():
+                return artifact, entry["hash"]
+
+        transformed, src_hash = preprocess_src_file_hash(tmp_dir, src_file, minify, mpy_cross_binary)
+
+        if time.time_ns() - stat.st_mtime_ns < self.min_age * 1_000_000_000:
+            return transformed, src_hash
+
+        artifact_name = ""
+        if transformed != src_file:
+            # Named after the key, so that an outdated artifact is overwritten.
+            artifact_name = hashlib.sha1(key.encode()).hexdigest() + transformed.suffix  # nosec
+            artifact = self.folder / "artifacts" / artifact_name
+            try:
+                artifact.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(transformed, artifact)
+            except OSError:
+                return transformed, src_hash
+            artifact_name = f"artifacts/{artifact_name}"
+
+        with self._lock:
+            self._index[key] = {"validity": validity, "hash": src_hash, "artifact": artifact_name}
+            self._modified = True
+
+        return transformed, src_hash
+
+    def save(self, prune: Optional[str] = None, keep: Sequence[str] = ()) -> None:
+        """Write the index to disk, if modified; failures are ignored.
+
+        Parameters
+        ----------
+        prune: Optional[str]
+            On-device folder that the sync mirrored.
+            Entries within it that weren't used since loading are dropped,
+            along with their preprocessed files.
+            Outdated entries for the synced destination files are always dropped.
+        keep: Sequence[str]
+            On-device files and folders within ``prune`` whose entries are kept.
+        """
+        stale_artifacts = []
+        with self._lock:
+            used_dsts = {json.loads(key)[0] for key in self._used}
+            prefix = None if prune is None else prune.rstrip("/") + "/"
+            keep_prefixes = tuple(x.rstrip("/") + "/" for x in keep)
+            for key in list(self._index):
+                dst_file = json.loads(key)[0]
+                if key in self._used:
+                    continue
+                if dst_file not in used_dsts and (
+                    prefix is None
+                    or not dst_file.startswith(prefix)
+                    or dst_file in keep
+                    or dst_file.startswith(keep_prefixes)
+                ):
+                    continue
+                entry = self._index.pop(key)
+                if entry["artifact"]:
+                    stale_artifacts.append(self.folder / entry["artifact"])
+                self._modified = True
+            if not self._modified:
+                return
+            data = json.dumps(self._index)
+            self._modified = False
+        for artifact in stale_artifacts:
+            with contextlib.suppress(OSError):
+                artifact.unlink()
+        try:
+            self.folder.mkdir(parents=True, exist_ok=True)
+            # Prevent the cache from being committed along with the project's ``.belay`` folder.
+            gitignore = self.folder / ".gitignore"
+            if not gitignore.exists():
+                gitignore.write_text("*\n")
+            tmp_path = self._index_path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_text(data)
+            tmp_path.replace(self._index_path)
+        except OSError:
+            pass
+
+
+def load_sync_cache() -> SyncCache:
+    # Avoid circular import
+    from belay.project import find_sync_cache_folder
+
+    return SyncCache(find_sync_cache_folder())
+
+
 def generate_dst_dirs(dst, src, src_dirs) -> list:
     dst_dirs = [(dst / x.relative_to(src)).as_posix() for x in src_dirs]
     # Add all directories leading up to ``dst``.
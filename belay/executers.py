@@ -1,21 +1,61 @@
+import binascii
+import concurrent.futures
 import inspect
+import itertools
+import time
 from abc import abstractmethod
+from collections import deque
+from contextlib import suppress
 from functools import wraps
-from typing import Callable, Optional, TypeVar, Union, overload
+from typing import Callable, Iterator, List, Optional, TypeVar, Union, overload
 
 from autoregistry import Registry
 from typing_extensions import ParamSpec
 
+from ._codec import UnsupportedTypeError, has_binary, pack, to_numpy
 from ._minify import minify as _minify
 from .exceptions import FeatureUnavailableError, SpecialFunctionNameError
 from .helpers import random_python_identifier, wraps_partial
-from .inspect import getsource
+from .inspect import binary_return_annotation, getsource, uses_sent_values
 from .typing import BelayCallable
 
 P = ParamSpec("P")
 R = TypeVar("R")
 
 
+PREFETCH_MAX = 256
+PREFETCH_TARGET_LATENCY = 0.05
+
+
+def adapt_prefetch(n: int, round_trip: float, consume_time: float) -> int:
+    """Adapt the number of generator items prefetched per round trip.
+
+    Prefetching is only beneficial while the host consumes items faster than
+    the device can deliver them. Once the host is the bottleneck (e.g. it sleeps
+    between items), items are fetched one at a time again so that on-device
+    side effects stay in step with the host.
+
+    Parameters
+    ----------
+    n: int
+        Number of items requested in the previous round trip.
+    round_trip: float
+        Duration of the previous round trip in seconds.
+    consume_time: float
+        Time in seconds the host spent consuming the previously fetched items.
+
+    Returns
+    -------
+    int
+        Number of items to request in the next round trip.
+    """
+    if consume_time < round_trip and round_trip < PREFETCH_TARGET_LATENCY:
+        return min(2 * n, PREFETCH_MAX)
+    if consume_time > round_trip or round_trip > 2 * PREFETCH_TARGET_LATENCY:
+        return max(n // 2, 1)
+    return n
+
+
 class Executer(Registry, suffix="Executer"):
     def __init__(self, device):
         # Use object.__setattr__ to avoid Executer.__setattr__ raising an error
@@ -31,6 +71,19 @@ class Executer(Registry, suffix="Executer"):
         # Just here for linting purposes.
         raise AttributeError
 
+    def _repr(self, obj) -> str:
+        """Python expression that evaluates to ``obj`` on-device.
+
+        Objects containing binary data (``bytes``, ``bytearray``, ``memoryview``, ``array.array``)
+        are binary-encoded into a single base64 string, instead of being expanded by ``repr``.
+        """
+        if has_binary(obj):
+            with suppress(UnsupportedTypeError):
+                data = binascii.b2a_base64(pack(obj), newline=False).decode()
+                self._belay_device._load_codec()
+                return f"__belay_arg({data!r})"
+        return repr(obj)
+
     @abstractmethod
     def __call__(self):
         raise NotImplementedError
@@ -76,12 +129,14 @@ class _GlobalExecuter(Executer, skip=True):
             cmd = src_code
             bound_arguments = signature.bind(*args, **kwargs)
             bound_arguments.apply_defaults()
-            arg_assign_cmd = "\n".join(f"{name}={repr(val)}" for name, val in bound_arguments.arguments.items())
+            arg_assign_cmd = "\n".join(f"{name}={self._repr(val)}" for name, val in bound_arguments.arguments.items())
             if arg_assign_cmd:
                 cmd = arg_assign_cmd + "\n" + cmd
 
             try:
-                self._belay_device._traceback_execute(src_file, src_lineno, name, cmd, record=record)
+                # Only the latest call of a global function is replayed upon reconnect.
+                key = f"{type(self).__registry__.name} {name}"
+                self._belay_device._traceback_execute(src_file, src_lineno, name, cmd, record=record and key)
             except Exception:
                 if not ignore_errors:
                     raise
@@ -113,6 +168,10 @@ class TaskExecuter(Executer):
         minify: bool = True,
         register: bool = True,
         record: bool = False,
+        lazy: Optional[bool] = None,
+        prefetch: Optional[int] = None,
+        binary: bool = False,
+        numpy: bool = False,
     ) -> Callable[[Callable[P, R]], Callable[P, R]]:
         ...
 
@@ -123,48 +182,223 @@ class TaskExecuter(Executer):
         minify: bool = True,
         register: bool = True,
         record: bool = False,
+        lazy: Optional[bool] = None,
+        prefetch: Optional[int] = None,
+        binary: bool = False,
+        numpy: bool = False,
     ) -> Union[Callable[[Callable[P, R]], Callable[P, R]], Callable[P, R]]:
         """See ``Device.task``."""
         if f is None:
-            return wraps_partial(self, minify=minify, register=register, record=record)
+            return wraps_partial(
+                self,
+                minify=minify,
+                register=register,
+                record=record,
+                lazy=lazy,
+                prefetch=prefetch,
+                binary=binary,
+                numpy=numpy,
+            )
+        if prefetch is not None and prefetch < 1:
+            raise ValueError("prefetch must be a positive integer.")
+
+        if binary:
+            numpy = numpy or binary_return_annotation(f) == "numpy"
+        binary = binary or numpy
+        if binary:
+            self._belay_device._load_codec()
+
+        def convert(res):
+            return to_numpy(res) if numpy else res
 
         name = f.__name__
         src_code, src_lineno, src_file = getsource(f)
 
+        # Recorded calls must go through the command history, so aren't dispatched via RPC.
+        task_id = None
+        if not record and not inspect.isgeneratorfunction(f):
+            task_id = self._belay_device._rpc_register(name)
+        if task_id is not None:
+            src_code = f"{src_code.rstrip()}\n__belay_tasks[{task_id}] = {name}\n"
+
         # Send the source code over to the device.
-        self._belay_device(src_code, minify=minify)
+        if lazy is None:
+            lazy = self._belay_device._lazy
+        lazy = lazy and not record
+        if not lazy:
+            src_lineno -= self._belay_device._upload(src_code, minify=minify, key=f"def {name}")
+
+        def upload():
+            if lazy:
+                self._belay_device._upload_task(name, src_code, minify=minify)
+
+        def prepare(args, kwargs):
+            """Create the ``execute`` and ``call`` arguments of ``Device._execute_task``."""
+
+            def execute():
+                if task_id is not None:
+                    with suppress(UnsupportedTypeError):
+                        return convert(
+                            self._belay_device._rpc_execute(src_file, src_lineno, name, task_id, args, kwargs)
+                        )
+
+                cmd = f"{name}(*{self._repr(args)}, **{self._repr(kwargs)})"
+
+                return convert(
+                    self._belay_device._traceback_execute(src_file, src_lineno, name, cmd, record=record, binary=binary)
+                )
+
+            def call():
+                cmd = f"{name}(*{self._repr(args)}, **{self._repr(kwargs)})"
+                return src_file, src_lineno, name, cmd, record, binary, numpy
+
+            return execute, call
 
         @wraps(f)
         def func_executer(*args, **kwargs):
-            cmd = f"{name}(*{repr(args)}, **{repr(kwargs)})"
-
-            return self._belay_device._traceback_execute(src_file, src_lineno, name, cmd, record=record)
+            upload()
+            batch = self._belay_device._batch
+            if batch is not None:
+                cmd = f"{name}(*{self._repr(args)}, **{self._repr(kwargs)})"
+                return batch.submit(src_file, src_lineno, name, cmd, record=record, binary=binary, numpy=numpy)
+
+            return self._belay_device._execute_task(*prepare(args, kwargs))
+
+        def submit_executer(*args, **kwargs) -> concurrent.futures.Future:
+            """Queue the task call for the device's I/O worker thread, without waiting for the result.
+
+            Task calls queued while the device is busy are executed as a single batch.
+
+            Returns
+            -------
+            concurrent.futures.Future
+                Resolved with the task's return value.
+            """
+            worker = self._belay_device._get_worker()
+            if lazy and self._belay_device._resident_tasks.get(name) != (src_code, minify):
+                worker.submit(upload)
+            execute, call = prepare(args, kwargs)
+            # Arguments are prepared in the worker thread; encoding them may load the codec on-device.
+            return worker.submit_call(execute, call)
 
         @wraps(f)
         def gen_executer(*args, **kwargs):
             if record:
                 raise NotImplementedError("Recording of generator tasks is currently not supported.")
+            upload()
             # Step 1: Create the on-device generator
             gen_identifier = random_python_identifier()
-            cmd = f"{gen_identifier} = {name}(*{repr(args)}, **{repr(kwargs)})"
+            cmd = f"{gen_identifier} = {name}(*{self._repr(args)}, **{self._repr(kwargs)})"
             self._belay_device._traceback_execute(src_file, src_lineno, name, cmd, record=False)
             # Step 2: Create the host generator that invokes ``next()`` on-device.
+            # Values sent into a generator that was advanced ahead would be received by the wrong ``yield``,
+            # so generators that make use of sent values default to single-stepping.
+            single_step = prefetch == 1 or (prefetch is None and uses_sent_values(src_code))
+            adaptive = prefetch is None
+
+            def execute(cmd):
+                return self._belay_device._traceback_execute(
+                    src_file, src_lineno, name, cmd, record=False, binary=binary
+                )
 
             def gen_inner():
+                nonlocal single_step
+                n = 1 if adaptive else prefetch
+                buffer = deque()
+                exhausted = False
                 send_val = None
-                try:
-                    while True:
-                        cmd = f"__belay_next({gen_identifier}, {repr(send_val)})"
-                        send_val = yield self._belay_device._traceback_execute(
-                            src_file, src_lineno, name, cmd, record=False
-                        )
-                except StopIteration:
-                    pass
+                fetch_end = 0.0
+                round_trip = 0.0
+                while True:
+                    if not buffer:
+                        if exhausted:
+                            break
+                        if single_step:
+                            try:
+                                buffer.append(
+                                    convert(execute(f"__belay_next({gen_identifier}, {self._repr(send_val)})"))
+                                )
+                            except StopIteration:
+                                break
+                        else:
+                            if adaptive and fetch_end:
+                                n = adapt_prefetch(n, round_trip, time.perf_counter() - fetch_end)
+                            fetch_start = time.perf_counter()
+                            items, exhausted = execute(
+                                f"__belay_prefetch({gen_identifier}, {self._repr(send_val)}, {n})"
+                            )
+                            fetch_end = time.perf_counter()
+                            round_trip = fetch_end - fetch_start
+                            buffer.extend(convert(items))
+                            if not buffer:
+                                break
+                    send_val = yield buffer.popleft()
+                    if send_val is not None and not single_step:
+                        if buffer:
+                            raise ValueError(
+                                "Cannot send a value to a generator task that has prefetched items. "
+                                "Decorate the task with prefetch=1."
+                            )
+                        single_step = True
                 # Delete the exhausted generator on-device.
-                self._belay_device(f"del {gen_identifier}")
+                self._belay_device(f"del {gen_identifier}", record=False)
 
             return gen_inner()
 
+        def map_cmds(iterables, chunksize):
+            """Generate on-device list-comprehension commands for each chunk of ``iterables``."""
+            if not iterables:
+                raise TypeError("map() must have at least one argument.")
+            if chunksize is not None and chunksize < 1:
+                raise ValueError("chunksize must be a positive integer.")
+
+            if len(iterables) == 1:
+                template, items = f"[{name}(x) for x in {{}}]", iter(iterables[0])
+            else:
+                template, items = f"[{name}(*x) for x in {{}}]", zip(*iterables)
+
+            while chunk := list(itertools.islice(items, chunksize)):
+                yield template.format(self._repr(chunk))
+
+        def imap_executer(*iterables, chunksize: Optional[int] = None) -> Iterator[R]:
+            """Lazily call the task on every element of ``iterables``.
+
+            Like the builtin ``map``, but the loop is executed on-device.
+            A round trip is performed whenever the results of the previous chunk have been consumed.
+
+            Parameters
+            ----------
+            iterables
+                Each iterable provides one positional argument for every call.
+            chunksize: Optional[int]
+                Number of calls executed per round trip.
+                Defaults to ``None``, executing all calls in a single round trip.
+            """
+            upload()
+            for cmd in map_cmds(iterables, chunksize):
+                yield from convert(
+                    self._belay_device._traceback_execute(src_file, src_lineno, name, cmd, record=record, binary=binary)
+                )
+
+        def map_executer(*iterables, chunksize: Optional[int] = None) -> List[R]:
+            """Call the task on every element of ``iterables``.
+
+            Like the builtin ``map``, but the loop is executed on-device
+            and a list of all results is returned.
+            See ``imap`` for parameter descriptions.
+            Within ``Device.batch``, all calls are queued as a single future.
+            """
+            batch = self._belay_device._batch
+            if batch is not None:
+                upload()
+                cmd = next(map_cmds(iterables, None), "[]")
+                return batch.submit(src_file, src_lineno, name, cmd, record=record, binary=binary, numpy=numpy)
+            return list(imap_executer(*iterables, chunksize=chunksize))
+
+        func_executer.map = map_executer
+        func_executer.imap = imap_executer
+        func_executer.submit = submit_executer
+
         executer = gen_executer if inspect.isgeneratorfunction(f) else func_executer
 
         if register:
@@ -208,11 +442,11 @@ class ThreadExecuter(Executer):
         src_code, src_lineno, src_file = getsource(f)
 
         # Send the source code over to the device.
-        self._belay_device(src_code, minify=minify)
+        src_lineno -= self._belay_device._upload(src_code, minify=minify, key=f"def {name}")
 
         @wraps(f)
         def executer(*args, **kwargs):
-            cmd = f"import _thread; _thread.start_new_thread({name}, {repr(args)}, {repr(kwargs)})"
+            cmd = f"import _thread; _thread.start_new_thread({name}, {self._repr(args)}, {self._repr(kwargs)})"
             self._belay_device._traceback_execute(src_file, src_lineno, name, cmd, record=record)
 
         if register:
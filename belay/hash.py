@@ -1,18 +1,34 @@
 from pathlib import Path
 from typing import Union
 
+FNV1A_OFFSET_BASIS = 0x811C9DC5
+
+
+def fnv1a_bytes(data: bytes, h: int = FNV1A_OFFSET_BASIS) -> int:
+    """Compute the FNV-1a 32-bit hash of ``data``.
+
+    Parameters
+    ----------
+    data: bytes
+        Data to hash.
+    h: int
+        Hash of all previous data, to continue hashing from.
+    """
+    size = 1 << 32
+    for byte in data:
+        h = h ^ byte
+        h = (h * 0x01000193) % size
+    return h
+
 
 def fnv1a(fn: Union[str, Path]) -> int:
     """Compute the FNV-1a 32-bit hash of a file."""
     fn = Path(fn)
-    h = 0x811C9DC5
-    size = 1 << 32
+    h = FNV1A_OFFSET_BASIS
     with fn.open("rb") as f:
         while True:
             data = f.read(65536)
             if not data:
                 break
-            for byte in data:
-                h = h ^ byte
-                h = (h * 0x01000193) % size
+            h = fnv1a_bytes(data, h)
     return h
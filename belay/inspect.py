@@ -12,7 +12,10 @@ from tokenize import (
     generate_tokens,
     untokenize,
 )
-from typing import Tuple
+from typing import Optional, Tuple, get_origin
+
+_binary_annotations = {"bytes", "bytearray", "array", "array.array"}
+_numpy_annotations = {"ndarray", "np.ndarray", "numpy.ndarray", "NDArray", "npt.NDArray", "numpy.typing.NDArray"}
 
 _pat_no_decorators = re.compile(r"^(\s*def\s)|(\s*async\s+def\s)|(.*(?<!\w)lambda(:|\s))")
 
@@ -129,3 +132,62 @@ def isexpression(code: str) -> bool:
         return False
 
     return True
+
+
+def uses_sent_values(code: str) -> bool:
+    """Checks if a generator makes use of values sent into it.
+
+    i.e. the value of a ``yield`` expression is used, like ``x = yield y``,
+    or sent values may be forwarded to a sub-generator via ``yield from``.
+
+    Parameters
+    ----------
+    code: str
+        Source code of a generator function.
+
+    Returns
+    -------
+    bool
+        ``False`` if every ``yield`` in ``code`` is a standalone statement.
+    """
+    tree = ast.parse(code)
+    standalone = {id(node.value) for node in ast.walk(tree) if isinstance(node, ast.Expr)}
+    return any(
+        isinstance(node, ast.YieldFrom) or (isinstance(node, ast.Yield) and id(node) not in standalone)
+        for node in ast.walk(tree)
+    )
+
+
+def binary_return_annotation(f) -> Optional[str]:
+    """Checks if the return annotation of ``f`` is a binary type.
+
+    Parameters
+    ----------
+    f: Callable
+        Function to check.
+
+    Returns
+    -------
+    Optional[str]
+        ``"numpy"`` if annotated as a ``numpy.ndarray``;
+        ``"binary"`` if annotated as ``bytes``, ``bytearray`` or ``array.array``;
+        ``None`` otherwise.
+    """
+    annotation = getattr(f, "__annotations__", {}).get("return")
+    if annotation is None:
+        return None
+
+    if isinstance(annotation, str):
+        annotation_name = annotation.split("[", 1)[0].strip()
+    else:
+        annotation = get_origin(annotation) or annotation
+        module = getattr(annotation, "__module__", "")
+        annotation_name = getattr(annotation, "__qualname__", "")
+        if module != "builtins":
+            annotation_name = f"{module}.{annotation_name}"
+
+    if annotation_name in _numpy_annotations:
+        return "numpy"
+    elif annotation_name in _binary_annotations:
+        return "binary"
+    return None
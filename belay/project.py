@@ -57,6 +57,18 @@ def find_cache_dependencies_folder() -> Path:
     return find_cache_folder() / "dependencies"
 
 
+@lru_cache
+def find_sync_cache_folder() -> Path:
+    """Folder of ``Device.sync``'s host-side cache.
+
+    Inside the project's ``.belay`` folder, or the user's cache folder if not in a project.
+    """
+    try:
+        return find_belay_folder() / "sync-cache"
+    except FileNotFoundError:
+        return find_cache_folder() / "sync"
+
+
 @lru_cache
 def load_toml(path: Union[str, Path]) -> dict:
     path = Path(path)
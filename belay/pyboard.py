@@ -54,23 +54,32 @@ Then:
 
 import ast
 import atexit
+import binascii
 import contextlib
 import itertools
 import os
 import platform
+import selectors
 import signal
+import socket
 import subprocess
 import sys
 import time
 from pathlib import Path
-from threading import Lock, Thread
+from threading import Condition, Thread
 from typing import Union
 
 from pydantic import ValidationError
 
+from . import _compress
+from ._buffer import ReceiveBuffer
 from .exceptions import BelayException, ConnectionFailedError, DeviceNotFoundError
+from .helpers import read_snippet
 from .usb_specifier import UsbSpecifier
-from .webrepl import WebreplToSerial
+from .webrepl import WebreplError, WebreplToSerial
+
+# Maximum number of file bytes per block for ``Pyboard.fs_put_stream``.
+STREAM_CHUNK_SIZE = 16384
 
 try:
     stdout = sys.stdout.buffer
@@ -107,6 +116,73 @@ def _dummy_data_consumer(data):
     pass
 
 
+def _transport_fileno(transport):
+    """Get a file descriptor that becomes readable when ``transport`` has data.
+
+    Returns ``None`` if the transport doesn't expose one.
+    """
+    try:
+        return transport.fileno()
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+class ReadWaiter:
+    """Block until a transport *may* have data available to read.
+
+    In order of preference, waits on:
+
+        1. The transport's own ``wait_readable(timeout)`` method.
+        2. The transport's ``fileno()`` via ``selectors``.
+        3. Polling every ``poll_interval`` seconds.
+    """
+
+    poll_interval = 0.001
+
+    def __init__(self, transport):
+        self._wait_readable = getattr(transport, "wait_readable", None)
+        self._selector = None
+
+        if self._wait_readable is not None:
+            return
+
+        fd = _transport_fileno(transport)
+        if fd is None:
+            return
+
+        selector = selectors.DefaultSelector()
+        try:
+            selector.register(fd, selectors.EVENT_READ)
+            # Some platforms (e.g. Windows) only support selecting on sockets;
+            # find out now rather than in the middle of a read.
+            selector.select(0)
+        except (OSError, ValueError):
+            selector.close()
+        else:
+            self._selector = selector
+
+    def wait(self, timeout=None):
+        """Wait until data may be available.
+
+        Parameters
+        ----------
+        timeout: Union[None, float]
+            Maximum time to wait in seconds.
+            If None, wait indefinitely.
+        """
+        if self._wait_readable is not None:
+            self._wait_readable(timeout)
+        elif self._selector is not None:
+            self._selector.select(timeout)
+        else:
+            time.sleep(self.poll_interval if timeout is None else min(timeout, self.poll_interval))
+
+    def close(self):
+        if self._selector is not None:
+            self._selector.close()
+            self._selector = None
+
+
 class PyboardError(BelayException):
     """An issue communicating with the board or parsing board response."""
 
@@ -118,74 +194,213 @@ class PyboardException(BelayException):  # noqa: N818
         return "\n\n" + self.args[0]
 
 
-class TelnetToSerial:
-    def __init__(self, ip, user, password, read_timeout=None):
-        self.tn = None
-        import telnetlib
+class SocketToSerial:
+    """Raw REPL over a plain TCP socket, e.g. the on-device server from ``Device.install_tcp_server``.
 
-        self.tn = telnetlib.Telnet(ip, timeout=15)
+    If a ``password`` is given, it's sent in response to the server's ``Password:`` prompt.
+    """
+
+    default_port = 8267
+    chunk_size = 65536
+
+    def __init__(self, uri, password=None, read_timeout=None):
+        if uri.startswith("tcp://"):
+            uri = uri[len("tcp://") :]
+        host, _, port = uri.partition(":")
         self.read_timeout = read_timeout
-        if b"Login as:" in self.tn.read_until(b"Login as:", timeout=read_timeout):
-            self.tn.write(bytes(user, "ascii") + b"\r\n")
+        self.buf = bytearray()
+
+        try:
+            self.sock = socket.create_connection((host, int(port) if port else self.default_port), timeout=15)
+        except OSError as e:
+            raise ConnectionFailedError from e
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.settimeout(read_timeout)
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self.sock, selectors.EVENT_READ)
+
+        if password is not None:
+            self._login(password, read_timeout)
+
+    def _login(self, password, timeout):
+        response = b""
+        try:
+            response = self._read_until(b"Password: ", timeout)
+            if response.endswith(b"Password: "):
+                self.write(bytes(password, "ascii") + b"\r\n")
+                response = self._read_until(b"Connected\r\n", timeout)
+                if response.endswith(b"Connected\r\n"):
+                    return
+        except ConnectionResetError:
+            # E.g. the server rejected the connection or password.
+            response += bytes(self.buf)
+        self.close()
+        raise ConnectionFailedError(response.decode(errors="replace").strip() or "Login failed.")
+
+    def close(self):
+        if self.sock is None:
+            return
+        self._selector.close()
+        self.sock.close()
+        self.sock = None
 
-            if b"Password:" in self.tn.read_until(b"Password:", timeout=read_timeout):
+    def _recv(self):
+        """Append a chunk of received data to ``buf``; raises ``ConnectionResetError`` if closed by the device.
+
+        Returns
+        -------
+        int
+            Number of bytes received.
+        """
+        data = self.sock.recv(self.chunk_size)
+        if not data:
+            raise ConnectionResetError("Connection closed by device.")
+        self.buf += data
+        return len(data)
+
+    def _wait_for(self, predicate, timeout=None):
+        """Receive data until ``predicate()`` is true, or ``timeout`` seconds elapse.
+
+        Returns
+        -------
+        bool
+            Value of ``predicate()``.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not predicate():
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            if self._selector.select(remaining):
+                self._recv()
+        return True
+
+    def _read_until(self, ending, timeout=None):
+        """Read data up to and including ``ending``; on timeout, return all received data."""
+        self._wait_for(lambda: ending in self.buf, timeout)
+        index = self.buf.find(ending)
+        size = len(self.buf) if index < 0 else index + len(ending)
+        data = bytes(self.buf[:size])
+        del self.buf[:size]
+        return data
+
+    def read(self, size=1):
+        self._wait_for(lambda: len(self.buf) >= size, self.read_timeout)
+        data = bytes(self.buf[:size])
+        del self.buf[:size]
+        return data
+
+    def write(self, data):
+        self.sock.sendall(data)
+        return len(data)
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    @property
+    def in_waiting(self):
+        while self._selector.select(0):
+            if self._recv() < self.chunk_size:
+                break
+        return len(self.buf)
+
+
+class TelnetToSerial(SocketToSerial):
+    """Raw REPL over telnet, e.g. the WiPy's telnet server.
+
+    Telnet commands are stripped from the received data, and all option negotiations are refused.
+    """
+
+    default_port = 23
+
+    # Telnet commands (RFC 854).
+    IAC, DONT, DO, WONT, WILL, SB, SE = 255, 254, 253, 252, 251, 250, 240
+
+    def __init__(self, ip, user, password, read_timeout=None):
+        self._pending = b""  # Incomplete telnet command at the end of the received data.
+        super().__init__(ip, read_timeout=read_timeout)
+
+        if b"Login as:" in self._read_until(b"Login as:", timeout=read_timeout):
+            self.write(bytes(user, "ascii") + b"\r\n")
+
+            if b"Password:" in self._read_until(b"Password:", timeout=read_timeout):
                 # needed because of internal implementation details of the telnet server
                 time.sleep(0.2)
-                self.tn.write(bytes(password, "ascii") + b"\r\n")
+                self.write(bytes(password, "ascii") + b"\r\n")
 
-                if b"for more information." in self.tn.read_until(
+                if b"for more information." in self._read_until(
                     b'Type "help()" for more information.', timeout=read_timeout
                 ):
                     # login successful
-                    from collections import deque
-
-                    self.fifo = deque()
                     return
 
+        self.close()
         raise ConnectionFailedError
 
-    def __del__(self):
-        self.close()
+    def _recv(self):
+        data = self.sock.recv(self.chunk_size)
+        if not data:
+            raise ConnectionResetError("Connection closed by device.")
+        self.buf += self._strip_commands(self._pending + data)
+        return len(data)
 
-    def close(self):
-        if self.tn:
-            self.tn.close()
+    def _strip_commands(self, data):
+        """Remove telnet commands from ``data``, replying to option negotiations."""
+        if self.IAC not in data:
+            self._pending = b""
+            return data
 
-    def read(self, size=1):
-        while len(self.fifo) < size:
-            timeout_count = 0
-            data = self.tn.read_eager()
-            if len(data):
-                self.fifo.extend(data)
-                timeout_count = 0
-            else:
-                time.sleep(0.25)
-                if self.read_timeout is not None and timeout_count > 4 * self.read_timeout:
+        out = bytearray()
+        replies = bytearray()
+        i = 0
+        while True:
+            j = data.find(self.IAC, i)
+            if j < 0:
+                out += data[i:]
+                i = len(data)
+                break
+            out += data[i:j]
+            if j + 1 == len(data):
+                i = j
+                break
+            command = data[j + 1]
+            if command == self.IAC:
+                out.append(self.IAC)  # Escaped 0xFF data byte.
+                i = j + 2
+            elif command in (self.DO, self.DONT, self.WILL, self.WONT):
+                if j + 2 == len(data):
+                    i = j
+                    break
+                reply = self.WONT if command in (self.DO, self.DONT) else self.DONT
+                replies += bytes((self.IAC, reply, data[j + 2]))
+                i = j + 3
+            elif command == self.SB:
+                end = data.find(bytes((self.IAC, self.SE)), j + 2)
+                if end < 0:
+                    i = j
                     break
-                timeout_count += 1
+                i = end + 2
+            else:
+                i = j + 2
 
-        data = b""
-        while len(data) < size and len(self.fifo) > 0:
-            data += bytes([self.fifo.popleft()])
-        return data
+        self._pending = data[i:]
+        if replies:
+            self.sock.sendall(replies)
+        return out
 
     def write(self, data):
-        self.tn.write(data)
+        self.sock.sendall(bytes(data).replace(b"\xff", b"\xff\xff"))
         return len(data)
 
-    @property
-    def in_waiting(self):
-        n_waiting = len(self.fifo)
-        if not n_waiting:
-            data = self.tn.read_eager()
-            self.fifo.extend(data)
-            return len(data)
-        else:
-            return n_waiting
-
 
 class ProcessToSerial:
-    """Execute a process and emulate serial connection using its stdin/stdout."""
+    """Execute a process and emulate serial connection using its stdin/stdout.
+
+    The process' output is read in large chunks via ``os.read`` whenever ``selectors`` reports it readable.
+    On platforms that cannot select on pipes (e.g. Windows), a background thread reads the output instead.
+    """
+
+    chunk_size = 65536
 
     def __init__(self, cmd):
         import subprocess
@@ -198,55 +413,105 @@ class ProcessToSerial:
             stdin=subprocess.PIPE,
             stdout=subprocess.PIPE,
         )
-        time.sleep(0.5)
 
         self.buf = bytearray()
-        self.lock = Lock()
-
-        def process_output():
-            assert self.subp.stdout is not None  # noqa: S101
-            while True:
-                out = self.subp.stdout.read(1)
-                if out:
-                    with self.lock:
-                        self.buf.extend(out)
-                elif self.subp.poll() is not None:
-                    break
-
-        thread = Thread(target=process_output)
-        thread.daemon = True
-        thread.start()
+        self.lock = Condition()
+        self._eof = False
+        assert self.subp.stdout is not None  # noqa: S101
+        self._fd = self.subp.stdout.fileno()
+
+        self._selector = selectors.DefaultSelector()
+        try:
+            self._selector.register(self._fd, selectors.EVENT_READ)
+            self._selector.select(0)
+        except (OSError, ValueError):
+            self._selector.close()
+            self._selector = None
+            thread = Thread(target=self._process_output)
+            thread.daemon = True
+            thread.start()
 
         atexit.register(self.close)
 
-        t_deadline = time.time() + 1
-        while b">>>" not in self.buf:
-            time.sleep(0.0001)
-            if _parse_bool("BELAY_DEBUG_PROCESS_BUFFER") and time.time() > t_deadline:
-                t_deadline = time.time() + 1
+        while not self._wait_for(lambda: b">>>" in self.buf, timeout=1):
+            if _parse_bool("BELAY_DEBUG_PROCESS_BUFFER"):
                 print(self.buf)
 
     def close(self):
         _kill_process(self.subp.pid)
         atexit.unregister(self.close)
+        if self._selector is not None:
+            self._selector.close()
+
+    def _read_chunk(self):
+        """Append a chunk of the process' output to ``buf``; raises ``ConnectionResetError`` if the process exited."""
+        data = os.read(self._fd, self.chunk_size)
+        if not data:
+            raise ConnectionResetError("Process exited.")
+        self.buf += data
+        return len(data)
 
-    def read(self, size=1):
-        while len(self.buf) < size:
-            # yield to the reading threads
-            time.sleep(0.0001)
+    def _process_output(self):
+        """Background reader, for when ``selectors`` doesn't support pipes."""
+        while True:
+            try:
+                data = os.read(self._fd, self.chunk_size)
+            except OSError:
+                data = b""
+            with self.lock:
+                if data:
+                    self.buf += data
+                else:
+                    self._eof = True
+                self.lock.notify_all()
+            if not data:
+                return
 
-        with self.lock:
-            data = self.buf[:size]
-            self.buf[:] = self.buf[size:]
+    def _wait_for(self, predicate, timeout=None):
+        """Receive output until ``predicate()`` is true, or ``timeout`` seconds elapse.
+
+        Returns
+        -------
+        bool
+            Value of ``predicate()``.
+        """
+        if self._selector is None:
+            with self.lock:
+                self.lock.wait_for(lambda: predicate() or self._eof, timeout)
+                if not predicate() and self._eof:
+                    raise ConnectionResetError("Process exited.")
+                return bool(predicate())
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not predicate():
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            if self._selector.select(remaining):
+                self._read_chunk()
+        return True
 
+    def read(self, size=1):
+        with self.lock:
+            self._wait_for(lambda: len(self.buf) >= size)
+            data = bytes(self.buf[:size])
+            del self.buf[:size]
         return data
 
     def write(self, data):
         self.subp.stdin.write(data)
         return len(data)
 
+    def wait_readable(self, timeout=None):
+        """Block until output has been buffered, or ``timeout`` seconds elapse."""
+        return self._wait_for(lambda: self.buf, timeout)
+
     @property
     def in_waiting(self):
+        if self._selector is not None:
+            while self._selector.select(0):
+                if self._read_chunk() < self.chunk_size:
+                    break
         return len(self.buf)
 
 
@@ -293,12 +558,19 @@ class ProcessPtyToTerminal:
     def write(self, data):
         return self.ser.write(data)
 
+    def fileno(self):
+        return self.ser.fileno()
+
     @property
     def in_waiting(self):
         return self.ser.in_waiting
 
 
 class Pyboard:
+    _read_waiter = None
+    banner = b""  # Friendly REPL banner (firmware version and board), captured by ``enter_raw_repl``.
+    decompressor = ""  # On-device decompressor for file transfers (see ``Implementation.decompressor``).
+
     def __init__(
         self,
         device: Union[None, str, UsbSpecifier] = None,
@@ -330,8 +602,9 @@ class Pyboard:
             raise ValueError('"attempts" cannot be 0.')
         self.in_raw_repl = False
         self.use_raw_paste = True
-        self._consumed_buf = bytearray()
-        self._unconsumed_buf = bytearray()
+        self.use_stream_put = True
+        self._rx = ReceiveBuffer()
+        self._rx_delivered = 0  # Bytes at the front of ``_rx`` already given to a ``data_consumer``.
 
         if device is None:
             usb_specifier_str = os.environ.get("BELAY_DEVICE", "{}")
@@ -352,6 +625,8 @@ class Pyboard:
             self.serial = TelnetToSerial(device, user, password, read_timeout=10)
         elif device and device.startswith("ws://"):
             self.serial = WebreplToSerial(device, password, read_timeout=10)
+        elif device.startswith("tcp://"):
+            self.serial = SocketToSerial(device, password, read_timeout=10)
         else:
             import serial
 
@@ -372,6 +647,8 @@ class Pyboard:
 
                 time.sleep(1.0)
 
+        self._read_waiter = ReadWaiter(self.serial)
+
         atexit.register(self.close)
 
     def close(self):
@@ -380,6 +657,9 @@ class Pyboard:
         self.exit_raw_repl()
         self.serial.close()
         self.serial = None
+        if self._read_waiter is not None:
+            self._read_waiter.close()
+            self._read_waiter = None
         atexit.unregister(self.close)
 
     def read_until(self, ending, timeout=10, data_consumer=None):
@@ -405,58 +685,65 @@ class Pyboard:
         if data_consumer is None:
             data_consumer = _dummy_data_consumer
 
-        if timeout is None:
-            timeout = float("inf")
-        deadline = time.time() + timeout
-
-        def find(buf):
-            # slice up to this index
-            index = buf.find(ending)
-            if index >= 0:
-                index += len(ending)
-            return index
+        deadline = None if timeout is None else time.monotonic() + timeout
+        rx = self._rx
 
         while True:  # loop until ``ending`` is found, or timeout
-            ending_index = find(self._unconsumed_buf)
-            if ending_index > 0:
-                data_for_consumer = self._unconsumed_buf[:ending_index]
-                self._unconsumed_buf[:] = self._unconsumed_buf[ending_index:]
-                out = self._consumed_buf + data_for_consumer
-                self._consumed_buf.clear()
-                data_consumer(data_for_consumer)
+            ending_index = rx.find(ending)
+            if ending_index >= 0:
+                # Part of ``out`` may have already been handed to ``data_consumer``.
+                n_delivered, self._rx_delivered = self._rx_delivered, 0
+                out = rx.read(ending_index)
+                if ending_index > n_delivered:
+                    data_consumer(out[n_delivered:])
                 return out
-            elif self._unconsumed_buf:
-                # consume the unconsumed buffer
-                og_consumed_buf_len = len(self._consumed_buf)
-                self._consumed_buf.extend(self._unconsumed_buf)
-
-                if (ending_index := find(self._consumed_buf)) > 0:
-                    # The ``ending`` was split across the buffers
-                    out = self._consumed_buf[:ending_index]
-                    self._unconsumed_buf[:] = self._consumed_buf[ending_index:]
-                    data_for_consumer = self._consumed_buf[og_consumed_buf_len:ending_index]
-                    self._consumed_buf.clear()
-                    data_consumer(data_for_consumer)
-                    return out
-
-                # ``ending`` has still not been found.
-                data_for_consumer = self._unconsumed_buf.copy()
-                self._unconsumed_buf.clear()
+            elif len(rx) > self._rx_delivered:
+                # ``ending`` has still not been found; pass along what we have so far.
+                data_for_consumer = rx.peek(self._rx_delivered)
+                self._rx_delivered = len(rx)
                 data_consumer(data_for_consumer)
 
-            while not self._unconsumed_buf:
-                # loop until new data has arrived.
-                if time.time() > deadline:
-                    raise PyboardError(
-                        f"Timed out reading until {repr(ending)}\n    Received: {repr(self._consumed_buf)}"
-                    )
+            self._receive(deadline, ending)
+
+    def _receive(self, deadline, ending=None):
+        """Block until more data has been appended to the receive buffer."""
+        while True:
+            n_waiting = self.serial.in_waiting
+            if n_waiting:
+                self._rx.extend(self.serial.read(n_waiting))
+                return
+
+            if deadline is None:
+                remaining = None
+            else:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    if ending is None:
+                        raise PyboardError(f"Timed out reading\n    Received: {repr(self._rx.peek())}")
+                    raise PyboardError(f"Timed out reading until {repr(ending)}\n    Received: {repr(self._rx.peek())}")
+
+            # Sleep until the transport signals that data has arrived.
+            self._read_waiter.wait(remaining)
+
+    def read(self, size=1, timeout=10):
+        """Read exactly ``size`` bytes from the device.
 
-                if not self.serial.in_waiting:
-                    time.sleep(0.001)
+        Parameters
+        ----------
+        timeout: Union[None, float]
+            Timeout in seconds.
+            If None, no timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while len(self._rx) < size:
+            self._receive(deadline)
+        self._rx_delivered = max(0, self._rx_delivered - size)
+        return self._rx.read(size)
 
-                if self.serial.in_waiting:
-                    n_bytes = min(2048, self.serial.in_waiting)
-                    self._unconsumed_buf.extend(self.serial.read(n_bytes))
+    @property
+    def in_waiting(self):
+        """Number of received bytes that can be read without blocking."""
+        return len(self._rx) + self.serial.in_waiting
 
     def cancel_running_program(self):
         """Interrupts any running program."""
@@ -472,9 +759,11 @@ class Pyboard:
         while n > 0:
             self.serial.read(n)
             n = self.serial.in_waiting
+        self._rx.clear()
+        self._rx_delivered = 0
         self.cancel_running_program()
         self.exit_raw_repl()  # if device is already in raw_repl, b'>>>' won't be printed.
-        self.read_until(b">>>")
+        self.banner = self.read_until(b">>>")
         self.serial.write(b"\r\x01")  # ctrl-A: enter raw REPL
         if soft_reset:
             self.read_until(b"raw REPL; CTRL-B to exit\r\n>")
@@ -501,15 +790,15 @@ class Pyboard:
 
     def raw_paste_write(self, command_bytes):
         # Read initial header, with window size.
-        data = self.serial.read(2)
+        data = self.read(2)
         window_size = data[0] | data[1] << 8
         window_remain = window_size
 
         # Write out the command_bytes data.
         i = 0
         while i < len(command_bytes):
-            while window_remain == 0 or self.serial.in_waiting:
-                data = self.serial.read(1)
+            while window_remain == 0 or self.in_waiting:
+                data = self.read(1)
                 if data == b"\x01":
                     # Device indicated that a new window of data can be sent.
                     window_remain += window_size
@@ -541,7 +830,7 @@ class Pyboard:
         if self.use_raw_paste:
             # Try to enter raw-paste mode.
             self.serial.write(b"\x05A\x01")
-            data = self.serial.read(2)
+            data = self.read(2)
             if data == b"R\x00":
                 # Device understood raw-paste command but doesn't support it.
                 pass
@@ -561,7 +850,7 @@ class Pyboard:
         self.serial.write(b"\x04")
 
         # check if we could exec command
-        data = self.serial.read(2)
+        data = self.read(2)
         if data != b"OK":
             raise PyboardError("could not exec command (response: %r)" % data)
 
@@ -606,8 +895,13 @@ class Pyboard:
     def fs_get(self, src, dest, chunk_size=256, progress_callback=None):
         dest = Path(dest)
         written = 0
+        src_size = None
         if progress_callback:
             src_size = int(self.exec("import os\nprint(os.stat('%s')[6])" % src))
+        if isinstance(self.serial, WebreplToSerial):
+            with self._webrepl_transfer():
+                self.serial.get_file(src, dest, progress_callback=progress_callback, size=src_size)
+            return
         self.exec("f=open('%s','rb')\nr=f.read" % src)
         with dest.open("wb") as f:
             while True:
@@ -636,6 +930,17 @@ class Pyboard:
         self.exec("f.close()")
 
     def fs_put(self, src, dest, chunk_size=256, progress_callback=None):
+        if isinstance(self.serial, WebreplToSerial):
+            with self._webrepl_transfer():
+                self.serial.put_file(src, dest, progress_callback=progress_callback)
+            return
+
+        if self.use_stream_put:
+            if self.fs_put_stream(src, dest, progress_callback=progress_callback):
+                return
+            # Device doesn't support streaming; don't try again for this connection.
+            self.use_stream_put = False
+
         src = Path(src)
         written = 0
         src_size = src.stat().st_size
@@ -651,6 +956,88 @@ class Pyboard:
                     progress_callback(written, src_size)
         self.exec("f.close()")
 
+    def fs_put_stream(self, src, dest, chunk_size=STREAM_CHUNK_SIZE, progress_callback=None):
+        """Transfer a file via an on-device receive loop reading ``sys.stdin.buffer``.
+
+        Each block is sent as an 8 hex-digit length followed by base64-encoded
+        data; the device acknowledges every block with an ASCII ACK (0x06) byte
+        once it has been written, before the host sends the next block.
+        The device lowers ``chunk_size`` if it doesn't have enough free heap.
+        If ``decompressor`` is set, files of at least ``_compress.THRESHOLD`` bytes
+        are sent as individually zlib-compressed blocks.
+
+        Returns
+        -------
+        bool
+            ``False`` if the device doesn't support streaming; nothing was transferred.
+        """
+        src = Path(src)
+        written = 0
+        src_size = src.stat().st_size
+        decompressor = self.decompressor if src_size >= _compress.THRESHOLD else ""
+
+        self.exec_raw_no_follow(
+            read_snippet("fs_put_stream") + f"\n__belay_put({repr(str(dest))}, {chunk_size}, {decompressor!r})"
+        )
+        response = self.read_until(b"\n")
+        if response.startswith(b"\x04"):
+            self._raise_stream_error(response[1:])
+        chunk_size = int(response)
+        if not chunk_size:
+            self.follow(None)
+            return False
+
+        with src.open("rb") as f:
+            while True:
+                data = f.read(chunk_size)
+                block = binascii.b2a_base64(_compress.compress(data) if decompressor and data else data, newline=False)
+                self.serial.write(b"%08x" % len(block) + block)
+                if not data:
+                    break
+
+                ack = self.read(1)
+                if ack == b"\x04":
+                    # Device raised an exception; any in-flight data is now sitting
+                    # in the raw REPL's input line, so clear it with ctrl-C.
+                    self.serial.write(b"\x03")
+                    self._raise_stream_error()
+                elif ack != b"\x06":
+                    raise PyboardError(f"unexpected read during stream put: {ack}")
+
+                written += len(data)
+                if progress_callback:
+                    progress_callback(written, src_size)
+
+        _, data_err = self.follow(None)
+        if data_err:
+            raise PyboardException(data_err.decode())
+        return True
+
+    @contextlib.contextmanager
+    def _webrepl_transfer(self):
+        """Prepare for a WebREPL binary file transfer.
+
+        In raw REPL mode, the prompt for the next command is received as a text frame,
+        which would either be dropped or mistaken for a file transfer response.
+        It's consumed before the transfer; as the device doesn't prompt again after
+        the transfer, it's then restored for the next command.
+        Failures are reported like on-device exceptions.
+        """
+        if self.in_raw_repl:
+            self.read_until(b">")
+        try:
+            yield
+        except WebreplError as e:
+            raise PyboardException(str(e)) from e
+        finally:
+            if self.in_raw_repl:
+                self._rx.extend(b">")
+
+    def _raise_stream_error(self, data_err=b""):
+        """Read the remainder of an on-device exception and raise it."""
+        data_err += self.read_until(b"\x04")[:-1]
+        raise PyboardException(data_err.decode())
+
     def fs_mkdir(self, dir):
         self.exec("import uos\nuos.mkdir('%s')" % dir)
 
@@ -0,0 +1,92 @@
+"""Host-side of the on-device RPC dispatcher loop (``snippets/rpc.py``).
+
+Instead of sending and compiling ``name(*args, **kwargs)`` source code for every
+task invocation, the dispatcher runs on-device and reads one request per line:
+a base64-encoded ``(call_id, task_id, args, kwargs)`` tuple in the binary codec
+format (see ``belay._codec``). It replies with a line containing ``_BELAYF``
+followed by a base64-encoded ``(call_id, status, value)`` tuple.
+An empty line stops the dispatcher, returning the device to the raw REPL prompt.
+"""
+import binascii
+import itertools
+import sys
+from typing import Optional, TextIO
+
+from ._codec import pack, unpack
+from .pyboard import Pyboard, PyboardError, PyboardException
+
+_STATUS_OK = 0
+_STATUS_EXCEPTION = 1
+
+
+class RpcDispatcher:
+    """Controls the ``__belay_rpc`` dispatcher loop on a connected board.
+
+    While running, the device is busy executing the dispatcher instead of
+    waiting at the raw REPL prompt, so ``stop`` must be called prior to
+    executing any other code on the board.
+    """
+
+    def __init__(self, board: Pyboard):
+        self.board = board
+        self.running = False
+        self._call_ids = itertools.count()
+
+    def start(self) -> None:
+        """Start the on-device dispatcher loop."""
+        self.board.exec_raw_no_follow("__belay_rpc()")
+        self.running = True
+
+    def stop(self) -> None:
+        """Stop the on-device dispatcher loop, returning the device to the raw REPL prompt."""
+        if not self.running:
+            return
+        self.running = False
+        self.board.serial.write(b"\n")
+        _, data_err = self.board.follow(None)
+        if data_err:
+            raise PyboardException(data_err.decode())
+
+    def call(self, task_id: int, args: tuple, kwargs: dict, stream_out: Optional[TextIO] = sys.stdout):
+        """Invoke a registered task.
+
+        Raises
+        ------
+        UnsupportedTypeError
+            ``args`` or ``kwargs`` cannot be binary-encoded.
+            Nothing has been sent to the device.
+        PyboardException
+            Uncaught exception from the task on-device.
+        """
+        call_id = next(self._call_ids)
+        request = binascii.b2a_base64(pack((call_id, task_id, args, kwargs)))
+
+        if not self.running:
+            self.start()
+        self.board.serial.write(request)
+
+        while True:
+            line = self.board.read_until(b"\n", timeout=None)
+            # The task's output may not end with a newline, e.g. ``print("x", end="")``.
+            marker = line.find(b"_BELAYF")
+            if marker >= 0:
+                if stream_out and marker:
+                    stream_out.write(line[:marker].decode())
+                response_id, status, value = unpack(binascii.a2b_base64(line[marker + 7 :]))
+                if response_id != call_id:
+                    raise PyboardError(f"Expected RPC response {call_id}, got {response_id}.")
+                if status == _STATUS_EXCEPTION:
+                    raise PyboardException(value)
+                return value
+
+            eot = line.find(b"\x04")
+            if eot >= 0:
+                # The dispatcher itself exited (e.g. ``KeyboardInterrupt``).
+                self.running = False
+                if stream_out and eot:
+                    stream_out.write(line[:eot].decode())
+                data_err = line[eot + 1 :] + self.board.read_until(b"\x04", timeout=None)[:-1]
+                raise PyboardException(data_err.decode())
+
+            if stream_out:
+                stream_out.write(line.decode())
@@ -0,0 +1,9 @@
+def __belay_boot_append(code):
+    try:
+        with open("/boot.py") as f:
+            if code in f.read():
+                return
+    except OSError:
+        pass
+    with open("/boot.py", "a") as f:
+        f.write("\n" + code)
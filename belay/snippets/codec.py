@@ -0,0 +1,89 @@
+# Binary codec; see belay/_codec.py for the format.
+from struct import pack as __belay_spack, unpack_from as __belay_sunpack, calcsize as __belay_calcsize
+from binascii import a2b_base64 as __belay_a2b, b2a_base64 as __belay_b2a
+from array import array as __belay_array
+def __belay_pack(x, o):
+    t = type(x)
+    if x is None:
+        o.append(b"N")
+    elif x is True:
+        o.append(b"T")
+    elif x is False:
+        o.append(b"F")
+    elif t is int:
+        s = bytes(str(x), "ascii")
+        o.append(b"i" + bytes((len(s),)) + s)
+    elif t is float:
+        o.append(b"f" + __belay_spack("<d", x))
+    elif t is str or t is bytes or t is bytearray:
+        s = bytes(x, "utf8") if t is str else bytes(x)
+        o.append((b"s" if t is str else b"b" if t is bytes else b"y") + __belay_spack("<I", len(s)))
+        o.append(s)
+    elif t is __belay_array:
+        c = repr(x[:0])[7]
+        s = bytes(x)
+        o.append(b"a" + bytes((ord(c), __belay_calcsize(c))) + __belay_spack("<I", len(s)))
+        o.append(s)
+    elif t is tuple or t is list or t is set:
+        o.append((b"t" if t is tuple else b"l" if t is list else b"S") + __belay_spack("<I", len(x)))
+        for i in x:
+            __belay_pack(i, o)
+    elif t is dict:
+        o.append(b"d" + __belay_spack("<I", len(x)))
+        for k, v in x.items():
+            __belay_pack(k, o)
+            __belay_pack(v, o)
+    else:
+        s = bytes(repr(x), "utf8")
+        o.append(b"r" + __belay_spack("<I", len(s)))
+        o.append(s)
+    return o
+def __belay_unpack(b, i=0):
+    t = b[i]
+    i += 1
+    if t == 78:
+        return None, i
+    if t == 84:
+        return True, i
+    if t == 70:
+        return False, i
+    if t == 105:
+        return int(str(b[i + 1 : i + 1 + b[i]], "ascii")), i + 1 + b[i]
+    if t == 102:
+        return __belay_sunpack("<d", b, i)[0], i + 8
+    if t == 97:
+        c, z = chr(b[i]), b[i + 1]
+        n = __belay_sunpack("<I", b, i + 2)[0]
+        i += 6
+        for k in ("bhilq", "BHILQ", "fd"):
+            if c in k:
+                c = [j for j in k if __belay_calcsize(j) == z][0]
+                break
+        return __belay_array(c, b[i : i + n]), i + n
+    n = __belay_sunpack("<I", b, i)[0]
+    i += 4
+    if t == 115:
+        return str(b[i : i + n], "utf8"), i + n
+    if t == 98:
+        return bytes(b[i : i + n]), i + n
+    if t == 121:
+        return bytearray(b[i : i + n]), i + n
+    if t == 100:
+        o = {}
+        for _ in range(n):
+            k, i = __belay_unpack(b, i)
+            o[k], i = __belay_unpack(b, i)
+        return o, i
+    o = []
+    for _ in range(n):
+        x, i = __belay_unpack(b, i)
+        o.append(x)
+    if t == 116:
+        return tuple(o), i
+    if t == 83:
+        return set(o), i
+    return o, i
+def __belay_b64(x):
+    return str(__belay_b2a(b"".join(__belay_pack(x, []))), "ascii")
+def __belay_arg(s):
+    return __belay_unpack(__belay_a2b(s))[0]
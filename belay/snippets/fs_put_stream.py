@@ -0,0 +1,32 @@
+def __belay_put(fn, n, z=""):
+    import sys, gc
+    try:
+        from binascii import a2b_base64
+        r = sys.stdin.buffer.read
+    except (AttributeError, ImportError):
+        print(0)
+        return
+    try:
+        gc.collect()
+        n = max(256, min(n, gc.mem_free() // 8))
+    except AttributeError:
+        pass
+    if z == "deflate":
+        from deflate import DeflateIO
+        from io import BytesIO
+        d = lambda b: DeflateIO(BytesIO(b)).read()
+    elif z:
+        from zlib import decompress
+        d = lambda b: decompress(b, 10)
+    print(n)
+    w = sys.stdout.write
+    with open(fn, "wb") as f:
+        while True:
+            size = int(r(8), 16)
+            if not size:
+                break
+            data = a2b_base64(r(size))
+            f.write(d(data) if z else data)
+            # Only acknowledge once written; input arriving while
+            # writing to flash may overflow small UART RX buffers.
+            w("\x06")
@@ -0,0 +1,21 @@
+def __belay_probe():
+    import sys
+    e = ()
+    for x in ("native", "viper"):
+        try:
+            exec("@micropython." + x + "\ndef f(a, b): return a + b", {})
+        except Exception as ex:
+            if "invalid micropython decorator" not in str(ex):
+                raise
+            break
+        e += (x,)
+    z = ""
+    for x in ("deflate", "zlib"):
+        try:
+            __import__(x)
+        except ImportError:
+            continue
+        z = x
+        break
+    i = sys.implementation
+    return (i.name, i.version, sys.platform, z) + e
@@ -0,0 +1,17 @@
+# Requires the "startup" and "codec" snippets.
+try:
+    __belay_tasks
+except NameError:  # Preserve registered tasks when attaching warm.
+    __belay_tasks = {}
+def __belay_rpc():
+    r = sys.stdin.readline
+    while True:
+        line = r()
+        if len(line) < 2:
+            break
+        i, t, a, k = __belay_unpack(__belay_a2b(line))[0]
+        try:
+            res = (i, 0, __belay_tasks[t](*a, **k))
+        except Exception as e:
+            res = (i, 1, __belay_exc(e))
+        print("_BELAYF" + __belay_b64(res), end="")
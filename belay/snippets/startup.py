@@ -4,3 +4,36 @@ def __belay_next(x, val):
         return x.send(val)
     except StopIteration:
         print("_BELAYS")
+__belay_gen_exc = {}
+def __belay_prefetch(x, val, n):
+    if x in __belay_gen_exc:
+        raise __belay_gen_exc.pop(x)
+    r = []
+    try:
+        r.append(x.send(val))
+        while len(r) < n:
+            r.append(next(x))
+    except StopIteration:
+        return r, True
+    except Exception as e:
+        if not r:
+            raise
+        __belay_gen_exc[x] = e
+    return r, False
+def __belay_exc(e):
+    import io
+    s = io.StringIO()
+    try:
+        sys.print_exception(e, s)
+    except AttributeError:
+        import traceback
+        traceback.print_exception(e, e, e.__traceback__, file=s)
+    return s.getvalue()
+def __belay_batch(*fs):
+    r = []
+    for f in fs:
+        try:
+            r.append((0, f()))
+        except Exception as e:
+            r.append((1, __belay_exc(e)))
+    return r
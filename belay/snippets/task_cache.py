@@ -0,0 +1,18 @@
+import os
+def __belay_cache_exec(fn, h):
+    # Missing, truncated, or otherwise corrupt files don't match the hash.
+    if __belay_hf(fn, memoryview(bytearray(256))) != h:
+        return False
+    f = open(fn)
+    src = f.read()
+    f.close()
+    exec(src, globals())
+    return True
+def __belay_cache_clean(path, prefix):
+    try:
+        os.mkdir(path)
+    except OSError:
+        pass
+    for name in os.listdir(path):
+        if name.startswith(prefix):
+            os.remove(path + "/" + name)
@@ -0,0 +1,41 @@
+# Installed on-device as ``belay_tcp.py`` by ``Device.install_tcp_server``.
+# Serves the REPL over a raw TCP socket to a single, password-authenticated client at a time.
+import os, socket
+_server = None
+_password = None
+def _accept(s):
+    c, _ = s.accept()
+    prev = os.dupterm(None)
+    os.dupterm(prev)
+    if prev:
+        # Like webrepl, don't take over an active session.
+        c.write(b"Concurrent connection rejected\r\n")
+        c.close()
+        return
+    c.settimeout(10)
+    try:
+        c.write(b"Password: ")
+        ok = c.readline().rstrip(b"\r\n") == _password
+        c.write(b"\r\nConnected\r\n" if ok else b"\r\nAccess denied\r\n")
+    except OSError:
+        ok = False
+    if not ok:
+        c.close()
+        return
+    c.setblocking(False)
+    if hasattr(os, "dupterm_notify"):
+        c.setsockopt(socket.SOL_SOCKET, 20, os.dupterm_notify)
+    os.dupterm(c)
+def start(port=8267, password=None, host="0.0.0.0"):
+    global _server, _password
+    if _server:
+        return
+    if password is None:
+        import webrepl_cfg
+        password = webrepl_cfg.PASS
+    _password = password.encode()
+    _server = socket.socket()
+    _server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    _server.bind(socket.getaddrinfo(host, port)[0][-1])
+    _server.listen(1)
+    _server.setsockopt(socket.SOL_SOCKET, 20, _accept)
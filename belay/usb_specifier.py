@@ -86,3 +86,17 @@ def list_devices() -> List[UsbSpecifier]:
         for port in comports()
     ]
     return [x for x in devices if x.populated()]
+
+
+def serial_number(port: str) -> Optional[str]:
+    """Get the USB serial number of the device connected to ``port``.
+
+    Returns
+    -------
+    Optional[str]
+        Serial number, or ``None`` if ``port`` isn't a USB device with a serial number.
+    """
+    for port_info in comports():
+        if port_info.device == port:
+            return port_info.serial_number
+    return None
@@ -23,11 +23,10 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE.
 """
-import errno
+import selectors
 import socket
 import struct
 import sys
-from collections import deque
 from pathlib import Path
 
 from .exceptions import AuthenticationError
@@ -53,60 +52,68 @@ class WebreplError(Exception):
 
 
 class Websocket:
+    """Minimal websocket client framing, as spoken by MicroPython's WebREPL server."""
+
+    # MicroPython's websocket implementation doesn't support 64-bit payload lengths;
+    # larger messages are split into multiple frames.
+    max_frame_size = 0xFFFF
+
     def __init__(self, s: socket.socket):
         self.s = s
-        self.buf = b""
+        self.buf = bytearray()  # Unconsumed payload of the most recently received frame.
+
+    def _send_frame(self, opcode, data):
+        for i in range(0, len(data), self.max_frame_size):
+            chunk = data[i : i + self.max_frame_size]
+            chunk_len = len(chunk)
+            if chunk_len < 126:
+                hdr = struct.pack(">BB", opcode, chunk_len)
+            else:
+                hdr = struct.pack(">BBH", opcode, 126, chunk_len)
+            # A single send avoids delayed-ACK stalls between header and payload.
+            self.s.sendall(hdr + chunk)
 
     def write(self, data):
-        data_len = len(data)
-        hdr = struct.pack(">BB", 130, data_len) if data_len < 126 else struct.pack(">BBH", 130, 126, data_len)
-        self.s.send(hdr)
-        self.s.send(data)
+        self._send_frame(0x82, data)
 
     def writetext(self, data: bytes):
-        data_len = len(data)
-        hdr = struct.pack(">BB", 129, data_len) if data_len < 126 else struct.pack(">BBH", 129, 126, data_len)
-        self.s.send(hdr)
-        self.s.send(data)
+        self._send_frame(0x81, data)
 
     def recvexactly(self, sz):
-        res = b""
-        while sz:
-            data = self.s.recv(sz)
-            if not data:
-                break
-            res += data
-            sz -= len(data)
+        """Receive exactly ``sz`` bytes; raises ``ConnectionResetError`` if the device closed the connection."""
+        res = bytearray(sz)
+        with memoryview(res) as view:
+            n = 0
+            while n < sz:
+                n_recv = self.s.recv_into(view[n:])
+                if not n_recv:
+                    raise ConnectionResetError("Connection closed by device.")
+                n += n_recv
         return res
 
+    def _recv_header(self):
+        fl, sz = struct.unpack(">BB", self.recvexactly(2))
+        if sz >= 126:
+            fmt = ">H" if sz == 126 else ">Q"
+            (sz,) = struct.unpack(fmt, self.recvexactly(struct.calcsize(fmt)))
+        return fl, sz
+
+    def recv_frame(self, text_ok=False):
+        """Receive the next data frame into ``buf``, skipping other frames."""
+        while True:
+            fl, sz = self._recv_header()
+            data = self.recvexactly(sz)
+            if fl == 0x82 or (text_ok and fl == 0x81):
+                self.buf += data
+                return
+            debugmsg("Got unexpected websocket record of type %x, skipping it" % fl)
+
     def read(self, size, text_ok=False, size_match=True):
         if not self.buf:
-            while True:
-                hdr = self.recvexactly(2)
-                if len(hdr) != 2:
-                    raise WebreplError
-                fl, sz = struct.unpack(">BB", hdr)
-                if sz == 126:
-                    hdr = self.recvexactly(2)
-                    if len(hdr) != 2:
-                        raise WebreplError
-                    (sz,) = struct.unpack(">H", hdr)
-                if fl == 0x82:
-                    break
-                if text_ok and fl == 0x81:
-                    break
-                debugmsg("Got unexpected websocket record of type %x, skipping it" % fl)
-                while sz:
-                    skip = self.s.recv(sz)
-                    debugmsg("Skip data: %s" % skip)
-                    sz -= len(skip)
-            data = self.recvexactly(sz)
-            if len(data) != sz:
-                raise WebreplError
-            self.buf = data
+            self.recv_frame(text_ok)
 
-        d = self.buf[:size]
-        self.buf = self.buf[size:]
+        d = bytes(self.buf[:size])
+        del self.buf[:size]
         if size_match and len(d) != size:
             raise WebreplError
         return d
@@ -130,7 +137,7 @@ def read_resp(ws):
     data = ws.read(4)
     sig, code = struct.unpack("<2sH", data)
     if sig != b"WB":
-        raise WebreplError
+        raise WebreplError("Invalid file transfer response.")
     return code
 
 
@@ -147,7 +154,16 @@ def get_ver(ws):
     return d
 
 
-def put_file(ws, local_file, remote_file):
+def put_file(ws, local_file, remote_file, chunk_size=1024, progress_callback=None):
+    """Upload ``local_file`` to ``remote_file`` via the WebREPL file transfer protocol.
+
+    Parameters
+    ----------
+    chunk_size: int
+        Bytes sent per websocket frame.
+    progress_callback: Optional[Callable]
+        Called with ``(written, total)`` bytes after every chunk.
+    """
     local_file = Path(local_file)
     sz = local_file.stat().st_size
     dest_fname = (SANDBOX + remote_file).encode("utf-8")
@@ -156,30 +172,38 @@ def put_file(ws, local_file, remote_file):
     ws.write(rec[:10])
     ws.write(rec[10:])
     if read_resp(ws) != 0:
-        raise WebreplError
+        raise WebreplError(f"Cannot open {remote_file!r} for writing.")
     cnt = 0
     with local_file.open("rb") as f:
         while True:
-            sys.stdout.write("Sent %d of %d bytes\r" % (cnt, sz))
-            sys.stdout.flush()
-            buf = f.read(1024)
+            buf = f.read(chunk_size)
             if not buf:
                 break
             ws.write(buf)
             cnt += len(buf)
-    print()
+            if progress_callback:
+                progress_callback(cnt, sz)
     if read_resp(ws) != 0:
-        raise WebreplError
+        raise WebreplError(f"Failed writing {remote_file!r}.")
 
 
-def get_file(ws, local_file, remote_file):
+def get_file(ws, local_file, remote_file, progress_callback=None, size=None):
+    """Download ``remote_file`` to ``local_file`` via the WebREPL file transfer protocol.
+
+    Parameters
+    ----------
+    progress_callback: Optional[Callable]
+        Called with ``(written, size)`` bytes after every received block.
+    size: Optional[int]
+        Size of ``remote_file``, passed along to ``progress_callback``.
+    """
     local_file = Path(local_file)
     src_fname = (SANDBOX + remote_file).encode("utf-8")
     rec = struct.pack(WEBREPL_REQ_S, b"WA", WEBREPL_GET_FILE, 0, 0, 0, len(src_fname), src_fname)
     debugmsg("%r %d" % (rec, len(rec)))
     ws.write(rec)
     if read_resp(ws) != 0:
-        raise WebreplError
+        raise WebreplError(f"Cannot open {remote_file!r} for reading.")
     with local_file.open("wb") as f:
         cnt = 0
         while True:
@@ -194,11 +218,10 @@ def get_file(ws, local_file, remote_file):
                 cnt += len(buf)
                 f.write(buf)
                 sz -= len(buf)
-                sys.stdout.write("Received %d bytes\r" % cnt)
-                sys.stdout.flush()
-    print()
+            if progress_callback:
+                progress_callback(cnt, size)
     if read_resp(ws) != 0:
-        raise WebreplError
+        raise WebreplError(f"Failed reading {remote_file!r}.")
 
 
 def help(rc=0):
@@ -259,8 +282,9 @@ class WebsocketClosedError(Exception):
 
 
 class WebreplToSerial:
+    file_chunk_size = 16384  # Bytes per websocket frame for file uploads.
+
     def __init__(self, uri, password, read_timeout=None):
-        self.fifo = deque()
         self.read_timeout = read_timeout
 
         if uri.startswith("ws://"):
@@ -271,9 +295,12 @@ class WebreplToSerial:
         self.s = socket.socket()
         self.s.settimeout(read_timeout)
         self.s.connect((host, port))
+        self.s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
         client_handshake(self.s)
 
         self.ws = Websocket(self.s)
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self.s, selectors.EVENT_READ)
 
         login(self.ws, password)
         response = self.read(1024)
@@ -284,6 +311,7 @@ class WebreplToSerial:
 
     def close(self):
         if self.s is not None:
+            self._selector.close()
             self.s.close()
         self.s = self.ws = None
 
@@ -293,36 +321,40 @@ class WebreplToSerial:
         self.ws.writetext(data)
         return len(data)
 
+    def fileno(self) -> int:
+        if self.s is None:
+            raise WebsocketClosedError
+        return self.s.fileno()
+
     def read(self, size=1) -> bytes:
         if self.ws is None:
             raise WebsocketClosedError
+        return self.ws.read(size, text_ok=True, size_match=False)
 
-        readin = self.ws.read(size, text_ok=True, size_match=False)
-        self.fifo.extend(readin)
+    def put_file(self, src, dest, progress_callback=None):
+        """Upload a file via WebREPL's binary file transfer protocol.
 
-        data = b""
-        while len(data) < size and len(self.fifo) > 0:
-            data += bytes([self.fifo.popleft()])
-        return data
+        The device must be idle, waiting for REPL input.
+        """
+        if self.ws is None:
+            raise WebsocketClosedError
+        put_file(self.ws, src, dest, chunk_size=self.file_chunk_size, progress_callback=progress_callback)
+
+    def get_file(self, src, dest, progress_callback=None, size=None):
+        """Download a file via WebREPL's binary file transfer protocol.
+
+        The device must be idle, waiting for REPL input.
+        """
+        if self.ws is None:
+            raise WebsocketClosedError
+        get_file(self.ws, dest, src, progress_callback=progress_callback, size=size)
 
     @property
     def in_waiting(self):
         if self.s is None or self.ws is None:
             raise WebsocketClosedError
 
-        n_waiting = len(self.fifo) + len(self.ws.buf)
-        if not n_waiting:
-            self.s.setblocking(False)
-            try:
-                n_waiting = len(self.s.recv(1024, socket.MSG_PEEK))
-            except BlockingIOError:
-                pass
-            except OSError as e:
-                if e == errno.EAGAIN or e == errno.EWOULDBLOCK:
-                    pass
-                else:
-                    raise
-            self.s.setblocking(True)
-            return n_waiting
-        else:
-            return n_waiting
+        # Receive all frames that have started arriving.
+        while self._selector.select(0):
+            self.ws.recv_frame(text_ok=True)
+        return len(self.ws.buf)
@@ -0,0 +1,152 @@
+"""Serve the REPL of a local process over a socket, standing in for a networked board.
+
+The process (e.g. the MicroPython unix port) keeps running between connections, like a real board.
+"""
+import os
+import socket
+import struct
+import subprocess
+import threading
+
+
+class Bridge:
+    """Forward a TCP connection to the stdin/stdout of ``command``.
+
+    Parameters
+    ----------
+    command: str
+        Shell command of the process providing the REPL.
+    protocol: str
+        One of:
+
+        * ``"tcp"`` - raw TCP with a password prompt, like ``Device.install_tcp_server``.
+        * ``"ws"`` - WebREPL (websocket framing and password login).
+        * ``"telnet"`` - telnet with a WiPy-style login.
+    password: str
+        Login password.
+    """
+
+    def __init__(self, command: str, protocol: str = "tcp", password: str = "python"):
+        if protocol not in ("tcp", "ws", "telnet"):
+            raise ValueError(f"Unknown protocol {protocol!r}.")
+        self.protocol = protocol
+        self.password = password
+        self.proc = subprocess.Popen(command, shell=True, stdin=subprocess.PIPE, stdout=subprocess.PIPE, bufsize=0)
+        self.conn = None
+        self.server = socket.create_server(("127.0.0.1", 0))
+        self.port = self.server.getsockname()[1]
+        threading.Thread(target=self._serve, daemon=True).start()
+        threading.Thread(target=self._pump_output, daemon=True).start()
+
+    @property
+    def uri(self) -> str:
+        if self.protocol == "telnet":
+            # Belay detects telnet connections by their IP address.
+            return f"127.0.0.1:{self.port}"
+        return f"{self.protocol}://127.0.0.1:{self.port}"
+
+    def close(self):
+        self.server.close()
+        self.proc.kill()
+        self.proc.wait()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            stream = conn.makefile("rb")
+            if self.protocol == "tcp":
+                self._tcp_login(conn, stream)
+            elif self.protocol == "ws":
+                self._login(conn, stream)
+            elif self.protocol == "telnet":
+                self._telnet_login(conn, stream)
+            self.conn = conn
+            threading.Thread(target=self._pump_input, args=(stream,), daemon=True).start()
+
+    def _send(self, conn, data):
+        if self.protocol == "tcp":
+            conn.sendall(data)
+            return
+        if self.protocol == "telnet":
+            conn.sendall(data.replace(b"\xff", b"\xff\xff"))
+            return
+        for i in range(0, len(data), 0xFFFF):
+            chunk = data[i : i + 0xFFFF]
+            if len(chunk) < 126:
+                header = struct.pack(">BB", 0x81, len(chunk))
+            else:
+                header = struct.pack(">BBH", 0x81, 126, len(chunk))
+            conn.sendall(header + chunk)
+
+    def _pump_output(self):
+        while True:
+            data = os.read(self.proc.stdout.fileno(), 65536)
+            if not data:
+                return
+            if self.conn is not None:
+                try:
+                    self._send(self.conn, data)
+                except OSError:
+                    self.conn = None
+
+    def _pump_input(self, stream):
+        try:
+            while True:
+                data = self._recv_frame(stream) if self.protocol == "ws" else stream.read1(65536)
+                if not data:
+                    return
+                if self.protocol == "telnet":
+                    # The client doesn't negotiate options; only unescape 0xFF bytes.
+                    data = data.replace(b"\xff\xff", b"\xff")
+                self.proc.stdin.write(data)
+        except (OSError, ValueError):
+            return
+
+    @staticmethod
+    def _recv_frame(stream) -> bytes:
+        header = stream.read(2)
+        if len(header) < 2:
+            return b""
+        size = header[1] & 0x7F
+        if size == 126:
+            (size,) = struct.unpack(">H", stream.read(2))
+        elif size == 127:
+            (size,) = struct.unpack(">Q", stream.read(8))
+        mask = stream.read(4) if header[1] & 0x80 else None
+        data = stream.read(size)
+        if mask:
+            data = bytes(b ^ mask[i % 4] for i, b in enumerate(data))
+        return data
+
+    def _login(self, conn, stream):
+        while stream.readline() not in (b"\r\n", b""):
+            pass
+        conn.sendall(b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n\r\n")
+        self._send(conn, b"Password: ")
+        if self._recv_frame(stream).rstrip(b"\r") == self.password.encode():
+            self._send(conn, b"\r\nWebREPL connected\r\n>>> ")
+        else:
+            self._send(conn, b"\r\nAccess denied\r\n")
+
+    def _tcp_login(self, conn, stream):
+        # Like ``belay/snippets/tcp_server.py``.
+        conn.sendall(b"Password: ")
+        if stream.readline().rstrip(b"\r\n") == self.password.encode():
+            conn.sendall(b"\r\nConnected\r\n")
+        else:
+            conn.sendall(b"\r\nAccess denied\r\n")
+
+    def _telnet_login(self, conn, stream):
+        # Like the WiPy, offer to echo and suppress go-ahead; a client is expected to refuse.
+        conn.sendall(b"\xff\xfb\x01\xff\xfb\x03")
+        conn.sendall(b"MicroPython\r\nLogin as: ")
+        stream.readline()  # User, preceded by the client's refusals.
+        conn.sendall(b"Password: ")
+        if stream.readline().rstrip(b"\r\n") == self.password.encode():
+            conn.sendall(b'\r\nLogin succeeded!\r\nType "help()" for more information.\r\n>>> ')
+        else:
+            conn.sendall(b"\r\nInvalid credentials, try again.\r\n")
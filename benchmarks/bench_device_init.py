@@ -0,0 +1,79 @@
+"""Time to construct a ``Device`` subclass with many tasks and threads.
+
+All class-level definitions are uploaded in a single command during ``__init__``,
+so construction time should grow slowly with the number of tasks.
+With ``--lazy``, task source code isn't sent at all until a task is first called.
+With ``--cache``, the definitions are stored on-device during the first construction,
+and executed from the device's filesystem afterwards.
+
+Usage::
+
+    python benchmarks/bench_device_init.py [--device DEVICE] [-n N] [--repeat REPEAT] [--lazy] [--cache]
+"""
+import argparse
+import importlib.util
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+TEMPLATE_TASK = '''
+    @Device.task
+    def task_{i}(a, b=1):
+        """Docstring to be minified away."""
+        c = a + b
+        return [c * x for x in range({i} + 1)]
+'''
+
+TEMPLATE_THREAD = """
+    @Device.thread
+    def thread_{i}(period):
+        while True:
+            sleep(period)
+"""
+
+
+def make_device_class(tmp_dir, n_tasks, n_threads):
+    """Write a module defining a ``Device`` subclass, and import it.
+
+    The source needs to be in a real file so that ``inspect`` can retrieve it.
+    """
+    name = f"bench_device_{n_tasks}_{n_threads}"
+    src = f"from belay import Device\n\n\nclass {name.title().replace('_', '')}(Device):\n    pass\n"
+    src += "".join(TEMPLATE_TASK.format(i=i) for i in range(n_tasks))
+    src += "".join(TEMPLATE_THREAD.format(i=i) for i in range(n_threads))
+
+    path = Path(tmp_dir) / f"{name}.py"
+    path.write_text(src)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return getattr(module, name.title().replace("_", ""))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--device", default=os.environ.get("BELAY_BENCH_DEVICE", "exec:micropython"))
+    parser.add_argument("-n", type=int, nargs="+", default=[0, 10, 40], help="Number of tasks.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--lazy", action="store_true", help="Defer task uploads until first call.")
+    parser.add_argument("--cache", action="store_true", help="Store definitions on the device's filesystem.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for n_tasks in args.n:
+            cls = make_device_class(tmp_dir, n_tasks, n_threads=n_tasks // 10)
+            durations = []
+            for _ in range(args.repeat):
+                t_start = time.perf_counter()
+                device = cls(args.device, lazy=args.lazy, cache=args.cache)
+                durations.append(time.perf_counter() - t_start)
+                device.close()
+            print(f"{n_tasks:4d} tasks: {1000 * statistics.median(durations):8.1f} ms (median of {args.repeat})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""Throughput of iterating over a generator task, with and without prefetching.
+
+Uses the ``count`` generator from ``examples/10_generators``, without the host-side sleep.
+
+Usage::
+
+    python benchmarks/bench_generator.py [--device DEVICE] [-n N]
+"""
+import argparse
+import os
+import time
+
+import belay
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--device", default=os.environ.get("BELAY_BENCH_DEVICE", "exec:micropython"))
+    parser.add_argument("-n", type=int, default=10_000, help="Number of items yielded.")
+    args = parser.parse_args()
+
+    with belay.Device(args.device) as device:
+        for prefetch in (1, None):
+
+            @device.task(prefetch=prefetch)
+            def count(n):
+                i = 0
+                while True:
+                    yield i
+                    if i >= n:
+                        break
+                    i += 1
+
+            t_start = time.perf_counter()
+            for _ in count(args.n - 1):
+                pass
+            duration = time.perf_counter() - t_start
+
+            label = "single-step" if prefetch == 1 else "adaptive prefetch"
+            print(f"{label:>18}: {args.n / duration:10.0f} items/s  ({duration:.3f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Latency and throughput of network transports, against a local stand-in for a networked board.
+
+The REPL of ``--command`` (e.g. the MicroPython unix port) is served over
+raw TCP (``tcp://``, as served by ``Device.install_tcp_server``),
+a WebREPL stand-in (``ws://``) and a telnet stand-in (WiPy-style login),
+and compared to a direct ``exec:`` connection.
+
+Usage::
+
+    python benchmarks/bench_network.py [--command COMMAND] [-n N] [--size SIZE]
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from _bridge import Bridge  # noqa: E402
+
+import belay  # noqa: E402
+
+
+def bench(device, n, size):
+    @device.task
+    def noop():
+        return None
+
+    @device.task(binary=True)
+    def download(size) -> bytes:
+        return bytes(size)
+
+    @device.task
+    def upload(data):
+        return len(data)
+
+    for _ in range(10):  # warmup
+        noop()
+
+    t_start = time.perf_counter()
+    for _ in range(n):
+        noop()
+    latency = (time.perf_counter() - t_start) / n
+
+    t_start = time.perf_counter()
+    for _ in range(10):
+        download(size)
+    download_rate = 10 * size / (time.perf_counter() - t_start)
+
+    data = bytes(size)
+    t_start = time.perf_counter()
+    for _ in range(10):
+        upload(data)
+    upload_rate = 10 * size / (time.perf_counter() - t_start)
+
+    return latency, download_rate, upload_rate
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--command", default=os.environ.get("BELAY_BENCH_COMMAND", "micropython"))
+    parser.add_argument("-n", type=int, default=100, help="Number of calls for latency.")
+    parser.add_argument("--size", type=int, default=16384, help="Bytes transferred per call for throughput.")
+    args = parser.parse_args()
+
+    print(f"{'transport':>10}  {'latency':>10}  {'download':>12}  {'upload':>12}")
+    for transport in ("exec", "tcp", "ws", "telnet"):
+        bridge = None
+        if transport == "exec":
+            uri = f"exec:{args.command}"
+        else:
+            bridge = Bridge(args.command, protocol=transport)
+            uri = bridge.uri
+        try:
+            with belay.Device(uri, password="python") as device:
+                latency, download_rate, upload_rate = bench(device, args.n, args.size)
+        finally:
+            if bridge:
+                bridge.close()
+        print(
+            f"{transport:>10}  {latency * 1e3:7.3f} ms  {download_rate / 1e6:7.2f} MB/s  {upload_rate / 1e6:7.2f} MB/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Throughput of streaming a large amount of stdout from the device to the host.
+
+Usage::
+
+    python benchmarks/bench_stdout_stream.py [--device DEVICE] [--megabytes MB]
+"""
+import argparse
+import io
+import os
+import time
+
+import belay
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--device", default=os.environ.get("BELAY_BENCH_DEVICE", "exec:micropython"))
+    parser.add_argument("--megabytes", type=float, default=10.0, help="Amount of stdout to stream.")
+    parser.add_argument("--line-length", type=int, default=64, help="Characters per printed line.")
+    args = parser.parse_args()
+
+    n_lines = int(args.megabytes * 1_000_000) // (args.line_length + 1)
+
+    with belay.Device(args.device) as device:
+
+        @device.task
+        def chatter(n_lines, line_length):
+            line = "x" * line_length
+            for _ in range(n_lines):
+                print(line)
+
+        sink = io.StringIO()
+        t_start = time.perf_counter()
+        device(f"chatter({n_lines}, {args.line_length})", stream_out=sink)
+        duration = time.perf_counter() - t_start
+
+    received = len(sink.getvalue())
+    print(f"Received {received / 1e6:.2f} MB ({n_lines} lines) in {duration:.2f} s")
+    print(f"    {received / 1e6 / duration:.2f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
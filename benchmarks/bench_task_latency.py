@@ -0,0 +1,65 @@
+"""Round-trip latency of a trivial ``@device.task``, and host CPU usage while idle.
+
+Usage::
+
+    python benchmarks/bench_task_latency.py [--device DEVICE] [-n N]
+"""
+import argparse
+import os
+import statistics
+import time
+
+import belay
+
+
+def percentile(data, p):
+    data = sorted(data)
+    return data[min(len(data) - 1, round(p / 100 * (len(data) - 1)))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--device", default=os.environ.get("BELAY_BENCH_DEVICE", "exec:micropython"))
+    parser.add_argument("-n", type=int, default=1000, help="Number of task invocations.")
+    parser.add_argument(
+        "--idle",
+        type=float,
+        default=2.0,
+        help="Seconds the device-side task blocks for.",
+    )
+    args = parser.parse_args()
+
+    with belay.Device(args.device) as device:
+
+        @device.task
+        def noop():
+            return None
+
+        @device.task
+        def block(duration):
+            import time
+
+            time.sleep(duration)
+
+        for _ in range(10):  # warmup
+            noop()
+
+        latencies = []
+        for _ in range(args.n):
+            t_start = time.perf_counter()
+            noop()
+            latencies.append(time.perf_counter() - t_start)
+
+        cpu_start, wall_start = time.process_time(), time.perf_counter()
+        block(args.idle)
+        cpu, wall = time.process_time() - cpu_start, time.perf_counter() - wall_start
+
+    print(f"Round-trip latency over {args.n} calls:")
+    print(f"    mean: {statistics.mean(latencies) * 1e3:.3f} ms")
+    print(f"    p50:  {percentile(latencies, 50) * 1e3:.3f} ms")
+    print(f"    p99:  {percentile(latencies, 99) * 1e3:.3f} ms")
+    print(f"Host CPU while waiting on a {args.idle:.1f}s task: {100 * cpu / wall:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+from typer.testing import CliRunner
+
+from belay.cli import app
+
+
+def test_serve_basic(mocker, tmp_path):
+    serve_forever = mocker.patch("belay.cli.serve.serve_forever")
+    socket = tmp_path / "board.sock"
+    result = CliRunner().invoke(app, ["serve", "/dev/ttyUSB0", "--socket", str(socket), "--password", "password"])
+    assert result.exit_code == 0
+    serve_forever.assert_called_once_with("/dev/ttyUSB0", socket, password="password")
@@ -1,4 +1,5 @@
 import os
+import socket
 from distutils import dir_util
 from functools import partial
 from pathlib import Path
@@ -9,7 +10,9 @@ from typer.testing import CliRunner
 import belay
 import belay.cli.common
 import belay.project
+from belay._buffer import ReceiveBuffer
 from belay.cli import app
+from belay.pyboard import Pyboard, ReadWaiter
 
 
 class MockDevice:
@@ -34,11 +37,20 @@ def cache_clear():
     belay.project.find_dependencies_folder.cache_clear()
     belay.project.find_cache_folder.cache_clear()
     belay.project.find_cache_dependencies_folder.cache_clear()
+    belay.project.find_sync_cache_folder.cache_clear()
     belay.project.load_pyproject.cache_clear()
     belay.project.load_toml.cache_clear()
     belay.project.load_groups.cache_clear()
 
 
+@pytest.fixture(autouse=True)
+def sync_cache_folder(mocker, tmp_path_factory):
+    """Keep ``Device.sync``'s host-side cache out of the repository."""
+    folder = tmp_path_factory.mktemp("sync-cache")
+    mocker.patch("belay.project.find_sync_cache_folder", return_value=folder)
+    return folder
+
+
 @pytest.fixture(autouse=True)
 def restore_cwd():
     cwd = Path.cwd()
@@ -63,6 +75,57 @@ def cli_runner(mock_device):
     return run
 
 
+class SocketTransport:
+    """Minimal serial-like transport over one end of a socketpair."""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.sock.setblocking(False)
+
+    def read(self, size=1):
+        return self.sock.recv(size)
+
+    def write(self, data):
+        self.sock.sendall(data)
+        return len(data)
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    @property
+    def in_waiting(self):
+        try:
+            return len(self.sock.recv(65536, socket.MSG_PEEK))
+        except BlockingIOError:
+            return 0
+
+    def close(self):
+        self.sock.close()
+
+
+@pytest.fixture
+def socket_pair():
+    a, b = socket.socketpair()
+    yield SocketTransport(a), b
+    a.close()
+    b.close()
+
+
+@pytest.fixture
+def pyboard(mocker, socket_pair):
+    transport, remote = socket_pair
+
+    def mock_init(self, *args, **kwargs):
+        self.serial = transport
+        self._rx = ReceiveBuffer()
+        self._rx_delivered = 0
+        self._read_waiter = ReadWaiter(transport)
+        self.in_raw_repl = False
+
+    mocker.patch.object(Pyboard, "__init__", mock_init)
+    return Pyboard(), remote
+
+
 @pytest.fixture(
     params=[
         "micropython-v1.17.uf2",
@@ -0,0 +1,163 @@
+import socket
+import threading
+
+import pytest
+from serial import SerialException
+
+from belay import ConnectionFailedError, PyboardException
+from belay.broker import BrokerServer, RemotePyboard, _header, _recv, _send, default_socket_path, serve
+from belay.pyboard import PyboardError
+
+
+class FakeBoard:
+    banner = b"MicroPython v1.19.1 on 2022-06-18; Raspberry Pi Pico with RP2040\r\n"
+
+    def __init__(self, *args, **kwargs):
+        self.puts = []
+        self.closed = False
+
+    def enter_raw_repl(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def exec(self, command, data_consumer=None):
+        if command == "raise":
+            raise PyboardException("Traceback (most recent call last):\nException: foo\n")
+        if command == "unplug":
+            raise SerialException("device reports readiness to read but returned no data")
+        if data_consumer:
+            data_consumer(b"printed\r\n")
+        return command.encode()
+
+    def fs_put(self, src, dest, chunk_size=256, progress_callback=None):
+        self.puts.append((src, dest))
+        if progress_callback:
+            progress_callback(10, 10)
+
+
+@pytest.fixture
+def broker(tmp_path):
+    path = tmp_path / "board.sock"
+    board = FakeBoard()
+    server = BrokerServer(path, board, "/dev/ttyUSB0")
+    thread = threading.Thread(target=server.serve_forever, args=(0.01,))
+    thread.start()
+    yield path, board
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def test_remote_pyboard_exec(broker):
+    path, _ = broker
+    board = RemotePyboard(path)
+    assert board.port == "/dev/ttyUSB0"
+    assert board.banner == FakeBoard.banner
+
+    data = []
+    assert board.exec("foo", data_consumer=data.append) == b"foo"
+    assert data == [b"printed\r\n"]
+    board.close()
+
+
+def test_remote_pyboard_exception(broker):
+    path, _ = broker
+    board = RemotePyboard(path)
+    with pytest.raises(PyboardException) as e:
+        board.exec("raise")
+    assert e.value.args[0] == "Traceback (most recent call last):\nException: foo\n"
+
+    # The connection is still usable afterwards.
+    assert board.exec("foo") == b"foo"
+    board.close()
+
+
+def test_remote_pyboard_data_consumer_exception(broker):
+    path, _ = broker
+    board = RemotePyboard(path)
+
+    def data_consumer(data):
+        raise ValueError
+
+    with pytest.raises(ValueError):
+        board.exec("foo", data_consumer=data_consumer)
+    assert board.exec("bar") == b"bar"
+    board.close()
+
+
+def test_remote_pyboard_fs_put(broker, tmp_path, monkeypatch):
+    path, fake_board = broker
+    monkeypatch.chdir(tmp_path)
+    board = RemotePyboard(path)
+
+    progress = []
+    board.fs_put(tmp_path / "foo.py", "/foo.py", progress_callback=lambda *args: progress.append(args))
+    assert fake_board.puts == [(str(tmp_path / "foo.py"), "/foo.py")]
+    assert progress == [(10, 10)]
+    board.close()
+
+
+def test_remote_pyboard_board_reset(mocker, broker):
+    path, fake_board = broker
+    fake_pyboard = mocker.patch("belay.broker.Pyboard", side_effect=FakeBoard)
+    board = RemotePyboard(path)
+
+    # Surfaced as ``ConnectionResetError``, so that ``Device`` reconnects.
+    with pytest.raises(ConnectionResetError):
+        board.exec("unplug")
+    assert fake_board.closed
+
+    # The daemon re-opens the board.
+    assert board.exec("foo") == b"foo"
+    fake_pyboard.assert_called_once_with("/dev/ttyUSB0")
+    board.close()
+
+
+def test_remote_pyboard_board_unavailable(mocker, broker):
+    path, _ = broker
+    board = RemotePyboard(path)
+    with pytest.raises(ConnectionResetError):
+        board.exec("unplug")
+    board.close()
+
+    mocker.patch("belay.broker.Pyboard", side_effect=PyboardError("failed to access /dev/ttyUSB0"))
+    with pytest.raises(ConnectionFailedError, match="failed to access"):
+        RemotePyboard(path)
+
+
+def test_broker_malformed_request(broker):
+    path, _ = broker
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(str(path))
+    stream = sock.makefile("rb")
+    assert _recv(stream)[0] == "hello"
+
+    for data in (b"(1,", b"(1, 2)", b"('exec', 'foo', {})"):
+        sock.sendall(_header.pack(len(data)) + data)
+        kind, name, message = _recv(stream)
+        assert (kind, name) == ("error", "ValueError")
+        assert message.startswith("Malformed request")
+
+    # The connection is still usable.
+    _send(sock, ("exec", ("foo",), {}))
+    assert _recv(stream) == ("result", b"foo")
+    stream.close()
+    sock.close()
+
+
+def test_remote_pyboard_connection_failed(tmp_path):
+    with pytest.raises(ConnectionFailedError):
+        RemotePyboard(tmp_path / "missing.sock")
+
+
+def test_serve_already_serving(broker):
+    path, _ = broker
+    with pytest.raises(ConnectionFailedError):
+        serve("/dev/ttyUSB0", path)
+
+
+def test_default_socket_path():
+    assert default_socket_path("/dev/ttyUSB0").name == "belay-dev_ttyUSB0.sock"
+    assert default_socket_path("ws://192.168.1.100").name == "belay-ws_192.168.1.100.sock"
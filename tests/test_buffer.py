@@ -0,0 +1,49 @@
+from belay._buffer import ReceiveBuffer
+
+
+def test_receive_buffer_readuntil():
+    buf = ReceiveBuffer()
+    buf.extend(b"foo\nbar")
+    assert buf.readuntil(b"\n") == b"foo\n"
+    assert buf.readuntil(b"\n") is None
+    assert len(buf) == 3
+    buf.extend(b"\nbaz")
+    assert buf.readuntil(b"\n") == b"bar\n"
+    assert buf.read() == b"baz"
+    assert not buf
+
+
+def test_receive_buffer_find_split_pattern():
+    buf = ReceiveBuffer()
+    buf.extend(b"abc\r")
+    assert buf.find(b"\r\n") == -1
+    buf.extend(b"\ndef")
+    assert buf.find(b"\r\n") == 5
+
+
+def test_receive_buffer_find_pattern_change():
+    buf = ReceiveBuffer()
+    buf.extend(b"a>b\x04")
+    assert buf.find(b"\x04") == 4
+    assert buf.find(b">") == 2
+
+
+def test_receive_buffer_peek_read():
+    buf = ReceiveBuffer()
+    buf.extend(b"0123456789")
+    assert buf.peek(2, 5) == b"234"
+    assert buf.read(3) == b"012"
+    assert buf.peek() == b"3456789"
+    assert buf.read(100) == b"3456789"
+
+
+def test_receive_buffer_compaction(mocker):
+    mocker.patch.object(ReceiveBuffer, "_compact_threshold", 4)
+    buf = ReceiveBuffer()
+    buf.extend(b"line1\nline2\nli")
+    assert buf.readuntil(b"\n") == b"line1\n"
+    assert buf.find(b"\n") == 6
+    assert buf.readuntil(b"\n") == b"line2\n"
+    assert buf._start == 0  # compacted
+    buf.extend(b"ne3\n")
+    assert buf.readuntil(b"\n") == b"line3\n"
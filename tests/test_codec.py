@@ -0,0 +1,110 @@
+import array
+import binascii
+
+import pytest
+
+from belay import _codec
+from belay.helpers import read_snippet
+
+values = [
+    None,
+    True,
+    False,
+    0,
+    -5,
+    2**100,
+    1.5,
+    "héllo",
+    b"\x00\x04",
+    bytearray(b"ab"),
+    array.array("H", [1, 2, 65535]),
+    array.array("f", [1.5]),
+    (1, (2, [3, {4: "x"}])),
+    {1, 2},
+    {"a": [1.0, None]},
+    [],
+    (),
+]
+
+
+@pytest.fixture
+def device_codec():
+    """Device-side codec snippet, executed under CPython."""
+    namespace = {}
+    exec(read_snippet("codec"), namespace)
+    return namespace
+
+
+@pytest.mark.parametrize("value", values)
+def test_codec_roundtrip(value):
+    actual = _codec.unpack(_codec.pack(value))
+    assert actual == value
+    assert type(actual) is type(value)
+
+
+@pytest.mark.parametrize("value", values)
+def test_codec_device_compatible(device_codec, value):
+    device_encoded = b"".join(device_codec["__belay_pack"](value, []))
+    host_encoded = _codec.pack(value)
+    assert device_encoded == host_encoded
+
+    actual, index = device_codec["__belay_unpack"](host_encoded)
+    assert actual == value
+    assert type(actual) is type(value)
+    assert index == len(host_encoded)
+
+
+def test_codec_memoryview():
+    assert _codec.unpack(_codec.pack(memoryview(b"foo"))) == b"foo"
+
+
+def test_codec_has_binary():
+    assert _codec.has_binary(b"foo")
+    assert _codec.has_binary(memoryview(b"foo"))
+    assert _codec.has_binary((1, [array.array("H")]))
+    assert _codec.has_binary({"a": bytearray()})
+    assert not _codec.has_binary((1, "foo", [2.5, None], {"a": b""}.keys()))
+    assert not _codec.has_binary({b"key": 1})
+
+
+def test_codec_unsupported_type():
+    with pytest.raises(_codec.UnsupportedTypeError):
+        _codec.pack(object())
+
+    with pytest.raises(_codec.UnsupportedTypeError):
+        _codec.pack(10**300)
+
+
+def test_codec_device_repr_fallback(device_codec):
+    encoded = b"".join(device_codec["__belay_pack"](complex(1, 2), []))
+    assert encoded[:1] == b"r"
+    assert _codec.unpack(encoded) == complex(1, 2)
+
+
+def test_codec_device_b64(device_codec):
+    encoded = device_codec["__belay_b64"]((1, "a"))
+    assert encoded.endswith("\n")
+    assert _codec.unpack(binascii.a2b_base64(encoded)) == (1, "a")
+
+
+def test_codec_to_numpy():
+    np = pytest.importorskip("numpy")
+    data = _codec.unpack(_codec.pack((array.array("h", [1, -2, 3]), {"a": [array.array("d", [0.5])]}, b"foo")))
+    actual = _codec.to_numpy(data)
+    assert isinstance(actual, tuple)
+    assert actual[0].dtype == np.dtype("h")
+    assert actual[0].tolist() == [1, -2, 3]
+    assert np.shares_memory(actual[0], np.frombuffer(data[0], dtype="h"))
+    assert actual[1]["a"][0].tolist() == [0.5]
+    assert actual[2] == b"foo"
+
+
+def test_codec_trailing_data():
+    with pytest.raises(ValueError):
+        _codec.unpack(_codec.pack(1) + b"N")
+
+
+def test_codec_device_arg(device_codec):
+    value = (bytearray(b"\x00\x01"), {"b": array.array("H", [1, 2])})
+    encoded = binascii.b2a_base64(_codec.pack(value), newline=False).decode()
+    assert device_codec["__belay_arg"](encoded) == value
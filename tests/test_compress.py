@@ -0,0 +1,57 @@
+import base64
+import os
+import sys
+import types
+import zlib
+
+from belay._compress import THRESHOLD, compress, compress_command
+
+CMD = "def foo():\n return 'hello world'\n" * 100 + "result = foo()\n"
+
+
+def test_compress():
+    data = CMD.encode()
+    assert zlib.decompress(compress(data)) == data
+    # Small window, so that devices don't need to allocate 32KB to decompress.
+    assert zlib.decompress(compress(data), 10) == data
+
+
+def test_compress_command_zlib():
+    compressed_cmd = compress_command(CMD, "zlib")
+    assert compressed_cmd.startswith("exec(__import__('zlib').decompress(")
+    assert len(compressed_cmd) < len(CMD) / 3
+
+    namespace = {}
+    exec(compressed_cmd, namespace)
+    assert namespace["result"] == "hello world"
+
+
+def test_compress_command_deflate(monkeypatch):
+    class DeflateIO:
+        def __init__(self, stream):
+            self.stream = stream
+
+        def read(self):
+            return zlib.decompress(self.stream.read())
+
+    monkeypatch.setitem(sys.modules, "deflate", types.SimpleNamespace(DeflateIO=DeflateIO))
+    compressed_cmd = compress_command(CMD, "deflate")
+    assert compressed_cmd.startswith("exec(__import__('deflate').DeflateIO(")
+
+    namespace = {}
+    exec(compressed_cmd, namespace)
+    assert namespace["result"] == "hello world"
+
+
+def test_compress_command_uncompressed():
+    # Device cannot decompress.
+    assert compress_command(CMD, "") == CMD
+
+    # Too short to be worth compressing.
+    cmd = "x = 1\n" * (THRESHOLD // 6)
+    assert len(cmd) < THRESHOLD
+    assert compress_command(cmd, "zlib") == cmd
+
+    # Incompressible.
+    cmd = f"x = {base64.b64encode(os.urandom(2 * THRESHOLD)).decode()!r}"
+    assert compress_command(cmd, "zlib") == cmd
@@ -1,14 +1,27 @@
+import array
+import asyncio
+import binascii
+import re
+import threading
+import time
+from pathlib import Path
+
 import pytest
 
 import belay
+import belay._codec
 import belay.device
+import belay.executers
 from belay import Device
-from belay.exceptions import NoMatchingExecuterError
+from belay.exceptions import MaxHistoryLengthError, NoMatchingExecuterError
+from belay.hash import fnv1a_bytes
+from belay.pyboard import PyboardException, SocketToSerial, TelnetToSerial
+from belay.webrepl import WebreplToSerial
 
 
 @pytest.fixture
 def mock_pyboard(mocker):
-    exec_side_effect = [b'_BELAYR("micropython", (1, 19, 1), "rp2")\r\n'] * 100
+    exec_side_effect = [b'_BELAYR("micropython", (1, 19, 1), "rp2", "")\r\n'] * 100
 
     def mock_init(self, *args, **kwargs):
         self.serial = mocker.MagicMock()
@@ -38,6 +51,237 @@ def test_device_init_no_startup(mock_pyboard):
     belay.Device(startup="")
 
 
+def test_device_implementation_cache(mocker, mock_pyboard, tmp_path):
+    mocker.patch("belay.project.find_cache_folder", return_value=tmp_path)
+    mocker.patch("belay.device.serial_number", return_value="abc123")
+    mocker.patch.object(belay.device.Pyboard, "banner", b"MicroPython v1.19.1 on 2022-06-18; Raspberry Pi Pico\r\n>>>")
+
+    def is_probed(device):
+        return any("__belay_probe" in call.args[0] for call in device._board.exec.call_args_list)
+
+    device = Device()
+    device._board.serial.port = "/dev/ttyACM0"
+    assert device._implementation_cache_key() == "abc123 MicroPython v1.19.1 on 2022-06-18; Raspberry Pi Pico"
+
+    mocker.patch.object(belay.device.Device, "_implementation_cache_key", return_value="abc123 MicroPython v1.19.1")
+    device = Device()
+    assert is_probed(device)
+    assert (tmp_path / "implementations.json").exists()
+
+    belay.device.Pyboard.exec.reset_mock()
+    device = Device()
+    assert not is_probed(device)
+    assert device.implementation == belay.device.Implementation("micropython", (1, 19, 1), "rp2")
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_device_compress(mocker, mock_pyboard, compress):
+    def mock_exec(cmd, data_consumer=None):
+        if "__belay_probe" in cmd:
+            data_consumer(b'_BELAYR("micropython", (1, 19, 1), "rp2", "zlib")\r\n')
+
+    mocker.patch.object(belay.device.Pyboard, "exec", side_effect=mock_exec)
+    device = Device(compress=compress, attempts=1)
+    assert device.implementation.decompressor == "zlib"
+    assert device._board.decompressor == ("zlib" if compress else "")
+
+    cmd = "foo = 'hello world'\n" * 100
+    device(cmd, minify=False)
+    sent = device._board.exec.call_args.args[0]
+    assert sent.startswith("exec(__import__('zlib')") is compress
+    # History holds the uncompressed command.
+    assert cmd in device._cmd_history.values()
+
+
+def test_device_init_warm(mocker, mock_pyboard):
+    class WarmDevice(Device):
+        @Device.task
+        def foo(a):
+            return a
+
+        @Device.setup(autoinit=True)
+        def init():
+            led = 1  # noqa: F841
+
+    mocker.patch.object(WarmDevice, "_session_fingerprint", return_value=123)
+    session = None
+
+    def mock_exec(cmd, data_consumer=None):
+        if "__belay_session')" in cmd:
+            data_consumer(f"_BELAYR{session}\r\n".encode())
+        elif "__belay_probe" in cmd:
+            data_consumer(b'_BELAYR("micropython", (1, 19, 1), "rp2", "")\r\n')
+
+    for resumed in (False, True):
+        mocker.patch.object(belay.device.Pyboard, "exec", side_effect=mock_exec)
+        device = WarmDevice(warm=True, attempts=1)
+        device._board.enter_raw_repl.assert_called_once_with(soft_reset=False)
+        belay.device.Pyboard.enter_raw_repl.reset_mock()
+
+        cmds = [call.args[0] for call in device._board.exec.call_args_list]
+        assert any("def foo(" in cmd for cmd in cmds) is not resumed
+        assert ("led=1\n" in cmds) is not resumed
+        assert ("__belay_session=123" in cmds) is not resumed
+        # Skipped code is still recorded for reconnecting.
+        assert any("def foo(" in cmd for cmd in device._cmd_history.values())
+        assert "led=1\n" in device._cmd_history.values()
+
+        session = 123
+
+
+@pytest.mark.parametrize(
+    ("serial_cls", "soft_reset"),
+    [(SocketToSerial, False), (TelnetToSerial, True), (WebreplToSerial, False)],
+)
+def test_device_connect_soft_reset(mocker, mock_pyboard, serial_cls, soft_reset):
+    def mock_init(self, *args, **kwargs):
+        # Uninitialized; only its type matters.
+        self.serial = serial_cls.__new__(serial_cls)
+
+    mocker.patch.object(belay.device.Pyboard, "__init__", mock_init)
+    device = Device()
+    device._board.enter_raw_repl.assert_called_once_with(soft_reset=soft_reset)
+    device._board.serial = mocker.MagicMock()
+    device.close()
+
+
+def test_device_init_bundles_definitions(mocker, mock_pyboard):
+    class BundledDevice(Device):
+        @Device.task
+        def foo(a):
+            return a
+
+        @Device.task
+        def bar(a):
+            return a
+
+        @Device.thread
+        def baz():
+            pass
+
+    device = BundledDevice(startup="import foo")
+    cmds = [call.args[0] for call in device._board.exec.call_args_list]
+    (bundle,) = (cmd for cmd in cmds if "def foo(" in cmd)
+    assert "def bar(" in bundle
+    assert "def baz(" in bundle
+    assert bundle.endswith("import foo")
+    assert not any("def bar(" in cmd for cmd in cmds if cmd is not bundle)
+
+    # Definitions after ``__init__`` are executed immediately.
+    device._board.exec.reset_mock()
+
+    @device._belay_task
+    def qux(a):
+        return a
+
+    device._board.exec.assert_called_once_with("def qux(a):\n return a\n", data_consumer=mocker.ANY)
+
+
+def test_device_init_lazy(mocker, mock_pyboard):
+    class LazyDevice(Device):
+        @Device.task
+        def foo(a):
+            return a
+
+        @Device.task(lazy=False)
+        def bar(a):
+            return a
+
+    device = LazyDevice(lazy=True)
+    cmds = [call.args[0] for call in device._board.exec.call_args_list]
+    assert not any("def foo(" in cmd for cmd in cmds)
+    assert any("def bar(" in cmd for cmd in cmds)
+
+
+def test_device_upload_line_offset(mock_device):
+    mock_device._upload_bundle = []
+    assert mock_device._upload("a = 1\n", minify=False) == 0
+    assert mock_device._upload("def f():\n    return 1\n", minify=False) == 2
+    assert mock_device._upload("b = 2", minify=False) == 5
+    assert "\n".join(mock_device._upload_bundle).split("\n")[5] == "b = 2"
+
+
+@pytest.mark.parametrize("cached", [True, False])
+def test_device_exec_cached(mocker, mock_device, cached):
+    mock_device.attempts = 1
+    mock_device._cmd_history.clear()
+    mock_device._cache = True
+    mock_device._upload_bundle = ["def foo(a):\n return a\n"]
+    responses = [b"_BELAYRTrue\r\n"] if cached else [b"_BELAYRFalse\r\n", b"_BELAYRNone\r\n", b"_BELAYRTrue\r\n"]
+
+    def mock_exec(cmd, data_consumer=None):
+        if cmd.startswith("print("):
+            data_consumer(responses.pop(0))
+
+    mock_device._board.exec = mocker.MagicMock(side_effect=mock_exec)
+    mock_device._flush_uploads()
+    assert not responses
+
+    cmds = [call.args[0] for call in mock_device._board.exec.call_args_list]
+    assert "def __belay_cache_exec(" in cmds[0]
+    assert "def __belay_hf(" in cmds[0]
+    assert not any("def foo(" in cmd for cmd in cmds)
+    ((dst_file, src_hash),) = re.findall(r"__belay_cache_exec\('(.*?)',(\d+)\)", cmds[1])
+    prefix = f"device-{fnv1a_bytes(b'belay.device.Device'):08x}-"
+    assert dst_file == f"/.belay/{prefix}{int(src_hash):08x}.py"
+    if cached:
+        mock_device._board.fs_put.assert_not_called()
+    else:
+        assert f"__belay_cache_clean('/.belay','{prefix}')" in cmds[2]
+        assert mock_device._board.fs_put.call_args.args[1] == dst_file
+    # Only the code itself is replayed upon reconnect.
+    assert list(mock_device._cmd_history.values()) == ["def foo(a):\n return a\n"]
+
+
+def test_device_exec_cached_class_module(mocker, mock_device):
+    """Equally named device classes from different modules (e.g. other projects) don't share cache files."""
+
+    def cache_exec_dst_file():
+        mock_device._board.exec = mocker.MagicMock(side_effect=lambda cmd, data_consumer=None: data_consumer(b""))
+        mock_device._exec_cached("foo = 1")
+        cmds = [call.args[0] for call in mock_device._board.exec.call_args_list]
+        return next(
+            re.findall(r"__belay_cache_exec\('(.*?)',", cmd)[0] for cmd in cmds if "__belay_cache_exec('" in cmd
+        )
+
+    dst_file = cache_exec_dst_file()
+    mocker.patch.object(Device, "__module__", "other_project.board")
+    other_dst_file = cache_exec_dst_file()
+    assert dst_file.startswith("/.belay/device-")
+    assert other_dst_file.startswith("/.belay/device-")
+    assert dst_file != other_dst_file
+
+
+def test_device_init_bundled_traceback(mocker, mock_pyboard):
+    class TracebackDevice(Device):
+        @Device.task
+        def foo(a):
+            return a
+
+        @Device.task
+        def qux(a):
+            raise ValueError("bundled")
+
+    device = TracebackDevice()
+    cmds = [call.args[0] for call in device._board.exec.call_args_list]
+    (bundle,) = (cmd for cmd in cmds if "def qux(" in cmd)
+    device_lineno = next(i for i, line in enumerate(bundle.split("\n"), 1) if "raise ValueError" in line)
+    host_lineno = Path(__file__).read_text().split("\n").index('            raise ValueError("bundled")') + 1
+
+    device._board.exec = mocker.MagicMock(
+        side_effect=PyboardException(
+            "Traceback (most recent call last):\n"
+            '  File "<stdin>", line 1, in <module>\n'
+            f'  File "<stdin>", line {device_lineno}, in qux\n'
+            "ValueError: bundled\n"
+        )
+    )
+    with pytest.raises(PyboardException) as e:
+        device.qux(1)
+    assert f'File "{__file__}", line {host_lineno}, in qux' in e.value.args[0]
+    assert 'raise ValueError("bundled")' in e.value.args[0]
+
+
 def test_device_task(mocker, mock_device):
     mock_device._traceback_execute = mocker.MagicMock()
 
@@ -54,6 +298,523 @@ def test_device_task(mocker, mock_device):
     assert mock_device._traceback_execute.call_args.args[-1] == "foo(*(1,), **{'b': 2})"
 
 
+def test_device_task_lazy(mocker, mock_device):
+    mock_device._traceback_execute = mocker.MagicMock()
+    mock_device._board.exec.reset_mock()
+
+    @mock_device.task(lazy=True)
+    def foo(a):
+        return a
+
+    mock_device._board.exec.assert_not_called()
+
+    foo(1)
+    foo(2)
+    mock_device._board.exec.assert_called_once_with("def foo(a):\n return a\n", data_consumer=mocker.ANY)
+    assert mock_device._traceback_execute.call_count == 2
+    assert mock_device._cmd_history == {}
+
+    # Resident lazy tasks are re-uploaded upon reconnect.
+    mock_device._board.exec.reset_mock()
+    mocker.patch.object(mock_device, "_connect_to_board")
+    mock_device.reconnect()
+    mock_device._board.exec.assert_called_once_with("def foo(a):\n return a\n", data_consumer=mocker.ANY)
+
+
+def test_device_history_compaction(mocker, mock_device):
+    mock_device.attempts = 1
+    mock_device._cmd_history.clear()
+
+    @mock_device.setup
+    def setup(a):
+        pass
+
+    setup(1)
+    setup(1)
+    setup(2)
+    setup(1)
+
+    @mock_device.task
+    def foo():
+        return 1
+
+    @mock_device.task
+    def foo():  # noqa: F811
+        return 2
+
+    # Only the latest call of a setup function is kept.
+    assert list(mock_device._cmd_history.values()) == [
+        "a=1\n0\n",
+        "def foo():\n return 2\n",
+    ]
+
+    # History is replayed in a single command.
+    mock_device._board.exec.reset_mock()
+    mocker.patch.object(mock_device, "_connect_to_board")
+    mock_device.reconnect()
+    mock_device._board.exec.assert_called_once_with("a=1\n0\n\ndef foo():\n return 2\n", data_consumer=mocker.ANY)
+
+
+def test_device_history_alternating_setup(mocker, mock_device):
+    mock_device.attempts = 1
+    mock_device._cmd_history.clear()
+    mock_device.MAX_CMD_HISTORY_LEN = 5
+
+    @mock_device.setup
+    def setup(a):
+        b = a  # noqa: F841
+
+    for i in range(20):
+        setup(i % 2)
+
+    assert list(mock_device._cmd_history.values()) == ["a=1\nb=a\n"]
+    mocker.patch.object(mock_device, "_connect_to_board")
+    mock_device.reconnect()
+
+
+def test_device_history_not_idempotent(mocker, mock_device):
+    mock_device.attempts = 1
+    mock_device._cmd_history.clear()
+
+    mock_device("x = 0", minify=False)
+    mock_device("x += 1", minify=False)
+    mock_device("x += 1", minify=False)
+
+    mock_device._board.exec.reset_mock()
+    mocker.patch.object(mock_device, "_connect_to_board")
+    mock_device.reconnect()
+    namespace = {}
+    exec(mock_device._board.exec.call_args.args[0], namespace)
+    assert namespace["x"] == 2
+
+
+def test_device_history_dependent_commands(mocker, mock_device):
+    mock_device.attempts = 1
+    mock_device._cmd_history.clear()
+
+    mock_device("a = 1", minify=False)
+    mock_device("b = a + 1", minify=False)
+    mock_device("a = 1", minify=False)
+
+    @mock_device.task
+    def foo():
+        return 1
+
+    mock_device("c = foo()", minify=False)
+
+    @mock_device.task
+    def foo():  # noqa: F811
+        return 2
+
+    # Replaying the history must not reorder commands that depend on each other.
+    mock_device._board.exec.reset_mock()
+    mocker.patch.object(mock_device, "_connect_to_board")
+    mock_device.reconnect()
+    namespace = {}
+    exec(mock_device._board.exec.call_args.args[0], namespace)
+    assert namespace["b"] == 2
+    assert namespace["c"] == 2
+
+
+def test_device_history_full(mock_device):
+    mock_device.attempts = 1
+    mock_device._cmd_history.clear()
+    mock_device.MAX_CMD_HISTORY_LEN = 2
+
+    @mock_device.task
+    def foo():
+        return 1
+
+    mock_device("a = 1", minify=False)
+    mock_device("b = 2", minify=False)
+
+    @mock_device.task
+    def foo():  # noqa: F811
+        return 2
+
+    # Redefinitions are kept even once the history is full.
+    assert list(mock_device._cmd_history.values()) == ["def foo():\n return 2\n", "a = 1"]
+
+    # "b = 2" was dropped; the history can't restore the device's state anymore.
+    with pytest.raises(MaxHistoryLengthError):
+        mock_device.reconnect()
+
+
+def test_device_task_binary_args(mocker, mock_device):
+    mock_device._traceback_execute = mocker.MagicMock()
+
+    @mock_device.task
+    def foo(a, b):
+        pass
+
+    foo(bytearray(b"\x00\x01"), b=array.array("H", [1]))
+    args = belay._codec.pack((bytearray(b"\x00\x01"),))
+    kwargs = belay._codec.pack({"b": array.array("H", [1])})
+    assert mock_device._traceback_execute.call_args.args[-1] == (
+        f"foo(*__belay_arg({binascii.b2a_base64(args, newline=False).decode()!r}), "
+        f"**__belay_arg({binascii.b2a_base64(kwargs, newline=False).decode()!r}))"
+    )
+    assert mock_device._codec_loaded
+
+
+def test_device_setup_binary_args(mocker, mock_device):
+    mock_device._traceback_execute = mocker.MagicMock()
+
+    @mock_device.setup
+    def foo(a, b=1):
+        pass
+
+    foo(b"\x00")
+    data = binascii.b2a_base64(belay._codec.pack(b"\x00"), newline=False).decode()
+    assert mock_device._traceback_execute.call_args.args[-1].startswith(f"a=__belay_arg({data!r})\nb=1\n")
+
+
+def test_device_task_rpc(mocker, mock_device):
+    mock_device._rpc = mocker.MagicMock()
+    mock_device._rpc_execute = mocker.MagicMock(return_value=3)
+    mock_device._traceback_execute = mocker.MagicMock()
+
+    @mock_device.task
+    def foo(a, b):
+        return a + b
+
+    mock_device._board.exec.assert_any_call(
+        "def foo(a,b):\n return a+b\n__belay_tasks[0]=foo\n", data_consumer=mocker.ANY
+    )
+
+    assert foo(1, 2) == 3
+    assert mock_device._rpc_execute.call_args.args[-3:] == (0, (1, 2), {})
+    mock_device._traceback_execute.assert_not_called()
+
+    # Fallback to the raw REPL for arguments that cannot be binary-encoded.
+    mock_device._rpc_execute.side_effect = belay._codec.UnsupportedTypeError
+    foo(1, b=2)
+    assert mock_device._traceback_execute.call_args.args[-1] == "foo(*(1,), **{'b': 2})"
+
+
+def test_device_task_binary(mocker, mock_device):
+    @mock_device.task(binary=True)
+    def foo():
+        return b"foo"
+
+    def mock_exec(cmd, data_consumer=None):
+        data_consumer(b"_BELAYB" + binascii.b2a_base64(belay._codec.pack(b"foo")))
+
+    mock_device._board.exec = mocker.MagicMock(side_effect=mock_exec)
+    assert foo() == b"foo"
+    mock_device._board.exec.assert_called_once_with(
+        "print('_BELAYB' + __belay_b64(foo(*(),**{})), end='')", data_consumer=mocker.ANY
+    )
+
+
+def test_device_task_binary_annotation_not_opted_in(mocker, mock_device):
+    @mock_device.task
+    def foo() -> bytes:
+        return b"foo"
+
+    def mock_exec(cmd, data_consumer=None):
+        data_consumer(b"_BELAYR" + repr(b"foo").encode() + b"\r\n")
+
+    mock_device._board.exec = mocker.MagicMock(side_effect=mock_exec)
+    assert foo() == b"foo"
+    mock_device._board.exec.assert_called_once_with("print('_BELAYR' + repr(foo(*(),**{})))", data_consumer=mocker.ANY)
+
+
+def test_device_task_binary_numpy_annotation(mocker, mock_device):
+    np = pytest.importorskip("numpy")
+
+    @mock_device.task(binary=True)
+    def foo() -> "np.ndarray":
+        pass
+
+    mock_device._traceback_execute = mocker.MagicMock(return_value=array.array("H", [1, 2]))
+    actual = foo()
+    assert mock_device._traceback_execute.call_args.kwargs["binary"] is True
+    assert isinstance(actual, np.ndarray)
+    assert actual.tolist() == [1, 2]
+
+
+def test_device_task_map(mocker, mock_device):
+    mock_device._traceback_execute = mocker.MagicMock(side_effect=[[2, 4], [6]])
+
+    @mock_device.task
+    def foo(a):
+        return a * 2
+
+    assert foo.map([1, 2, 3], chunksize=2) == [2, 4, 6]
+    assert [call.args[-1] for call in mock_device._traceback_execute.call_args_list] == [
+        "[foo(x) for x in [1, 2]]",
+        "[foo(x) for x in [3]]",
+    ]
+
+
+def test_device_task_map_multiple_iterables(mocker, mock_device):
+    mock_device._traceback_execute = mocker.MagicMock(return_value=[4, 10])
+
+    @mock_device.task
+    def foo(a, b):
+        return a * b
+
+    assert foo.map([1, 2], (4, 5)) == [4, 10]
+    mock_device._traceback_execute.assert_called_once()
+    assert mock_device._traceback_execute.call_args.args[-1] == "[foo(*x) for x in [(1, 4), (2, 5)]]"
+
+
+def test_device_task_imap(mocker, mock_device):
+    mock_device._traceback_execute = mocker.MagicMock(side_effect=[[2, 4], [6]])
+
+    @mock_device.task
+    def foo(a):
+        return a * 2
+
+    results = foo.imap(range(3), chunksize=2)
+    mock_device._traceback_execute.assert_not_called()
+    assert next(results) == 2
+    assert next(results) == 4
+    assert mock_device._traceback_execute.call_count == 1
+    assert list(results) == [6]
+    assert mock_device._traceback_execute.call_count == 2
+
+
+def test_device_task_map_invalid(mock_device):
+    @mock_device.task
+    def foo(a):
+        return a * 2
+
+    with pytest.raises(TypeError):
+        foo.map()
+
+    with pytest.raises(ValueError):
+        foo.map([1], chunksize=0)
+
+
+def test_device_task_generator_prefetch(mocker, mock_device):
+    mock_device._traceback_execute = mocker.MagicMock(side_effect=[None, ([0, 1], False), ([2], True)])
+
+    @mock_device.task(prefetch=2)
+    def foo():
+        yield 0
+        yield 1
+        yield 2
+
+    assert list(foo()) == [0, 1, 2]
+    cmds = [call.args[-1] for call in mock_device._traceback_execute.call_args_list]
+    assert cmds[1].startswith("__belay_prefetch(") and cmds[1].endswith(", None, 2)")
+    assert len(cmds) == 3
+
+
+def test_device_task_generator_single_step(mocker, mock_device):
+    mock_device._traceback_execute = mocker.MagicMock(side_effect=[None, "a", "b", StopIteration])
+
+    @mock_device.task
+    def foo():
+        x = yield "a"
+        yield x
+
+    gen = foo()
+    assert next(gen) == "a"
+    assert gen.send("b") == "b"
+    with pytest.raises(StopIteration):
+        next(gen)
+    cmds = [call.args[-1] for call in mock_device._traceback_execute.call_args_list]
+    assert cmds[1].startswith("__belay_next(") and cmds[1].endswith(", None)")
+    assert cmds[2].endswith(", 'b')")
+
+
+def test_device_task_generator_send_after_prefetch(mocker, mock_device):
+    mock_device._traceback_execute = mocker.MagicMock(side_effect=[None, ([0, 1], False)])
+
+    @mock_device.task(prefetch=2)
+    def foo():
+        x = yield 0
+        yield x
+
+    gen = foo()
+    assert next(gen) == 0
+    with pytest.raises(ValueError):
+        gen.send(1)
+
+
+@pytest.mark.parametrize(
+    "n, round_trip, consume_time, expected",
+    [
+        (4, 0.01, 0.001, 8),  # Host waits on device; fetch more.
+        (belay.executers.PREFETCH_MAX, 0.01, 0.001, belay.executers.PREFETCH_MAX),
+        (4, 0.01, 0.5, 2),  # Host is slower than the device; fetch less.
+        (1, 0.01, 0.5, 1),
+        (4, 1.0, 0.001, 2),  # Round trips are taking too long.
+    ],
+)
+def test_adapt_prefetch(n, round_trip, consume_time, expected):
+    assert belay.executers.adapt_prefetch(n, round_trip, consume_time) == expected
+
+
+def test_device_batch(mocker, mock_device, tmp_path):
+    src_file = tmp_path / "main.py"
+    src_file.write_text('\n@device.task\ndef bar():\n    raise Exception("This is raised on-device.")')
+
+    @mock_device.task
+    def foo(a):
+        return a
+
+    def mock_exec(cmd, data_consumer=None):
+        data_consumer(
+            b"_BELAYR[(0, 1), (1, 'Traceback (most recent call last):\\n"
+            b'  File "<stdin>", line 3, in bar\\n'
+            b"Exception: This is raised on-device.\\n')]\r\n"
+        )
+
+    mock_device._board.exec = mocker.MagicMock(side_effect=mock_exec)
+    mock_device._traceback_execute = mocker.MagicMock()
+
+    with mock_device.batch() as batch:
+        foo_future = foo(1)
+        bar_future = batch.submit(src_file, 2, "bar", "bar()")
+        assert len(batch) == 2
+        mock_device._board.exec.assert_not_called()
+
+    mock_device._board.exec.assert_called_once_with(
+        "print('_BELAYR' + repr(__belay_batch(lambda:foo(*(1,),**{}),lambda:bar())))", data_consumer=mocker.ANY
+    )
+    mock_device._traceback_execute.assert_not_called()
+    assert foo_future.result() == 1
+    with pytest.raises(belay.PyboardException) as exc_info:
+        bar_future.result()
+    assert exc_info.value.args[0] == (
+        "Traceback (most recent call last):\n"
+        f'  File "{src_file}", line 4, in bar\n'
+        '    raise Exception("This is raised on-device.")\n'
+        "Exception: This is raised on-device.\n"
+    )
+
+
+def test_device_batch_exception(mocker, mock_device):
+    @mock_device.task
+    def foo(a):
+        return a
+
+    mock_device._board.exec = mocker.MagicMock()
+
+    with pytest.raises(KeyError), mock_device.batch():
+        foo_future = foo(1)
+        raise KeyError
+
+    mock_device._board.exec.assert_not_called()
+    assert foo_future.cancelled()
+    assert mock_device._batch is None
+
+
+def test_device_task_threads_coalesced(mocker, mock_device):
+    @mock_device.task
+    def foo(a):
+        return a
+
+    def mock_exec(cmd, data_consumer=None):
+        data_consumer(b"_BELAYR[(0, 1), (0, 2), (1, 'Traceback')]\r\n")
+
+    mock_device._board.exec = mocker.MagicMock(side_effect=mock_exec)
+    results = {}
+
+    def call(a):
+        try:
+            results[a] = foo(a)
+        except belay.PyboardException as e:
+            results[a] = e
+
+    # While the device is busy, calls from other threads are queued.
+    submit_call = mocker.spy(belay.device.IoWorker, "submit_call")
+    threads = [threading.Thread(target=call, args=(a,)) for a in (1, 2, 3)]
+    with mock_device._lock:
+        for i, thread in enumerate(threads):
+            thread.start()
+            while submit_call.call_count <= i:
+                time.sleep(0.001)
+    for thread in threads:
+        thread.join()
+
+    mock_device._board.exec.assert_called_once()
+    assert mock_device._board.exec.call_args.args[0].startswith("print('_BELAYR' + repr(__belay_batch(")
+    assert results[1] == 1
+    assert results[2] == 2
+    assert isinstance(results[3], belay.PyboardException)
+
+
+def test_device_task_submit(mocker, mock_device):
+    @mock_device.task
+    def foo(a):
+        return a
+
+    def mock_exec(cmd, data_consumer=None):
+        data_consumer(b"_BELAYR[(0, 1), (0, 2)]\r\n")
+
+    mock_device._board.exec = mocker.MagicMock(side_effect=mock_exec)
+
+    # Calls submitted while the device is busy are executed as a single batch.
+    with mock_device._lock:
+        futures = [foo.submit(a) for a in (1, 2)]
+
+    assert [future.result() for future in futures] == [1, 2]
+    mock_device._board.exec.assert_called_once()
+
+
+def test_async_device(mocker, mock_device):
+    device = belay.AsyncDevice(mock_device)
+
+    @device.task
+    def foo(a):
+        return a
+
+    @device.task(prefetch=1)
+    def gen():
+        yield 1
+
+    # Tasks are uploaded lazily, so decorating doesn't communicate with the device.
+    responses = [b"", b"_BELAYR5\r\n", b"", b"", b"_BELAYR1\r\n", b"_BELAYS\r\n", b"", b"_BELAYR2\r\n"]
+
+    def mock_exec(cmd, data_consumer=None):
+        data_consumer(responses.pop(0))
+
+    mock_device._board.exec = mocker.MagicMock(side_effect=mock_exec)
+
+    async def main():
+        assert await foo(5) == 5
+        assert [x async for x in gen()] == [1]
+        assert await device("1 + 1") == 2
+        await device.close()
+
+    asyncio.run(main())
+
+    assert not responses
+    assert mock_device._board is None
+
+
+def test_async_device_binary_args(mocker, mock_device):
+    device = belay.AsyncDevice(mock_device)
+
+    @device.task
+    def foo(a):
+        return len(a)
+
+    exec_threads = set()
+
+    def mock_exec(cmd, data_consumer=None):
+        exec_threads.add(threading.current_thread())
+        data_consumer(b"_BELAYR3\r\n" if "foo(" in cmd and cmd.startswith("print(") else b"")
+
+    board_exec = mock_device._board.exec = mocker.MagicMock(side_effect=mock_exec)
+
+    async def main():
+        # The first binary argument loads the codec on-device.
+        assert await foo(b"abc") == 3
+        await device.close()
+
+    asyncio.run(main())
+
+    assert any("def __belay_arg(" in call.args[0] for call in board_exec.call_args_list)
+    # The event loop's thread never blocks on the device.
+    assert threading.main_thread() not in exec_threads
+
+
 def test_device_thread(mocker, mock_device):
     mock_device._traceback_execute = mocker.MagicMock()
 
@@ -75,6 +836,28 @@ def test_device_thread(mocker, mock_device):
     )
 
 
+def test_device_install_tcp_server(mocker, mock_device):
+    mock_device._board.exec = mocker.MagicMock()
+    mock_device.install_tcp_server(port=1234, password="secret", host="192.168.1.100")
+
+    assert mock_device._board.fs_put.call_args.args[1] == "/belay_tcp.py"
+    mock_device._board.exec.assert_called_with(
+        "print('_BELAYR' + repr(__belay_boot_append(\"import belay_tcp\\nbelay_tcp.start(1234, 'secret', '192.168.1.100')\\n\")))",
+        data_consumer=mocker.ANY,
+    )
+
+
+def test_device_install_tcp_server_no_password(mocker, mock_device):
+    def mock_exec(cmd, data_consumer=None):
+        if "webrepl_cfg" in cmd:
+            raise PyboardException("ImportError: no module named 'webrepl_cfg'")
+
+    mock_device._board.exec = mocker.MagicMock(side_effect=mock_exec)
+    with pytest.raises(ValueError, match="webrepl_cfg"):
+        mock_device.install_tcp_server()
+    mock_device._board.fs_put.assert_not_called()
+
+
 def test_device_traceback_execute(mocker, mock_device, tmp_path):
     src_file = tmp_path / "main.py"
     src_file.write_text('\n@device.task\ndef f():\n    raise Exception("This is raised on-device.")')
@@ -113,6 +896,12 @@ def test_parse_belay_response_stop_iteration():
         belay.device.parse_belay_response("_BELAYS")
 
 
+def test_parse_belay_response_b():
+    data = belay._codec.pack((array.array("H", [1, 2]), b"foo", 3))
+    line = "_BELAYB" + binascii.b2a_base64(data).decode()
+    assert belay.device.parse_belay_response(line) == (array.array("H", [1, 2]), b"foo", 3)
+
+
 def test_parse_belay_response_r():
     assert [1, 2, 3] == belay.device.parse_belay_response("_BELAYR[1,2,3]")
     assert belay.device.parse_belay_response("_BELAYR1") == 1
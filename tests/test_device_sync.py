@@ -1,4 +1,9 @@
+import ast
+import json
 import os
+import re
+import shutil
+import time
 from pathlib import Path
 from unittest.mock import call
 
@@ -25,7 +30,7 @@ def mock_pyboard(mocker):
     def mock_init(self, *args, **kwargs):
         self.serial = mocker.MagicMock()
 
-    exec_side_effect = [b'_BELAYR("micropython", (1, 19, 1), "rp2")\r\n'] * 100
+    exec_side_effect = [b'_BELAYR("micropython", (1, 19, 1), "rp2", "")\r\n'] * 100
 
     def mock_exec(cmd, data_consumer=None):
         data = exec_side_effect.pop()
@@ -40,7 +45,6 @@ def mock_pyboard(mocker):
 
 @pytest.fixture
 def mock_device(mocker, mock_pyboard):
-    mocker.patch("belay.device.Device._emitter_check", return_value=[])
     device = belay.Device()
     return device
 
@@ -165,6 +169,10 @@ def test_device_sync_empty_remote(mocker, mock_device, sync_path):
 
     mock_device.sync(sync_path)
 
+    cmds = [c.args[0] for c in mock_device._board.exec.call_args_list]
+    (del_fs_cmd,) = (cmd for cmd in cmds if cmd.startswith("__belay_del_fs("))
+    assert "'/.belay'" in del_fs_cmd
+
     mock_device._board.exec.assert_has_calls(
         [
             call(
@@ -461,3 +469,141 @@ def test_generate_dst_dirs():
         "/foo/bar/dir2/dir2_1",
         "/foo/bar/dir2/dir2_2",
     ]
+
+
+def test_device_sync_progress(mocker, mock_device, sync_path):
+    def fs_put(src, dst, progress_callback):
+        progress_callback(5, 10)
+        progress_callback(10, 10)
+
+    def mock_exec(cmd, data_consumer=None):
+        data_consumer(b"_BELAYR[0, 0, 0, 0, 0]\r\n" if "__belay_hfs" in cmd else b"")
+
+    mock_device._board.exec = mocker.MagicMock(side_effect=mock_exec)
+    mock_device._board.fs_put.side_effect = fs_put
+    progress_update = mocker.MagicMock()
+
+    mock_device.sync(sync_path, progress_update=progress_update)
+
+    assert mock_device._board.fs_put.call_count == 5
+    progress_update.assert_any_call(total=5)
+    progress_update.assert_any_call(description="Pushing: alpha.py")
+    progress_update.assert_any_call(completed=0.5)
+    progress_update.assert_any_call(completed=4.5)
+    progress_update.assert_called_with(completed=5)
+
+
+def _set_mtime(path, seconds_ago):
+    mtime = time.time() - seconds_ago
+    os.utime(path, (mtime, mtime))
+
+
+def test_device_sync_cache(mocker, mock_device, sync_path, sync_cache_folder):
+    def mock_exec(cmd, data_consumer=None):
+        data_consumer(b"_BELAYR[0, 0, 0, 0, 0]\r\n" if "__belay_hfs" in cmd else b"")
+
+    mock_device._board.exec = mocker.MagicMock(side_effect=mock_exec)
+    for path in sync_path.rglob("*"):
+        _set_mtime(path, 60)
+
+    mock_device.sync(sync_path)
+    assert (sync_cache_folder / "index.json").exists()
+
+    fnv1a = mocker.patch("belay.device_sync_support.fnv1a", side_effect=device_sync_support.fnv1a)
+    minify = mocker.patch("belay.device_sync_support.minify_code")
+    mock_device._board.fs_put.reset_mock()
+
+    mock_device.sync(sync_path)
+
+    fnv1a.assert_not_called()
+    minify.assert_not_called()
+    assert mock_device._board.fs_put.call_count == 5
+    alpha_src = mock_device._board.fs_put.call_args_list[0][0][0]
+    assert alpha_src.parent == sync_cache_folder / "artifacts"
+    assert alpha_src.read_text() == "def alpha():\n 0"
+    assert mock_device._board.fs_put.call_args_list[1][0][0] == sync_path / "bar.txt"
+
+    # Modifying a file invalidates its entry.
+    (sync_path / "bar.txt").write_text("new bar contents")
+    _set_mtime(sync_path / "bar.txt", 30)
+
+    mock_device.sync(sync_path)
+
+    fnv1a.assert_called_once_with(sync_path / "bar.txt")
+
+
+def test_device_sync_cache_recently_modified(mocker, mock_device, sync_path, sync_cache_folder):
+    def mock_exec(cmd, data_consumer=None):
+        data_consumer(b"_BELAYR[0, 0, 0, 0, 0]\r\n" if "__belay_hfs" in cmd else b"")
+
+    mock_device._board.exec = mocker.MagicMock(side_effect=mock_exec)
+
+    mock_device.sync(sync_path)
+
+    # The files were just written; their modification time cannot be trusted yet.
+    assert not (sync_cache_folder / "index.json").exists()
+
+
+def test_device_sync_cache_relocated(mocker, mock_device, tmp_path_factory, sync_cache_folder):
+    """Syncing the same tree from another folder (e.g. ``sync_dependencies``) hits the cache."""
+
+    def mock_exec(cmd, data_consumer=None):
+        data_consumer(b"_BELAYR[0, 0]\r\n" if "__belay_hfs" in cmd else b"")
+
+    mock_device._board.exec = mocker.MagicMock(side_effect=mock_exec)
+
+    first = tmp_path_factory.mktemp("dependencies")
+    (first / "alpha.py").write_text("def alpha():\n    pass")
+    (first / "bar.txt").write_text("bar contents")
+    for path in first.rglob("*"):
+        _set_mtime(path, 60)
+
+    mock_device.sync(first, dst="/lib")
+
+    fnv1a = mocker.patch("belay.device_sync_support.fnv1a", side_effect=device_sync_support.fnv1a)
+    mock_device._board.fs_put.reset_mock()
+
+    # Copied like ``sync_dependencies`` does, preserving modification times.
+    second = tmp_path_factory.mktemp("dependencies")
+    shutil.copytree(first, second, dirs_exist_ok=True)
+    shutil.rmtree(first)
+    mock_device.sync(second, dst="/lib")
+
+    fnv1a.assert_not_called()
+    assert mock_device._board.fs_put.call_args_list[0][0][1] == "/lib/alpha.py"
+    assert mock_device._board.fs_put.call_args_list[1][0] == (second / "bar.txt", "/lib/bar.txt")
+
+
+def test_device_sync_cache_prune(mocker, mock_device, tmp_path_factory, sync_path, sync_cache_folder):
+    def mock_exec(cmd, data_consumer=None):
+        match = re.search(r"__belay_hfs\((\[.*?\])\)", cmd)
+        if match:
+            n_files = len(ast.literal_eval(match[1]))
+            data_consumer(b"_BELAYR%r\r\n" % ([0] * n_files))
+        else:
+            data_consumer(b"")
+
+    mock_device._board.exec = mocker.MagicMock(side_effect=mock_exec)
+    lib = tmp_path_factory.mktemp("lib")
+    (lib / "beta.py").write_text("def beta():\n    pass")
+    for path in [lib / "beta.py", *sync_path.rglob("*")]:
+        _set_mtime(path, 60)
+
+    mock_device.sync(lib, dst="/lib")
+    mock_device.sync(sync_path)
+    assert len(list((sync_cache_folder / "artifacts").iterdir())) == 2
+
+    # alpha.py is no longer synced; its entry and artifact are dropped.
+    # Entries of the kept "/lib" folder remain.
+    (sync_path / "alpha.py").unlink()
+    mock_device.sync(sync_path)
+
+    index = json.loads((sync_cache_folder / "index.json").read_text())
+    assert sorted(json.loads(key)[0] for key in index) == [
+        "/bar.txt",
+        "/folder1/file1.txt",
+        "/folder1/folder1_1/file1_1.txt",
+        "/foo.txt",
+        "/lib/beta.py",
+    ]
+    assert len(list((sync_cache_folder / "artifacts").iterdir())) == 1
@@ -10,3 +10,8 @@ def test_sync_local_belay_hf(tmp_path):
     f.write_text("foobar")
     actual = belay.hash.fnv1a(f)
     assert actual == 0xBF9CF968
+
+
+def test_fnv1a_bytes():
+    assert belay.hash.fnv1a_bytes(b"foobar") == 0xBF9CF968
+    assert belay.hash.fnv1a_bytes(b"bar", belay.hash.fnv1a_bytes(b"foo")) == 0xBF9CF968
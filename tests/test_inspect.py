@@ -5,6 +5,7 @@ may need to change while still remaining valid.
 """
 
 
+import array
 from importlib.machinery import SourceFileLoader
 
 import pytest
@@ -222,6 +223,40 @@ def test_isexpression_basic():
     assert belay.inspect.isexpression("1+") == False
 
 
+def test_uses_sent_values():
+    assert belay.inspect.uses_sent_values("def foo():\n    yield 1\n    yield\n") is False
+    assert belay.inspect.uses_sent_values("def foo():\n    x = yield 1\n") is True
+    assert belay.inspect.uses_sent_values("def foo():\n    print((yield))\n") is True
+    assert belay.inspect.uses_sent_values("def foo():\n    yield from bar()\n") is True
+
+
+def test_binary_return_annotation():
+    def binary() -> bytes:
+        pass
+
+    def binary_array() -> array.array:
+        pass
+
+    def numpy() -> "np.ndarray":
+        pass
+
+    def numpy_generic() -> "npt.NDArray[np.uint16]":
+        pass
+
+    def literal() -> int:
+        pass
+
+    def unannotated():
+        pass
+
+    assert belay.inspect.binary_return_annotation(binary) == "binary"
+    assert belay.inspect.binary_return_annotation(binary_array) == "binary"
+    assert belay.inspect.binary_return_annotation(numpy) == "numpy"
+    assert belay.inspect.binary_return_annotation(numpy_generic) == "numpy"
+    assert belay.inspect.binary_return_annotation(literal) is None
+    assert belay.inspect.binary_return_annotation(unannotated) is None
+
+
 def test_remove_signature_basic():
     code = "def foo(arg1, arg2):\n    arg1 += 1\n    return arg1 + arg2\n"
     res, lines_removed = belay.inspect._remove_signature(code)
@@ -0,0 +1,360 @@
+import os
+import socket
+import sys
+import threading
+import time
+
+import pytest
+
+from belay.exceptions import ConnectionFailedError
+from belay.pyboard import (
+    ProcessToSerial,
+    PyboardError,
+    PyboardException,
+    ReadWaiter,
+    SocketToSerial,
+    TelnetToSerial,
+)
+from belay.webrepl import WebreplError, WebreplToSerial
+
+
+def test_read_waiter_wait_readable(mocker):
+    transport = mocker.MagicMock()
+    ReadWaiter(transport).wait(0.5)
+    transport.wait_readable.assert_called_once_with(0.5)
+
+
+def test_read_waiter_fileno(socket_pair):
+    transport, remote = socket_pair
+    waiter = ReadWaiter(transport)
+    assert waiter._selector is not None
+
+    t_start = time.monotonic()
+    waiter.wait(0.05)
+    assert time.monotonic() - t_start >= 0.04
+
+    remote.sendall(b"foo")
+    t_start = time.monotonic()
+    waiter.wait(5)
+    assert time.monotonic() - t_start < 1
+    waiter.close()
+
+
+def test_read_waiter_poll_fallback(mocker):
+    transport = mocker.MagicMock(spec=["read", "write", "in_waiting"])
+    sleep = mocker.patch("belay.pyboard.time.sleep")
+    waiter = ReadWaiter(transport)
+    assert waiter._selector is None
+    waiter.wait(10)
+    sleep.assert_called_once_with(ReadWaiter.poll_interval)
+
+
+def test_pyboard_read_until_delayed(pyboard):
+    board, remote = pyboard
+
+    def send_later():
+        time.sleep(0.05)
+        remote.sendall(b"foo")
+        time.sleep(0.05)
+        remote.sendall(b"bar>baz")
+
+    thread = threading.Thread(target=send_later)
+    thread.start()
+    consumed = bytearray()
+    assert board.read_until(b">", timeout=5, data_consumer=consumed.extend) == b"foobar>"
+    thread.join()
+    assert consumed == b"foobar>"
+
+
+def test_pyboard_read_until_timeout(pyboard):
+    board, remote = pyboard
+    remote.sendall(b"foo")
+    with pytest.raises(PyboardError):
+        board.read_until(b">", timeout=0.05)
+
+
+def test_pyboard_read_after_read_until(pyboard):
+    board, remote = pyboard
+    remote.sendall(b"foo>bar")
+    assert board.read_until(b">", timeout=5) == b"foo>"
+    assert board.in_waiting == 3
+    assert board.read(3) == b"bar"
+
+
+def _fake_stream_put_device(remote, chunk_size, received, decompress=False):
+    """Emulates the device-side of ``fs_put_stream``."""
+    import binascii
+    import zlib
+
+    remote.settimeout(5)
+    remote.sendall(b"%d\r\n" % chunk_size)
+    stream = remote.makefile("rb")
+    while True:
+        size = int(stream.read(8), 16)
+        if not size:
+            break
+        block = binascii.a2b_base64(stream.read(size))
+        received.extend(zlib.decompress(block) if decompress else block)
+        remote.sendall(b"\x06")
+    remote.sendall(b"\x04\x04")
+
+
+def test_pyboard_fs_put_stream(mocker, pyboard, tmp_path):
+    board, remote = pyboard
+    exec_raw_no_follow = mocker.patch.object(board, "exec_raw_no_follow")
+    src = tmp_path / "foo.bin"
+    src.write_bytes(bytes(range(256)) * 5)
+
+    received = bytearray()
+    thread = threading.Thread(target=_fake_stream_put_device, args=(remote, 300, received))
+    thread.start()
+    progress_callback = mocker.MagicMock()
+    assert board.fs_put_stream(src, "/foo.bin", progress_callback=progress_callback) is True
+    thread.join()
+
+    assert "__belay_put('/foo.bin', " in exec_raw_no_follow.call_args.args[0]
+    assert received == src.read_bytes()
+    assert progress_callback.call_args_list[-1] == mocker.call(1280, 1280)
+    assert progress_callback.call_count == 5
+
+
+def test_pyboard_fs_put_stream_large_chunk(mocker, pyboard, tmp_path):
+    board, remote = pyboard
+    mocker.patch.object(board, "exec_raw_no_follow")
+    src = tmp_path / "foo.bin"
+    src.write_bytes(os.urandom(150_000))
+
+    # Base64-encoded blocks are larger than 0xFFFF bytes.
+    received = bytearray()
+    thread = threading.Thread(target=_fake_stream_put_device, args=(remote, 100_000, received), daemon=True)
+    thread.start()
+    assert board.fs_put_stream(src, "/foo.bin", chunk_size=100_000) is True
+    thread.join()
+
+    assert received == src.read_bytes()
+
+
+def test_pyboard_fs_put_stream_compressed(mocker, pyboard, tmp_path):
+    board, remote = pyboard
+    board.decompressor = "zlib"
+    exec_raw_no_follow = mocker.patch.object(board, "exec_raw_no_follow")
+    src = tmp_path / "foo.py"
+    src.write_text("print('hello world')\n" * 200)
+
+    received = bytearray()
+    thread = threading.Thread(target=_fake_stream_put_device, args=(remote, 1000, received, True))
+    thread.start()
+    assert board.fs_put_stream(src, "/foo.py") is True
+    thread.join()
+
+    assert exec_raw_no_follow.call_args.args[0].endswith("__belay_put('/foo.py', 16384, 'zlib')")
+    assert received == src.read_bytes()
+
+
+def test_pyboard_fs_put_stream_unsupported(mocker, pyboard, tmp_path):
+    board, remote = pyboard
+    mocker.patch.object(board, "exec_raw_no_follow")
+    src = tmp_path / "foo.bin"
+    src.write_bytes(b"foo")
+
+    remote.sendall(b"0\r\n\x04\x04")
+    assert board.fs_put_stream(src, "/foo.bin") is False
+
+
+def test_pyboard_fs_put_get_webrepl(mocker, pyboard, tmp_path):
+    board, _ = pyboard
+    board.serial = mocker.MagicMock(spec=WebreplToSerial)
+    progress_callback = mocker.MagicMock()
+
+    board.fs_put(tmp_path / "foo.bin", "/foo.bin", progress_callback=progress_callback)
+    board.serial.put_file.assert_called_once_with(tmp_path / "foo.bin", "/foo.bin", progress_callback=progress_callback)
+
+    board.fs_get("/foo.bin", tmp_path / "bar.bin")
+    board.serial.get_file.assert_called_once_with("/foo.bin", tmp_path / "bar.bin", progress_callback=None, size=None)
+
+    board.serial.put_file.side_effect = WebreplError("Cannot open '/foo/bar.bin' for writing.")
+    with pytest.raises(PyboardException, match="Cannot open"):
+        board.fs_put(tmp_path / "foo.bin", "/foo/bar.bin")
+
+
+@pytest.fixture
+def socket_to_serial():
+    server = socket.create_server(("127.0.0.1", 0))
+    transport = SocketToSerial(f"tcp://127.0.0.1:{server.getsockname()[1]}", read_timeout=0.1)
+    remote, _ = server.accept()
+    yield transport, remote
+    transport.close()
+    remote.close()
+    server.close()
+
+
+def test_socket_to_serial(socket_to_serial):
+    transport, remote = socket_to_serial
+    assert transport.in_waiting == 0
+
+    transport.write(b"foo")
+    assert remote.recv(3) == b"foo"
+
+    remote.sendall(b"bar" * 50000)
+    assert transport.read(3) == b"bar"
+    while transport.in_waiting < 3 * 50000 - 3:
+        time.sleep(0.001)
+    assert transport.read(3 * 50000) == b"bar" * 49999
+
+
+def test_socket_to_serial_read_timeout(socket_to_serial):
+    transport, remote = socket_to_serial
+    remote.sendall(b"foo")
+    t_start = time.monotonic()
+    assert transport.read(4) == b"foo"
+    assert time.monotonic() - t_start >= 0.09
+
+
+def test_socket_to_serial_closed(socket_to_serial):
+    transport, remote = socket_to_serial
+    remote.close()
+    with pytest.raises(ConnectionResetError):
+        transport.read(1)
+
+
+def test_socket_to_serial_connection_failed():
+    server = socket.create_server(("127.0.0.1", 0))
+    port = server.getsockname()[1]
+    server.close()
+    with pytest.raises(ConnectionFailedError):
+        SocketToSerial(f"tcp://127.0.0.1:{port}")
+
+
+def _fake_tcp_server_login(server, password, active=False):
+    """Emulates the connection handshake of ``snippets/tcp_server.py``."""
+    remote, _ = server.accept()
+    if active:
+        remote.sendall(b"Concurrent connection rejected\r\n")
+    else:
+        remote.sendall(b"Password: ")
+        ok = remote.makefile("rb").readline().rstrip(b"\r\n") == password
+        remote.sendall(b"\r\nConnected\r\nfoo" if ok else b"\r\nAccess denied\r\n")
+    remote.close()
+
+
+@pytest.mark.parametrize(
+    "password, active, error",
+    [
+        ("python", False, None),
+        ("wrong", False, "Access denied"),
+        ("python", True, "Concurrent connection rejected"),
+    ],
+)
+def test_socket_to_serial_login(password, active, error):
+    server = socket.create_server(("127.0.0.1", 0))
+    thread = threading.Thread(target=_fake_tcp_server_login, args=(server, b"python", active), daemon=True)
+    thread.start()
+    uri = f"tcp://127.0.0.1:{server.getsockname()[1]}"
+    if error:
+        with pytest.raises(ConnectionFailedError, match=error):
+            SocketToSerial(uri, password, read_timeout=1)
+    else:
+        transport = SocketToSerial(uri, password, read_timeout=1)
+        assert transport.read(3) == b"foo"
+        transport.close()
+    thread.join()
+    server.close()
+
+
+def _fake_telnet_login(server, password):
+    remote, _ = server.accept()
+    stream = remote.makefile("rb")
+    remote.sendall(b"\xff\xfb\x01MicroPython\r\nLogin as: ")  # IAC WILL ECHO
+    assert stream.read(3) == b"\xff\xfe\x01"  # IAC DONT ECHO
+    assert stream.readline() == b"micro\r\n"
+    remote.sendall(b"Password: ")
+    if stream.readline() == password.encode() + b"\r\n":
+        remote.sendall(b'\r\nLogin succeeded!\r\nType "help()" for more information.\r\n>>> ')
+    else:
+        remote.sendall(b"\r\nInvalid credentials, try again.\r\n")
+    return remote
+
+
+@pytest.fixture
+def telnet_server():
+    server = socket.create_server(("127.0.0.1", 0))
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(remote=_fake_telnet_login(server, "python")), daemon=True)
+    thread.start()
+    yield f"127.0.0.1:{server.getsockname()[1]}", thread, result
+    if "remote" in result:
+        result["remote"].close()
+    server.close()
+
+
+def test_telnet_to_serial(telnet_server):
+    address, thread, result = telnet_server
+    transport = TelnetToSerial(address, "micro", "python", read_timeout=0.1)
+    thread.join()
+    remote = result["remote"]
+    assert transport.read(5) == b"\r\n>>>"
+
+    transport.write(b"a\xffb")
+    assert remote.recv(4) == b"a\xff\xffb"
+
+    # Escaped data, and commands split across packets.
+    remote.sendall(b"\xff\xff1\xff")
+    time.sleep(0.05)
+    remote.sendall(b"\xfd\x032\xff\xfa\x18\x01\xff\xf03")  # IAC DO SGA, IAC SB ... IAC SE
+    assert transport.read(5) == b" \xff123"
+    assert remote.recv(3) == b"\xff\xfc\x03"  # IAC WONT SGA
+
+    t_start = time.monotonic()
+    assert transport.read(1) == b""
+    assert time.monotonic() - t_start >= 0.09
+    transport.close()
+
+
+def test_telnet_to_serial_bad_password(telnet_server):
+    address, thread, _ = telnet_server
+    with pytest.raises(ConnectionFailedError):
+        TelnetToSerial(address, "micro", "wrong", read_timeout=0.1)
+    thread.join()
+
+
+# Prints a prompt, then echoes stdin until it is closed or receives "exit".
+_echo_process = (
+    "import os, sys; os.write(1, b'>>> ')\n"
+    "while True:\n"
+    "    data = os.read(0, 65536)\n"
+    "    if not data or data == b'exit':\n"
+    "        break\n"
+    "    os.write(1, data)\n"
+)
+
+
+@pytest.fixture(params=["selector", "thread"])
+def process_to_serial(request, mocker):
+    if request.param == "thread":
+        mocker.patch("belay.pyboard.selectors.DefaultSelector.register", side_effect=ValueError)
+    transport = ProcessToSerial(f'"{sys.executable}" -c "{_echo_process}"')
+    assert (transport._selector is None) == (request.param == "thread")
+    yield transport
+    transport.close()
+
+
+def test_process_to_serial(process_to_serial):
+    assert process_to_serial.read(4) == b">>> "
+    assert process_to_serial.in_waiting == 0
+    assert process_to_serial.wait_readable(0.01) is False
+
+    data = bytes(range(256)) * 32
+    process_to_serial.write(data)
+    assert process_to_serial.read(len(data)) == data
+
+    process_to_serial.write(b"foo")
+    assert process_to_serial.wait_readable(5)
+    while process_to_serial.in_waiting < 3:
+        pass
+    assert process_to_serial.read(3) == b"foo"
+
+
+def test_process_to_serial_exited(process_to_serial):
+    process_to_serial.write(b"exit")
+    with pytest.raises(ConnectionResetError):
+        process_to_serial.read(10)
@@ -0,0 +1,85 @@
+import binascii
+import io
+import threading
+
+import pytest
+
+from belay import _codec
+from belay.pyboard import PyboardException
+from belay.rpc import RpcDispatcher
+
+tasks = {
+    0: lambda a, b: a + b,
+    1: lambda: 1 / 0,
+    2: lambda: None,
+}
+
+# Output printed by a task prior to returning; defaults to ``b"printed output\r\n"``.
+outputs = {
+    2: b"x",  # print("x", end="")
+}
+
+
+def _fake_rpc_device(remote):
+    """Emulates the device-side ``__belay_rpc`` dispatcher loop."""
+    remote.settimeout(5)
+    stream = remote.makefile("rb")
+    while True:
+        line = stream.readline()
+        if len(line) < 2:
+            break
+        call_id, task_id, args, kwargs = _codec.unpack(binascii.a2b_base64(line))
+        remote.sendall(outputs.get(task_id, b"printed output\r\n"))
+        try:
+            res = (call_id, 0, tasks[task_id](*args, **kwargs))
+        except Exception as e:
+            res = (call_id, 1, f"Traceback (most recent call last):\n{type(e).__name__}: {e}\n")
+        remote.sendall(b"_BELAYF" + binascii.b2a_base64(_codec.pack(res)))
+    remote.sendall(b"\x04\x04>")
+
+
+@pytest.fixture
+def dispatcher(mocker, pyboard):
+    board, remote = pyboard
+    mocker.patch.object(board, "exec_raw_no_follow")
+    thread = threading.Thread(target=_fake_rpc_device, args=(remote,))
+    thread.start()
+    dispatcher = RpcDispatcher(board)
+    yield dispatcher
+    dispatcher.stop()
+    thread.join()
+
+
+def test_rpc_call(dispatcher):
+    stream_out = io.StringIO()
+    assert dispatcher.call(0, (1, 2), {}, stream_out=stream_out) == 3
+    assert dispatcher.running
+    dispatcher.board.exec_raw_no_follow.assert_called_once_with("__belay_rpc()")
+
+    assert dispatcher.call(0, ([1],), {"b": [2]}, stream_out=stream_out) == [1, 2]
+    assert dispatcher.board.exec_raw_no_follow.call_count == 1
+    assert stream_out.getvalue() == "printed output\r\n" * 2
+
+
+def test_rpc_call_output_without_newline(dispatcher):
+    stream_out = io.StringIO()
+    assert dispatcher.call(2, (), {}, stream_out=stream_out) is None
+    assert stream_out.getvalue() == "x"
+    assert dispatcher.call(0, (1, 2), {}, stream_out=stream_out) == 3
+
+
+def test_rpc_call_exception(dispatcher):
+    with pytest.raises(PyboardException, match="ZeroDivisionError"):
+        dispatcher.call(1, (), {}, stream_out=None)
+    # Dispatcher is still usable.
+    assert dispatcher.call(0, ("a", "b"), {}, stream_out=None) == "ab"
+
+
+def test_rpc_call_unsupported_type(mocker, pyboard):
+    board, _ = pyboard
+    exec_raw_no_follow = mocker.patch.object(board, "exec_raw_no_follow")
+    dispatcher = RpcDispatcher(board)
+    with pytest.raises(_codec.UnsupportedTypeError):
+        dispatcher.call(0, (object(),), {})
+    exec_raw_no_follow.assert_not_called()
+    assert not dispatcher.running
@@ -5,6 +5,7 @@ import pytest
 
 from belay import UsbSpecifier
 from belay.exceptions import DeviceNotFoundError, InsufficientSpecifierError
+from belay.usb_specifier import serial_number
 
 
 @dataclass
@@ -63,3 +64,11 @@ def test_usb_specifier_no_matches(mock_comports):
 def test_usb_specifier_multiple_matches(mock_comports):
     with pytest.raises(InsufficientSpecifierError):
         UsbSpecifier(manufacturer="Belay Industries").to_port()
+
+
+def test_serial_number(mock_comports):
+    assert serial_number("/dev/ttyUSB1") == "xyz987"
+
+
+def test_serial_number_missing(mock_comports):
+    assert serial_number("/dev/ttyACM0") is None
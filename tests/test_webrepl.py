@@ -0,0 +1,247 @@
+import contextlib
+import socket
+import struct
+import threading
+
+import pytest
+
+from belay.exceptions import AuthenticationError
+from belay.pyboard import Pyboard
+from belay.webrepl import WebreplError, WebreplToSerial, Websocket, get_file, put_file
+
+
+@pytest.fixture
+def websocket():
+    a, b = socket.socketpair()
+    a.settimeout(1)
+    yield Websocket(a), b
+    a.close()
+    b.close()
+
+
+def recv_all(sock, size):
+    data = b""
+    while len(data) < size:
+        data += sock.recv(size - len(data))
+    return data
+
+
+@pytest.mark.parametrize(
+    "size, headers",
+    [
+        (5, [b"\x81\x05"]),
+        (300, [b"\x81\x7e" + struct.pack(">H", 300)]),
+        # MicroPython doesn't support 64-bit payload lengths; split into multiple frames.
+        (70000, [b"\x81\x7e\xff\xff", b"\x81\x7e" + struct.pack(">H", 70000 - 0xFFFF)]),
+    ],
+)
+def test_websocket_writetext(websocket, size, headers):
+    ws, remote = websocket
+    data = bytes(range(256)) * (size // 256) + bytes(size % 256)
+    threading.Thread(target=ws.writetext, args=(data,)).start()
+    expected = b"".join(header + data[i * 0xFFFF : (i + 1) * 0xFFFF] for i, header in enumerate(headers))
+    assert recv_all(remote, len(expected)) == expected
+
+
+def test_websocket_read(websocket):
+    ws, remote = websocket
+    remote.sendall(
+        b"\x89\x02hi"  # ping; skipped
+        b"\x82\x03foo"
+        b"\x81\x03baz"  # text; skipped unless text_ok
+        b"\x82\x7f" + struct.pack(">Q", 3) + b"bar" + b"\x81\x7e" + struct.pack(">H", 200) + b"a" * 200
+    )
+    assert ws.read(2) == b"fo"
+    assert ws.read(5, size_match=False) == b"o"
+    assert ws.read(3) == b"bar"
+    with pytest.raises(WebreplError):
+        ws.read(201, text_ok=True)
+
+
+def _webrepl_file_server(remote, op, data, code=0):
+    """Serve a single WebREPL file transfer request; returns ``(request, received file data)``."""
+    ws = Websocket(remote)
+    header = b""
+    while len(header) < 82:  # The request may be split across frames.
+        header += ws.read(82 - len(header), size_match=False)
+    request = struct.unpack("<2sBBQLH64s", header)
+    assert request[:2] == (b"WA", op)
+    ws.write(b"WB" + struct.pack("<H", code))
+    if code:
+        return request, None
+
+    received = b""
+    if op == 1:  # WEBREPL_PUT_FILE
+        while len(received) < request[4]:
+            received += ws.read(request[4] - len(received), size_match=False)
+    else:  # WEBREPL_GET_FILE
+        for i in range(0, len(data) + 100, 100):  # Ends with an empty block.
+            assert ws.read(1) == b"\0"
+            block = data[i : i + 100]
+            ws.write(struct.pack("<H", len(block)) + block)
+    ws.write(b"WB\0\0")
+    return request, received
+
+
+def test_put_file(websocket, tmp_path):
+    ws, remote = websocket
+    data = bytes(range(256)) * 40
+    src = tmp_path / "foo.bin"
+    src.write_bytes(data)
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(out=_webrepl_file_server(remote, 1, None)))
+    thread.start()
+
+    progress = []
+    put_file(ws, src, "/foo.bin", chunk_size=4096, progress_callback=lambda *args: progress.append(args))
+    thread.join()
+
+    request, received = result["out"]
+    assert request[4] == len(data)
+    assert request[6].rstrip(b"\0") == b"/foo.bin"
+    assert received == data
+    assert progress == [(4096, 10240), (8192, 10240), (10240, 10240)]
+
+
+def test_get_file(websocket, tmp_path):
+    ws, remote = websocket
+    data = bytes(range(250))
+    thread = threading.Thread(target=_webrepl_file_server, args=(remote, 2, data))
+    thread.start()
+
+    progress = []
+    get_file(ws, tmp_path / "foo.bin", "/foo.bin", progress_callback=lambda *args: progress.append(args), size=250)
+    thread.join()
+
+    assert (tmp_path / "foo.bin").read_bytes() == data
+    assert progress == [(100, 250), (200, 250), (250, 250)]
+
+
+def test_put_file_error(websocket, tmp_path):
+    ws, remote = websocket
+    src = tmp_path / "foo.bin"
+    src.write_bytes(b"foo")
+    thread = threading.Thread(target=_webrepl_file_server, args=(remote, 1, None, 2))
+    thread.start()
+    with pytest.raises(WebreplError):
+        put_file(ws, src, "/missing/foo.bin")
+    thread.join()
+
+
+def _fake_webrepl_server(server, password):
+    conn, _ = server.accept()
+    ws = Websocket(conn)
+    stream = conn.makefile("rb")
+    while stream.readline() != b"\r\n":
+        pass
+    conn.sendall(b"HTTP/1.1 101 Switching Protocols\r\n\r\n")
+    ws.writetext(b"Password: ")
+    if ws.read(64, text_ok=True, size_match=False) != password.encode() + b"\r":
+        ws.writetext(b"\r\nAccess denied\r\n")
+        return
+    ws.writetext(b"\r\nWebREPL connected\r\n>>> ")
+    # Echo
+    while True:
+        try:
+            data = ws.read(65536, text_ok=True, size_match=False)
+        except (WebreplError, OSError):
+            return
+        if data == b"close":
+            # E.g. the device was reset.
+            conn.close()
+            return
+        ws.writetext(data)
+
+
+@pytest.fixture
+def webrepl_server():
+    server = socket.create_server(("127.0.0.1", 0))
+    thread = threading.Thread(target=_fake_webrepl_server, args=(server, "python"))
+    thread.start()
+    yield f"ws://127.0.0.1:{server.getsockname()[1]}"
+    thread.join()
+    server.close()
+
+
+def test_webrepl_to_serial(webrepl_server):
+    transport = WebreplToSerial(webrepl_server, "python", read_timeout=1)
+    assert transport.in_waiting == 0
+
+    transport.write(b"foo")
+    transport.write(b"bar")
+    data = b""
+    while len(data) < 6:
+        data += transport.read(transport.in_waiting or 1)
+    assert data == b"foobar"
+    transport.close()
+
+
+def test_webrepl_to_serial_closed(webrepl_server):
+    transport = WebreplToSerial(webrepl_server, "python", read_timeout=1)
+    transport.write(b"close")
+    # Raised like ``SocketToSerial``, so that ``Device`` reconnects.
+    with pytest.raises(ConnectionResetError):
+        while True:
+            transport.in_waiting  # noqa: B018
+    with pytest.raises(ConnectionResetError):
+        transport.read(1)
+    transport.close()
+
+
+def test_webrepl_to_serial_bad_password(webrepl_server):
+    with pytest.raises(AuthenticationError):
+        WebreplToSerial(webrepl_server, "wrong", read_timeout=1)
+
+
+def _fake_raw_repl_webrepl_server(server, data, results):
+    """WebREPL server in raw REPL mode, serving a file upload, a file download, and a command."""
+    conn, _ = server.accept()
+    ws = Websocket(conn)
+    stream = conn.makefile("rb")
+    while stream.readline() != b"\r\n":
+        pass
+    conn.sendall(b"HTTP/1.1 101 Switching Protocols\r\n\r\n")
+    ws.writetext(b"Password: ")
+    ws.read(64, text_ok=True, size_match=False)
+    ws.writetext(b"\r\nWebREPL connected\r\n>>> ")
+
+    # Prompt for the next raw REPL command, still pending from the previous command.
+    ws.writetext(b">")
+    results["put"] = _webrepl_file_server(conn, 1, None)
+    # The device doesn't prompt again after a file transfer.
+    results["get"] = _webrepl_file_server(conn, 2, data)
+
+    cmd = b""
+    while not cmd.endswith(b"\x04"):
+        cmd += ws.read(65536, text_ok=True, size_match=False)
+    results["cmd"] = cmd[:-1]
+    ws.writetext(b"OK")
+    ws.writetext(b"bar\r\n\x04\x04")
+    ws.writetext(b">")
+    # Stay connected until the client disconnects.
+    with contextlib.suppress(WebreplError, OSError):
+        ws.read(1, text_ok=True)
+
+
+def test_pyboard_webrepl_file_transfer_raw_repl(tmp_path):
+    server = socket.create_server(("127.0.0.1", 0))
+    data = bytes(range(250))
+    results = {}
+    thread = threading.Thread(target=_fake_raw_repl_webrepl_server, args=(server, data, results), daemon=True)
+    thread.start()
+
+    board = Pyboard(f"ws://127.0.0.1:{server.getsockname()[1]}", password="python")
+    board.in_raw_repl = True
+    board.use_raw_paste = False
+
+    (tmp_path / "foo.bin").write_bytes(b"foo")
+    board.fs_put(tmp_path / "foo.bin", "/foo.bin")
+    board.fs_get("/bar.bin", tmp_path / "bar.bin")
+    assert board.exec("print('bar')") == b"bar\r\n"
+    board.close()
+    thread.join()
+    server.close()
+
+    assert results["put"][1] == b"foo"
+    assert (tmp_path / "bar.bin").read_bytes() == data
+    assert results["cmd"] == b"print('bar')"